@@ -7,15 +7,28 @@
 - 输出：集中度>80% 且 样本≥5；放宽：样本=4 且 集中度=100% 也输出（不要求上/下/走≥5）。
 - 单独统计「仅走盘」情形：上=0、下=0、走≥1。
 - 特征可仅为 1～2 列，不必全部满足。
-- 统计按「场次」去重：同一场次多行（如多盘口）仅计一次，场次键为 (B,D,F,E,G,H,I,K,N,P,Q,R,S,T)。
+- 统计按「场次」去重：同一场次多行（如多盘口）仅计一次，场次键为 (B,D,F,E,G,H,I,K,N,P,Q,R,S,T, 来源文件)。
+- 数据可来自多个工作簿（每赛季/联赛一个），见 DATA_PATH / load_xlsx。
 """
-import zipfile
-import xml.etree.ElementTree as ET
+import os
+import glob
 import re
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from datetime import datetime, timedelta
 from collections import defaultdict, Counter
 import csv
 from itertools import combinations
 
+from rule_engine import RANGE_EPS
+from significance import binom_two_sided, bh_qvalues
+from xlsx_reader import read_rows
+
+# 默认数据文件；可用环境变量 ASIA_DATA 指定其他文件、通配符（如 docs/*欧洲FB.xlsx）
+# 或用系统路径分隔符（Linux/macOS 为 :）隔开的多个文件/通配符。
+DATA_PATH = os.environ.get('ASIA_DATA', 'docs/20252026欧洲FB.xlsx')
+
 def col_index(ref):
     m = re.match(r'([A-Z]+)(\d+)', ref)
     if not m:
@@ -26,70 +39,242 @@ def col_index(ref):
         col = col * 26 + (ord(c) - ord('A') + 1)
     return col - 1, int(row_s) - 1
 
-def load_xlsx(path):
-    with zipfile.ZipFile(path, 'r') as z:
-        with z.open('xl/sharedStrings.xml') as f:
-            ss_root = ET.parse(f).getroot()
-        ns = {'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
-        strings = []
-        for s in ss_root.findall('.//main:si', ns):
-            texts = s.findall('.//main:t', ns)
-            strings.append(''.join(x.text or '' for x in texts) if s.findall('.//main:t', ns) else '')
-        with z.open('xl/worksheets/sheet1.xml') as f:
-            root = ET.parse(f).getroot()
-
-    grid = defaultdict(dict)
-    for row in root.findall('.//main:row', ns):
-        for c in row.findall('main:c', ns):
-            ref = c.get('r')
-            if not ref:
-                continue
-            ci, ri = col_index(ref)
-            if ci is None:
-                continue
-            v = c.find('main:v', ns)
-            t = c.get('t')
-            if v is not None and v.text is not None:
-                val = strings[int(v.text)] if t == 's' and int(v.text) < len(strings) else v.text
-            else:
-                val = ''
-            grid[ri][ci] = val
-
-    def num(s):
-        try:
-            return float(s)
-        except Exception:
-            return None
+class Dataset(list):
+    """
+    load_xlsx 的返回值：仍是普通的行列表，另外带加载时建立的分区（行号数组，保持原顺序）：
+    - by_morph: (B, D, F) -> 行号列表
+    - by_df:    (D, F) -> 行号列表（主客合并，对应 MORPH_GROUP_DF 这类按盘口分组的统计）
+    filter_rows 等按形态筛选的函数只访问对应分区，不再扫全表。
+    直接 append/extend 后分区会在下次查询时自动补建新增行；其他改动列表的操作（赋值、插入、删除、排序等）
+    使分区失效，下次查询时整体重建。
+    """
+
+    def __init__(self, rows=()):
+        super().__init__(rows)
+        self.by_morph = defaultdict(list)
+        self.by_df = defaultdict(list)
+        self._indexed = 0
+        self._merged = {}
+        self._sync()
+
+    def _sync(self):
+        """为尚未建分区的新增行补建分区。"""
+        if self._indexed == len(self):
+            return
+        for i in range(self._indexed, len(self)):
+            r = self[i]
+            self.by_morph[(r['B'], r['D'], r['F'])].append(i)
+            self.by_df[(r['D'], r['F'])].append(i)
+        self._indexed = len(self)
+        self._merged.clear()
+
+    def _reset(self):
+        """已有行被替换、删除或移动：丢弃全部分区，下次查询时重建。"""
+        self.by_morph = defaultdict(list)
+        self.by_df = defaultdict(list)
+        self._indexed = 0
+        self._merged.clear()
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        self._reset()
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self._reset()
+
+    def insert(self, i, value):
+        super().insert(i, value)
+        self._reset()
+
+    def remove(self, value):
+        super().remove(value)
+        self._reset()
+
+    def pop(self, i=-1):
+        value = super().pop(i)
+        self._reset()
+        return value
+
+    def clear(self):
+        super().clear()
+        self._reset()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._reset()
+
+    def reverse(self):
+        super().reverse()
+        self._reset()
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._reset()
+        return self
+
+    def morphs_by_size(self):
+        """按行数从多到少排列的形态列表。"""
+        self._sync()
+        return sorted(self.by_morph, key=lambda m: -len(self.by_morph[m]))
+
+    def morph_count(self, morph):
+        """某形态（或形态列表）的行数。"""
+        self._sync()
+        return sum(len(self.by_morph.get(m, ())) for m in morph_keys(morph))
+
+    def morph_indices(self, morph):
+        """单个 (B,D,F) 或其列表对应的行号（升序）；多形态的合并结果会缓存。"""
+        self._sync()
+        keys = morph_keys(morph)
+        if len(keys) == 1:
+            return self.by_morph.get(keys[0], [])
+        ck = tuple(sorted(keys))
+        if ck not in self._merged:
+            self._merged[ck] = list(heapq.merge(*(self.by_morph.get(k, []) for k in keys)))
+        return self._merged[ck]
+
+    def morph_rows(self, morph):
+        """单个 (B,D,F) 或其列表对应的行（保持原顺序）。"""
+        return [self[i] for i in self.morph_indices(morph)]
+
+    def df_group_rows(self, df_pairs, sides=('主', '客')):
+        """若干 (D,F) 盘口组、指定主客的行（保持原顺序），用于 MORPH_GROUP_DF 这类合并形态。"""
+        self._sync()
+        idx = heapq.merge(*(self.by_df.get(tuple(df), []) for df in df_pairs))
+        return [self[i] for i in idx if self[i]['B'] in sides]
+
+def as_dataset(rows):
+    """已是 Dataset 则原样返回，否则（如手工拼出的行列表）建立一次分区。"""
+    return rows if isinstance(rows, Dataset) else Dataset(rows)
+
+def resolve_data_paths(path):
+    """
+    把 load_xlsx 的 path 参数展开成有序的工作簿路径列表：
+    - 单个路径；含 * ? [ 的通配符；用 os.pathsep 隔开的多个路径；或以上任意组合的列表/元组。
+    通配符按文件名排序展开，重复路径只保留一次。
+    """
+    if isinstance(path, (list, tuple)):
+        specs = list(path)
+    else:
+        specs = [p for p in str(path).split(os.pathsep) if p]
+    out = []
+    for spec in specs:
+        if glob.has_magic(spec):
+            matched = sorted(glob.glob(spec))
+            if not matched:
+                raise FileNotFoundError(spec)
+            out.extend(matched)
+        else:
+            out.append(spec)
+    return list(dict.fromkeys(out))
 
-    B, D, F, E, G, H, I, K, N, P, Q, R, S, T, U = 1, 3, 5, 4, 6, 7, 8, 10, 13, 15, 16, 17, 18, 19, 20
-    nrows = max(grid.keys()) + 1
+# 列投影：load_xlsx 只保留 schema 中的列，其余单元格在解析 XML 时直接跳过（不取值、不建文本对象）。
+# SEARCH_SCHEMA 为规则搜索、筛选和场次去重需要的列（默认，也是任何 schema 的下限）；
+# SUMMARY_SCHEMA 另加 2026 汇总类型库条件用到的 L、O、V、W（见 export_summary_types._COL_TO_INPUT_COL）；
+# 汇总类型库的 U、X 条件不在其中：数据表的 U 是结果列，X 是行字典里的形态键，都不能作为数值列读入。
+# 需要其他列的调用方显式传入更宽的 schema（如 SEARCH_SCHEMA + ('L', 'O')）。
+SEARCH_SCHEMA = ('B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'K', 'N', 'P', 'Q', 'R', 'S', 'T', 'U')
+SUMMARY_SCHEMA = SEARCH_SCHEMA + ('L', 'O', 'V', 'W')
+# 按文本保留的列（其余除 C 日期外都按数值解析）
+_TEXT_COLS = ('A', 'B', 'D', 'F', 'U')
+
+def schema_columns(schema=None):
+    """schema（列字母序列，None 为 SEARCH_SCHEMA）-> 实际保留的列（含 SEARCH_SCHEMA，按表中顺序）。"""
+    cols = set(SEARCH_SCHEMA).union(schema or ())
+    bad = sorted(c for c in cols if c == 'X' or not re.fullmatch(r'[A-Z]{1,3}', str(c)))
+    if bad:
+        raise ValueError(f"无效的列: {', '.join(map(str, bad))}（X 为形态键，不能作为数据列）")
+    return tuple(sorted(cols, key=lambda c: (len(c), c)))
+
+def load_xlsx(path, workers=None, schema=None):
+    """
+    读取一个或多个数据工作簿，合并为一个 Dataset。
+    path 见 resolve_data_paths；多个文件时用进程池并行解析（workers 默认取 CPU 数），
+    合并顺序与路径顺序一致。每行带 'source' 列（来源文件），场次键包含来源，跨文件不会误合并。
+    schema 为要保留的列（见 schema_columns），默认 SEARCH_SCHEMA。
+    """
+    paths = resolve_data_paths(path)
+    cols = schema_columns(schema)
+    if len(paths) == 1:
+        return Dataset(_load_one(paths[0], cols))
+    n_workers = min(len(paths), workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=n_workers) as ex:
+        parts = list(ex.map(partial(_load_one, schema=cols), paths))
+    return Dataset(r for part in parts for r in part)
+
+def _load_one(path, schema=None):
+    """解析单个工作簿的第一张表（只取 schema 中的列），返回行字典列表（普通 list，便于进程间传递）。
+    默认经 dataset_cache 的行缓存：工作簿只在末尾追加行时只解析新增的行（ASIA_ROW_CACHE=0 关闭）。"""
+    import dataset_cache
+    cols = schema_columns(schema)
+    if dataset_cache.ENABLED:
+        return dataset_cache.load_rows(path, cols)
+    return rows_from_cells(read_rows(path, columns=cols), path, cols)
+
+def _num(s):
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+def rows_from_cells(cell_rows, path, schema=None):
+    """(行号, {列字母: 文本}) 序列 -> 数据行字典列表（只保留 U 为上/下/走的数据行，列见 schema_columns）。"""
+    num = _num
+    cols = schema_columns(schema)
+    num_cols = [c for c in cols if c not in _TEXT_COLS and c != 'C']
+    keep_a = 'A' in cols
     rows = []
     # 数据从第 4 行开始（第 1～3 行为表头/筛选行）
-    for r in range(3, nrows):
-        d_val = str(grid[r].get(D, '')).strip()
-        f_val = str(grid[r].get(F, '')).strip()
-        u_val = str(grid[r].get(U, '')).strip()
+    for r, cells in cell_rows:
+        if r < 4:
+            continue
+        u_val = str(cells.get('U', '')).strip()
         if not u_val or u_val not in ('上', '下', '走'):
             continue
-        b, d, f = str(grid[r].get(B, '')).strip(), d_val, f_val
+        b = str(cells.get('B', '')).strip()
+        d = str(cells.get('D', '')).strip()
+        f = str(cells.get('F', '')).strip()
         row = {
             'X': f"{b}/{d}/{f}",
             'B': b, 'D': d, 'F': f, 'U': u_val,
-            'E': num(grid[r].get(E)), 'G': num(grid[r].get(G)), 'H': num(grid[r].get(H)),
-            'I': num(grid[r].get(I)), 'K': num(grid[r].get(K)),
-            'N': num(grid[r].get(N)), 'P': num(grid[r].get(P)),
-            'Q': num(grid[r].get(Q)), 'R': num(grid[r].get(R)),
-            'S': num(grid[r].get(S)), 'T': num(grid[r].get(T)),
+            'C': _cell_date(cells.get('C')),
         }
+        for c in num_cols:
+            row[c] = num(cells.get(c))
+        if keep_a:
+            row['A'] = str(cells.get('A', '')).strip()
+        row['source'] = path
         rows.append(row)
     return rows
 
+_DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%Y/%m/%d %H:%M', '%Y/%m/%d')
+
+def _cell_date(v):
+    """C 列（时间）转 datetime：Excel 日期序列号（如 45678.875）或常见日期文本；无法识别返回 None。"""
+    if v is None:
+        return None
+    s = str(v).strip()
+    if not s:
+        return None
+    try:
+        return datetime(1899, 12, 30) + timedelta(days=float(s))
+    except (ValueError, OverflowError):
+        pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+    return None
+
 def _game_key(r):
-    """场次唯一键：除结果 U 外的特征列。同一场次多行（如多盘口）只计一次。"""
+    """场次唯一键：除结果 U 外的特征列及来源文件。同一场次多行（如多盘口）只计一次，不同工作簿的场次互不合并。"""
     return (
         r['B'], r['D'], r['F'],
         r.get('E'), r.get('G'), r.get('H'), r.get('I'), r.get('K'),
         r.get('N'), r.get('P'), r.get('Q'), r.get('R'), r.get('S'), r.get('T'),
+        r.get('source'),
     )
 
 def unique_by_game(rows):
@@ -107,12 +292,15 @@ def outcome_set(rows):
     """返回行的场次集合（用于按匹配集去重：同一批场次只保留条件最少的一条）。"""
     return frozenset(_game_key(r) for r in rows)
 
-# 浮点比较容差，避免边界因浮点误差被排除（ge/le/gt/lt 及 range 均使用）
-_RANGE_EPS = 1e-9
+# 浮点比较容差，避免边界因浮点误差被排除（ge/le/gt/lt 及 range 均使用）；与单行匹配共用 rule_engine.RANGE_EPS
+_RANGE_EPS = RANGE_EPS
 
 def filter_rows(rows, morph, **kwargs):
     """morph = (B, D, F) 或 (B,D,F) 的列表。kwargs 为各红色列及 Q,R 的阈值。"""
-    if isinstance(morph, (list, tuple)) and len(morph) > 0 and isinstance(morph[0], (list, tuple)):
+    if isinstance(rows, Dataset):
+        # 直接取加载时建立的形态分区
+        out = rows.morph_rows(morph)
+    elif isinstance(morph, (list, tuple)) and len(morph) > 0 and isinstance(morph[0], (list, tuple)):
         # morph 为 (B,D,F) 元组列表
         morph_set = set(tuple(m) for m in morph)
         out = [r for r in rows if (r['B'], r['D'], r['F']) in morph_set]
@@ -197,11 +385,57 @@ def filter_rows(rows, morph, **kwargs):
             out = [r for r in out if r['H'] is not None and r['H'] < v - e]
     return out
 
+# filter_rows 识别的条件键 -> (列, 比较方式)。未列出的键（如 G_gt、Q_le）filter_rows 会直接忽略；
+# 位图、索引等加速路径必须按这张表解释条件，保证与 filter_rows 结果一致。
+# 'gt_loose' 对应 H_gt 的 x > v - eps（容差方向与其他 _gt 相反）。
+FILTER_OPS = {
+    'K_ge': ('K', 'ge'), 'K_le': ('K', 'le'), 'K_lt': ('K', 'lt'), 'K_gt': ('K', 'gt'),
+    'N_ge': ('N', 'ge'), 'N_le': ('N', 'le'), 'N_lt': ('N', 'lt'), 'N_gt': ('N', 'gt'),
+    'I_ge': ('I', 'ge'), 'I_le': ('I', 'le'), 'I_lt': ('I', 'lt'),
+    'P_ge': ('P', 'ge'), 'P_le': ('P', 'le'), 'P_lt': ('P', 'lt'), 'P_gt': ('P', 'gt'),
+    'Q_lt': ('Q', 'lt'), 'Q_gt': ('Q', 'gt'),
+    'R_lt': ('R', 'lt'), 'R_gt': ('R', 'gt'), 'R_ge': ('R', 'ge'),
+    'E_ge': ('E', 'ge'), 'E_le': ('E', 'le'),
+    'G_ge': ('G', 'ge'), 'G_le': ('G', 'le'), 'G_lt': ('G', 'lt'),
+    'G_range': ('G', 'range'), 'I_range': ('I', 'range'), 'K_range': ('K', 'range'),
+    'N_range': ('N', 'range'), 'P_range': ('P', 'range'), 'Q_range': ('Q', 'range'),
+    'R_range': ('R', 'range'),
+    'H_ge': ('H', 'ge'), 'H_le': ('H', 'le'), 'H_gt': ('H', 'gt_loose'), 'H_lt': ('H', 'lt'),
+}
+
+def condition_predicate(key, v):
+    """返回与 filter_rows 中该条件等价的单值判断 f(x)（x 已保证非 None）；
+    filter_rows 会忽略的条件（v 为 None 或键未识别）返回 None。"""
+    if v is None or key not in FILTER_OPS:
+        return None
+    op = FILTER_OPS[key][1]
+    e = _RANGE_EPS
+    if op == 'ge':
+        return lambda x: x >= v - e
+    if op == 'le':
+        return lambda x: x <= v + e
+    if op == 'lt':
+        return lambda x: x < v - e
+    if op == 'gt':
+        return lambda x: x > v + e
+    if op == 'gt_loose':
+        return lambda x: x > v - e
+    lo, hi = v[0] - e, v[1] + e
+    return lambda x: lo <= x <= hi
+
+def morph_keys(morph):
+    """把 filter_rows 的 morph 参数（单个 (B,D,F) 或其列表）统一成 (B,D,F) 元组列表。"""
+    if isinstance(morph, (list, tuple)) and len(morph) > 0 and isinstance(morph[0], (list, tuple)):
+        return list(dict.fromkeys(tuple(m) for m in morph))
+    return [tuple(morph)]
+
 def stats(rows):
     """返回 总场次, 上, 下, 走, 样本数(上+下), 主要结果, 集中度(主/(上+下)*100)。"""
     c = Counter(r['U'] for r in rows)
-    n_total = len(rows)
-    shang, xia, zou = c.get('上', 0), c.get('下', 0), c.get('走', 0)
+    return stats_from_counts(len(rows), c.get('上', 0), c.get('下', 0), c.get('走', 0))
+
+def stats_from_counts(n_total, shang, xia, zou):
+    """由 (总场次, 上, 下, 走) 计算与 stats 相同的结果（供只给出计数的索引使用）。"""
     n_eff = shang + xia
     if n_eff == 0:
         return n_total, shang, xia, zou, 0, '走', 0.0
@@ -243,6 +477,12 @@ RED_CONDITIONS = [
     ('R(-0.13~-0.11)', 'R_range', (-0.13, -0.11)),
 ]
 
+# 形态组：(D,F) = 0/0, 0/0.25, 0.25/0, 0.25/0.25, 0.5/0.25，主+客合并统计（网页规则库、回测使用）
+MORPH_GROUP_DF = [('0', '0'), ('0', '0.25'), ('0.25', '0'), ('0.25', '0.25'), ('0.5', '0.25')]
+
+# 覆盖率报告中列出的目标比例：达到该比例所需的最少规则数（贪心覆盖）
+COVER_TARGETS = (0.5, 0.8, 0.9, 1.0)
+
 def _col_of(k):
     # 处理 range 类型：K_range -> K
     base = k.split('_')[0]
@@ -257,19 +497,30 @@ def run_search(rows):
     在每种 X 形态下，枚举红色列条件的 1～多列组合，
     只保留：样本数(上+下)≥5 且 集中度>80%；或 样本数=4 且 集中度=100%。
     同时考虑特征场次可达总场次的30%左右，放宽筛选条件。
+    每条结果附 p值（主要结果场次/总场次 相对该形态基准比例 主要结果/总场次 的双侧精确二项检验，
+    分母与 rules.json 的 p_value 相同）和 q值（对全部评估过的组合做 BH 校正）。
+    计数用 range_index.RangeIndex（一列、两列条件二分查找），与 filter_rows + unique_by_game 的结果一致。
     """
-    morphs = list(set((r['B'], r['D'], r['F']) for r in rows))
-    morphs = sorted(morphs, key=lambda m: -len([r for r in rows if (r['B'], r['D'], r['F']) == m]))
+    from range_index import RangeIndex
+
+    rows = as_dataset(rows)
+    morphs = rows.morphs_by_size()
+    index = RangeIndex(rows)
 
     results = []
     seen_outcome = set()
+    # 全部评估过的组合的 (主要结果场次, 总场次, 主要结果在该形态中的基准比例)，循环结束后一次性批量算 p/q 值
+    evaluated = []
 
     for morph in morphs:
-        base = [r for r in rows if (r['B'], r['D'], r['F']) == morph]
+        base = rows.morph_rows(morph)
         if len(base) < 5:
             continue
         x_label = f"{morph[0]}/{morph[1]}/{morph[2]}"
         total_base = len(base)
+        total_base_u, base_shang, base_xia, _ = index.counts(morph)
+        base_rate = {'上': base_shang / total_base_u if total_base_u else 0,
+                     '下': base_xia / total_base_u if total_base_u else 0}
 
         # 单列、两列、三列组合（同一列只允许一个条件，最多三列）
         for n_cond in range(1, min(4, len(RED_CONDITIONS) + 1)):
@@ -278,11 +529,10 @@ def run_search(rows):
                     continue
                 names = [c[0] for c in cond_combo]
                 kw = {c[1]: c[2] for c in cond_combo}
-                sub = filter_rows(rows, morph, **kw)
-                sub_unique = unique_by_game(sub)
-                n_total, shang, xia, zou, n_eff, main, conc = stats(sub_unique)
+                n_total, shang, xia, zou, n_eff, main, conc = stats_from_counts(*index.counts(morph, **kw))
                 if n_eff == 0:
                     continue
+                evaluated.append((max(shang, xia), n_total, base_rate[main]))
                 # 放宽条件：样本数≥5 且 集中度>80%；或 样本数=4 且 集中度=100%
                 # 同时允许特征场次达到总场次的30%左右（即 n_total >= total_base * 0.25）
                 ok = (n_eff >= 5 and conc > 80) or (n_eff == 4 and conc == 100)
@@ -293,7 +543,6 @@ def run_search(rows):
                     continue
                 seen_outcome.add(key)
                 feat = '，且'.join(names)
-                total_base_u = len(unique_by_game(base))
                 results.append({
                     '类型': x_label,
                     '特征': feat,
@@ -305,7 +554,15 @@ def run_search(rows):
                     '主要': main,
                     '_morph': morph,
                     '_conditions': kw,
+                    '_eval_idx': len(evaluated) - 1,
                 })
+
+    pvals = binom_two_sided([e[0] for e in evaluated], [e[1] for e in evaluated], [e[2] for e in evaluated])
+    qvals = bh_qvalues(pvals)
+    for r in results:
+        i = r.pop('_eval_idx')
+        r['p值'] = round(pvals[i], 6)
+        r['q值'] = round(qvals[i], 6)
     return results
 
 def count_high_conc_matches(rows, target_morphs=None):
@@ -314,17 +571,25 @@ def count_high_conc_matches(rows, target_morphs=None):
     除去走盘的，只统计有效场次（上+下）。
     返回：有效场次数（上+下，去重）、规则数、详细匹配信息。
     target_morphs: 如果指定，只统计这些形态，例如 [('主','0','0'), ('客','0','0')]
+    每条规则匹配的有效场次记为位掩码（每个场次一位），并集用按位或；
+    「新增有效场次数」按贪心覆盖顺序计算（每次选新增最多的规则），'覆盖顺序' 为选中次序，
+    贪心过程中没有新增的规则 '覆盖顺序' 为 None、新增为 0。
     """
-    morphs = list(set((r['B'], r['D'], r['F']) for r in rows))
+    from mask_index import greedy_cover, mask_from_positions
+    from range_index import RangeIndex
+
+    rows = as_dataset(rows)
+    morphs = rows.morphs_by_size()
+    index = RangeIndex(rows)
     if target_morphs:
         morphs = [m for m in morphs if m in target_morphs]
-    morphs = sorted(morphs, key=lambda m: -len([r for r in rows if (r['B'], r['D'], r['F']) == m]))
 
-    matched_effective_games = set()  # 已匹配的有效场次（按 _game_key 去重，只包含上/下，不含走）
+    game_bit = {}  # 有效场次（按 _game_key 去重，只包含上/下，不含走） -> 位序号
+    rule_games = []  # 每条规则匹配的有效场次位序号
     matching_rules = []  # 符合条件的规则及其匹配的比赛
 
     for morph in morphs:
-        base = [r for r in rows if (r['B'], r['D'], r['F']) == morph]
+        base = rows.morph_rows(morph)
         if len(base) < 5:
             continue
         x_label = f"{morph[0]}/{morph[1]}/{morph[2]}"
@@ -335,17 +600,15 @@ def count_high_conc_matches(rows, target_morphs=None):
                     continue
                 names = [c[0] for c in cond_combo]
                 kw = {c[1]: c[2] for c in cond_combo}
-                sub = filter_rows(rows, morph, **kw)
-                sub_unique = unique_by_game(sub)
-                n_total, shang, xia, zou, n_eff, main, conc = stats(sub_unique)
+                n_total, shang, xia, zou, n_eff, main, conc = stats_from_counts(*index.counts(morph, **kw))
                 
                 # 筛选：集中度≥90% 且 走盘≥3
                 if conc >= 90 and zou >= 3 and n_eff > 0:
                     # 只统计有效场次（上+下），按场次去重
+                    sub_unique = index.rows(morph, **kw)
                     effective_game_keys = [_game_key(r) for r in sub_unique if r['U'] in ('上', '下')]
-                    new_matches = [gk for gk in effective_game_keys if gk not in matched_effective_games]
-                    matched_effective_games.update(new_matches)
-                    
+                    rule_games.append([game_bit.setdefault(gk, len(game_bit)) for gk in effective_game_keys])
+
                     feat = '，且'.join(names)
                     matching_rules.append({
                         '类型': x_label,
@@ -356,15 +619,25 @@ def count_high_conc_matches(rows, target_morphs=None):
                         '上': shang, '下': xia, '走': zou,
                         '主要': main,
                         '有效场次数': len(effective_game_keys),
-                        '新增有效场次数': len(new_matches),
+                        '新增有效场次数': 0,
+                        '覆盖顺序': None,
                     })
 
-    return len(matched_effective_games), matching_rules
+    masks = [mask_from_positions(pos, len(game_bit)) for pos in rule_games]
+    order = greedy_cover(masks)
+    for rank, (i, gain, _) in enumerate(order, start=1):
+        matching_rules[i]['新增有效场次数'] = gain
+        matching_rules[i]['覆盖顺序'] = rank
+    total_covered = order[-1][2] if order else 0
+    return total_covered, matching_rules
 
 def run_zou_only(rows):
     """仅走盘：上=0、下=0、走≥5（或放宽为≥4）的特征条件。"""
-    morphs = list(set((r['B'], r['D'], r['F']) for r in rows))
-    morphs = sorted(morphs, key=lambda m: -len([r for r in rows if (r['B'], r['D'], r['F']) == m]))
+    from range_index import RangeIndex
+
+    rows = as_dataset(rows)
+    morphs = rows.morphs_by_size()
+    index = RangeIndex(rows)
     results = []
     for morph in morphs:
         for n_cond in range(1, min(4, len(RED_CONDITIONS) + 1)):
@@ -373,9 +646,7 @@ def run_zou_only(rows):
                     continue
                 names = [c[0] for c in cond_combo]
                 kw = {c[1]: c[2] for c in cond_combo}
-                sub = filter_rows(rows, morph, **kw)
-                sub_unique = unique_by_game(sub)
-                n_total, shang, xia, zou, n_eff, main, conc = stats(sub_unique)
+                n_total, shang, xia, zou, n_eff, main, conc = stats_from_counts(*index.counts(morph, **kw))
                 if shang == 0 and xia == 0 and zou >= 1:
                     x_label = f"{morph[0]}/{morph[1]}/{morph[2]}"
                     feat = '，且'.join(names)
@@ -396,7 +667,7 @@ def _recompute_result_stats(rows, r):
     sub = filter_rows(rows, morph, **kw)
     sub_unique = unique_by_game(sub)
     n_total, shang, xia, zou, n_eff, main, conc = stats(sub_unique)
-    base = [x for x in rows if (x['B'], x['D'], x['F']) == morph]
+    base = as_dataset(rows).morph_rows(morph)
     total_base_u = len(unique_by_game(base))
     out = dict(r)
     out['总场次'] = n_total
@@ -410,8 +681,7 @@ def _recompute_result_stats(rows, r):
     return out
 
 def main():
-    data_path = 'docs/20252026欧洲FB.xlsx'
-    rows = load_xlsx(data_path)
+    rows = load_xlsx(DATA_PATH)
     print('等值纪录数:', len(rows))
 
     results = run_search(rows)
@@ -421,24 +691,27 @@ def main():
     results_checked = [_recompute_result_stats(rows, r) for r in results]
 
     out_path = '集中度分析结果.csv'
-    fieldnames = ['类型', '特征', '集中度', '符合条件样本数', '总场次', '占总场次比例', '上', '下', '走', '主要']
+    fieldnames = ['类型', '特征', '集中度', '符合条件样本数', '总场次', '占总场次比例', '上', '下', '走', '主要', 'p值', 'q值']
     with open(out_path, 'w', newline='', encoding='utf-8-sig') as f:
         w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
         w.writeheader()
         w.writerows(results_checked)
     print('已写入:', out_path)
     print('集中度>80% 且 样本≥5（或样本=4且100%）的规则数:', len(results_checked))
+    print('其中 q值<0.05（BH 校正后仍显著）的规则数:', sum(1 for r in results_checked if r['q值'] < 0.05))
 
     report = [
         '# 高集中度数据特征（仅含集中度>80%）',
         '# 集中度 = 主要结果/(上+下)，符合条件样本数 = 上+下。统计按场次去重。',
+        '# p值 = 主要结果场次/总场次 相对该形态基准比例（上/总场次 或 下/总场次）的双侧精确二项检验（与 rules.json 的 p_value 分母相同）；',
+        '# q值 = 对全部评估过的组合做 Benjamini–Hochberg 校正。',
         ''
     ]
     for r in results_checked:
         report.append(
             f"类型：{r['类型']}；特征：{r['特征']}；"
             f"集中度 {r['集中度']}%；符合条件样本数 {r['符合条件样本数']}；总场次 {r['总场次']}（占比{r['占总场次比例']}%）；"
-            f"上{r['上']}下{r['下']}走{r['走']}"
+            f"上{r['上']}下{r['下']}走{r['走']}；p值 {r['p值']}；q值 {r['q值']}"
         )
     report.append('')
     report.append('# ---------- 仅走盘的特征（上=0、下=0、走≥1） ----------')
@@ -462,7 +735,7 @@ def main():
     # 统计：集中度≥90% 且 走盘≥3 的比赛场次（去重，除去走盘）
     # 先只统计主/0/0 和 客/0/0
     target_morphs = [('主', '0', '0'), ('客', '0', '0')]
-    total_base = len([r for r in rows if (r['B'], r['D'], r['F']) in target_morphs])
+    total_base = rows.morph_count(target_morphs)
     print(f'\n--- 只统计主/0/0 和 客/0/0 形态（共 {total_base} 场）---')
     print('--- 统计：集中度≥90% 且 走盘≥3 的有效比赛场次（去重，除去走盘） ---')
     total_effective, high_conc_rules = count_high_conc_matches(rows, target_morphs=target_morphs)
@@ -481,6 +754,22 @@ def main():
     print(f'  - 去重率: {round((1 - total_effective / total_matched_effective) * 100, 1) if total_matched_effective > 0 else 0}%')
     print(f'  - 占基础数据的比例: {round(total_effective / total_base * 100, 1) if total_base > 0 else 0}%')
     
+    # 贪心覆盖：按「每次选新增最多的规则」的顺序，达到各覆盖率所需的最少规则数
+    cover_order = sorted((r for r in high_conc_rules if r['覆盖顺序']), key=lambda x: x['覆盖顺序'])
+    print(f'\n最少规则子集（贪心覆盖，覆盖率相对上面去重后的 {total_effective} 场）:')
+    reached = {}
+    cum = 0
+    for r in cover_order:
+        cum += r['新增有效场次数']
+        for ratio in COVER_TARGETS:
+            if ratio not in reached and cum >= ratio * total_effective:
+                reached[ratio] = r['覆盖顺序']
+    for ratio in COVER_TARGETS:
+        n_rules = reached.get(ratio)
+        print(f'  覆盖 {int(ratio * 100)}%：{n_rules} 条规则' if n_rules else f'  覆盖 {int(ratio * 100)}%：无规则')
+    for r in cover_order:
+        print(f"    {r['覆盖顺序']}. 类型：{r['类型']}；特征：{r['特征']}；新增 {r['新增有效场次数']}")
+
     print('\n符合条件的规则详情（全部显示）:')
     high_conc_rules.sort(key=lambda x: (-x['集中度'], -x['新增有效场次数'], -x['总场次']))
     for r in high_conc_rules:
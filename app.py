@@ -6,91 +6,133 @@ Web应用：判断新数据是否满足高集中度条件
 from flask import Flask, render_template, request, jsonify
 import sys
 import os
+import glob
+import fnmatch
+import tempfile
+import zipfile
+import time
+import threading
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from analyze_asia_concentration import load_xlsx, filter_rows, unique_by_game, RED_CONDITIONS, _no_duplicate_col, _RANGE_EPS
-from itertools import combinations
-from collections import Counter
+from analyze_asia_concentration import (DATA_PATH, FILTER_OPS, resolve_data_paths, load_xlsx, filter_rows,
+                                        unique_by_game, stats_from_counts)
+from collections import Counter, OrderedDict
+from range_index import RangeIndex
+from rebuild_jobs import RebuildJobs, SubmitError
+from rule_engine import MATCHERS, SNAPSHOT_PATH, build_rules, load_snapshot, web_morph_groups
 
 app = Flask(__name__)
 
-# 预加载数据和规则
-print("正在加载数据...")
-all_rows = load_xlsx('docs/20252026欧洲FB.xlsx')
-print(f"已加载 {len(all_rows)} 条数据")
-
-# 形态组：(D,F) = 0/0, 0/0.25, 0.25/0, 0.25/0.25, 0.5/0.25，主+客合并统计
-MORPH_GROUP_DF = [('0', '0'), ('0', '0.25'), ('0.25', '0'), ('0.25', '0.25'), ('0.5', '0.25')]
-
-def precompute_rules():
-    """预计算所有符合条件的规则（主+客 + 4种(D,F) 合并为一大组）"""
-    # 一大组：主与客各 4 种 (D,F)，共 8 个 morph，总场次与手动筛全表一致
-    target_morph_groups = [
-        [('主', d, f) for d, f in MORPH_GROUP_DF] + [('客', d, f) for d, f in MORPH_GROUP_DF],
-    ]
-    rules_85 = []  # 条件1：(上+走)或(下+走)比例>85%，总场次>6，差值>3
-    rules_80 = []  # 条件2：上/走/下任一比例>80%，总场次>4
-
-    for morph_group in target_morph_groups:
-        for n_cond in range(1, min(4, len(RED_CONDITIONS) + 1)):
-            for cond_combo in combinations(RED_CONDITIONS, n_cond):
-                if not _no_duplicate_col(cond_combo):
-                    continue
-
-                kw = {c[1]: c[2] for c in cond_combo}
-                matched = filter_rows(all_rows, morph_group, **kw)
-                if not matched:
-                    continue
-                matched_unique = unique_by_game(matched)
-                c = Counter(r['U'] for r in matched_unique)
-                shang, xia, zou = c.get('上', 0), c.get('下', 0), c.get('走', 0)
-                n_total = len(matched_unique)
-
-                if n_total == 0:
-                    continue
-
-                # 新条件1的计算
-                shang_zou_ratio = ((shang + zou) / n_total * 100) if n_total > 0 else 0
-                xia_zou_ratio = ((xia + zou) / n_total * 100) if n_total > 0 else 0
-
-                # 新条件2的计算
-                shang_ratio = (shang / n_total * 100) if n_total > 0 else 0
-                zou_ratio = (zou / n_total * 100) if n_total > 0 else 0
-                xia_ratio = (xia / n_total * 100) if n_total > 0 else 0
-
-                feat = '，且'.join([c[0] for c in cond_combo])
-                rule_info = {
-                    'morph': morph_group[0],  # 兼容前端显示
-                    'morph_group': morph_group,
-                    'feature': feat,
-                    'conditions': kw,
-                    'shang_zou_ratio': shang_zou_ratio,
-                    'xia_zou_ratio': xia_zou_ratio,
-                    'shang_ratio': shang_ratio,
-                    'zou_ratio': zou_ratio,
-                    'xia_ratio': xia_ratio,
-                    'n_total': n_total,
-                    'shang': shang,
-                    'xia': xia,
-                    'zou': zou,
-                }
-
-                # 新条件1
-                cond1_shang = shang_zou_ratio > 85 and n_total > 6 and (shang - zou) > 3
-                cond1_xia = xia_zou_ratio > 85 and n_total > 6 and (xia - zou) > 3
-                if cond1_shang or cond1_xia:
-                    rules_85.append(rule_info)
-
-                # 新条件2
-                if (shang_ratio > 80 or zou_ratio > 80 or xia_ratio > 80) and n_total > 4:
-                    rules_80.append(rule_info)
-
-    return rules_85, rules_80
-
-print("正在预计算规则...")
-rules_85, rules_80 = precompute_rules()
-print(f"已计算规则 - 条件1 [(上+走)或(下+走)>85%, 总场次>6, 差值>3]: {len(rules_85)} 条")
-print(f"已计算规则 - 条件2 [上/走/下任一>80%, 总场次>4]: {len(rules_80)} 条")
+# 启动状态：服务先监听端口，数据与规则在后台线程加载（phase: starting -> loading_data -> computing -> ready / error）
+STATE = {
+    'phase': 'starting',
+    'progress': 0.0,
+    'source': None,     # 'snapshot'（static/rules.json）或 'build'（现场计算）
+    'version': 0,       # 当前规则库的版本（与 LIBRARY['version'] 相同，供状态接口显示）
+    'error': None,
+    'rows_error': None,  # 快照模式下数据行加载失败的原因（规则库仍可用，只影响 /query 和前5条的重新统计）
+    'started_at': None,
+    'ready_at': None,
+}
+# 当前规则库；发布时整体替换（单次赋值，请求线程读到的要么是旧库、要么是新库）。
+# 版本号（每次发布 +1）放在同一个字典里，请求取一次 LIBRARY 就得到配套的规则与版本
+LIBRARY = {'rows': None, 'rules_85': [], 'rules_80': [], 'match_85': None, 'match_80': None, 'version': 0}
+# /check 的匹配实现：linear（逐条 check_conditions，默认）或 indexed（rule_engine.RuleMatcher），结果相同
+MATCHER = os.environ.get('MATCHER', 'linear')
+if MATCHER not in MATCHERS:
+    raise ValueError(f"未知的 MATCHER={MATCHER}（可用：{', '.join(MATCHERS)}）")
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+_publish_lock = threading.Lock()
+
+def _snapshot_is_fresh(path):
+    """快照存在且不早于所有数据文件时可直接使用（数据更新后需重新计算或重新导出）。"""
+    if not os.path.exists(path):
+        return False
+    mtime = os.path.getmtime(path)
+    try:
+        return all(os.path.getmtime(p) <= mtime for p in resolve_data_paths(DATA_PATH))
+    except OSError:
+        return True
+
+
+def _publish(rows, rules_85, rules_80, source):
+    global LIBRARY
+    make = MATCHERS[MATCHER]
+    match_85, match_80 = make(rules_85), make(rules_80)
+    with _publish_lock:
+        version = LIBRARY['version'] + 1
+        LIBRARY = {'rows': rows, 'rules_85': rules_85, 'rules_80': rules_80,
+                   'match_85': match_85, 'match_80': match_80, 'version': version}
+        STATE['version'] = version
+    STATE['source'] = source
+    if rows is not None:
+        STATE['rows_error'] = None
+
+
+def _attach_rows(rows):
+    """快照模式下数据行加载完：换入带数据行的规则库副本（版本不变，/check 缓存键含「数据行是否已加载」）。"""
+    global LIBRARY
+    with _publish_lock:
+        if LIBRARY['rows'] is None:
+            LIBRARY = dict(LIBRARY, rows=rows)
+
+
+def _set_phase(phase, progress):
+    STATE['phase'] = phase
+    STATE['progress'] = round(progress, 4)
+
+
+def warm_up():
+    """
+    后台预热：有新鲜的规则快照则先用快照立即就绪，再在后台加载数据行（/check 重新统计前5条时使用）；
+    没有快照则现场计算规则库。设置环境变量 APP_REBUILD=1 可忽略快照、强制重新计算，
+    RULES_SNAPSHOT 可指定其他快照文件（默认 static/rules.json）。
+    快照模式下数据行加载失败不影响就绪状态（/check 照常使用快照里的统计），原因记在 STATE['rows_error']。
+    """
+    STATE['started_at'] = time.time()
+    try:
+        snapshot = os.environ.get('RULES_SNAPSHOT', SNAPSHOT_PATH)
+        if os.environ.get('APP_REBUILD') != '1' and _snapshot_is_fresh(snapshot):
+            library = load_snapshot(snapshot)
+            rules_85, rules_80 = library['rules_85'], library['rules_80']
+            _publish(None, rules_85, rules_80, 'snapshot')
+            _set_phase('ready', 1.0)
+            STATE['ready_at'] = time.time()
+            print(f"已从快照加载规则: 条件1 {len(rules_85)} 条，条件2 {len(rules_80)} 条")
+            try:
+                rows = load_xlsx(DATA_PATH)
+            except Exception as e:
+                STATE['rows_error'] = str(e)
+                print(f"数据加载失败（规则库仍可用）: {e}")
+                return
+            _attach_rows(rows)
+            print(f"已加载 {len(rows)} 条数据")
+            return
+        rows, library = build_rules(progress=_set_phase)
+        _publish(rows, library['rules_85'], library['rules_80'], 'build')
+        _set_phase('ready', 1.0)
+        STATE['ready_at'] = time.time()
+    except Exception as e:
+        STATE['phase'] = 'error'
+        STATE['error'] = str(e)
+        print(f"规则库预热失败: {e}")
+
+
+def start_warm_up():
+    """启动后台预热线程（幂等）。"""
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name='rule-warm-up', daemon=True)
+            _warm_up_thread.start()
+
+
+@app.before_request
+def _ensure_warm_up():
+    # 以 WSGI 方式部署（不走 __main__）时，第一个请求（通常是健康检查）触发预热
+    start_warm_up()
+
 
 def parse_input_data(data):
     """解析用户输入的A-R列数据"""
@@ -121,181 +163,422 @@ def parse_input_data(data):
     except Exception as e:
         return None
 
-def check_conditions(row_data, rules):
-    """检查数据是否匹配规则"""
-    matched_rules = []
-    
-    # 提取关键字段
-    B = str(row_data.get('B', '')).strip()  # 主/客
-    D = str(row_data.get('D', '')).strip()  # 澳门
-    F = str(row_data.get('F', '')).strip()  # 马会
-    
-    # 只检查主/客
-    if B not in ('主', '客'):
-        return matched_rules
-    
-    morph = (B, D, F)
-    
-    # 提取数值列
-    def get_num(col):
-        val = row_data.get(col)
-        if val is None:
-            return None
-        if isinstance(val, (int, float)):
-            return val
-        if isinstance(val, str):
-            val = val.strip()
-            if not val:
-                return None
-        try:
-            return float(val)
-        except (ValueError, TypeError):
-            return None
-    
-    G, I, K, N, P, Q, R = get_num('G'), get_num('I'), get_num('K'), get_num('N'), get_num('P'), get_num('Q'), get_num('R')
-    
-    # 检查每个规则（当前行形态属于该规则的形态组则匹配）
-    for rule in rules:
-        group = rule.get('morph_group')
-        if group is None:
-            group = [rule['morph']]
-        if morph not in group:
-            continue
-
-        # 检查条件是否满足（使用浮点容差，与 filter_rows 一致）
-        match = True
-        e = _RANGE_EPS
-        for key, val in rule['conditions'].items():
-            col_name = key.split('_')[0]  # G_ge -> G
-            col_val = {'G': G, 'I': I, 'K': K, 'N': N, 'P': P, 'Q': Q, 'R': R}.get(col_name)
-            
-            if col_val is None:
-                match = False
-                break
-            
-            if key.endswith('_ge'):
-                if col_val < val - e:
-                    match = False
-                    break
-            elif key.endswith('_le'):
-                if col_val > val + e:
-                    match = False
-                    break
-            elif key.endswith('_gt'):
-                if col_val <= val - e:
-                    match = False
-                    break
-            elif key.endswith('_lt'):
-                if col_val >= val + e:
-                    match = False
-                    break
-            elif key.endswith('_range'):
-                if not (val[0] - e <= col_val <= val[1] + e):
-                    match = False
-                    break
-        
-        if match:
-            matched_rules.append(rule)
-    
-    return matched_rules
-
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def _status():
+    st = dict(STATE)
+    lib = LIBRARY
+    st['rules_85'] = len(lib['rules_85'])
+    st['rules_80'] = len(lib['rules_80'])
+    st['rows_loaded'] = lib['rows'] is not None
+    st['matcher'] = MATCHER
+    st['check_cache'] = check_cache.stats()
+    if st['started_at'] is not None:
+        st['uptime'] = round(time.time() - st['started_at'], 1)
+    return st
+
+@app.route('/healthz')
+def healthz():
+    """存活检查：进程在运行即返回 200，附带预热阶段与进度。"""
+    return jsonify(_status())
+
+@app.route('/readyz')
+def readyz():
+    """就绪检查：规则库可用时 200，否则 503（负载均衡据此决定是否转发流量）。"""
+    st = _status()
+    return jsonify(st), (200 if st['phase'] == 'ready' else 503)
+
+def _rule_stats(rule, rows):
+    """规则的实际统计（按形态组重新筛选、按场次去重）；数据行尚未加载完时用规则库里保存的统计。"""
+    if rows is None:
+        return rule['n_total'], rule['shang'], rule['xia'], rule['zou']
+    morph_arg = rule.get('morph_group') or [rule['morph']]
+    actual_matched = unique_by_game(filter_rows(rows, morph_arg, **rule['conditions']))
+    actual_c = Counter(r['U'] for r in actual_matched)
+    return len(actual_matched), actual_c.get('上', 0), actual_c.get('下', 0), actual_c.get('走', 0)
+
+class LRUCache:
+    """
+    有界 LRU 缓存（OrderedDict 按访问顺序排列，满了淘汰最久未用的一条），线程安全。
+    version 变化（规则库重新发布）时整体清空，保证不会返回旧规则库的结果。
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._data.clear()
+            self.version = version
+
+    def get(self, version, key):
+        with self._lock:
+            self._check_version(version)
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, version, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+        }
+
+
+# /check 结果缓存：同一场比赛常被反复提交，大小可用环境变量 CHECK_CACHE_SIZE 配置（0 表示不缓存）
+check_cache = LRUCache(int(os.environ.get('CHECK_CACHE_SIZE', '1024')))
+
+# 影响匹配的只有形态列和红色列条件列
+_CACHE_KEY_COLS = ('G', 'I', 'K', 'N', 'P', 'Q', 'R')
+
+def _check_cache_key(row_data, lib):
+    """规范化后的 (B, D, F, G, I, K, N, P, Q, R)，与 check_conditions 读取这些字段的方式一致；
+    另加「数据行是否已加载」（快照模式下前5条统计的来源不同）。"""
+    morph = tuple(str(row_data.get(c, '')).strip() for c in ('B', 'D', 'F'))
+    nums = tuple(v if isinstance(v, (int, float)) else None for v in (row_data.get(c) for c in _CACHE_KEY_COLS))
+    return morph + nums + (lib['rows'] is not None,)
+
 @app.route('/check', methods=['POST'])
 def check():
+    if STATE['phase'] != 'ready':
+        return jsonify({
+            'error': f"规则库正在预热（{STATE['phase']}，{STATE['progress'] * 100:.0f}%），请稍后再试"
+                     if STATE['phase'] != 'error' else f"规则库加载失败：{STATE['error']}",
+            'warming_up': STATE['phase'] != 'error',
+            'phase': STATE['phase'],
+            'progress': STATE['progress'],
+        }), 503
+    lib = LIBRARY
     try:
         data = request.json
         row_data = parse_input_data(data)
         
         if row_data is None:
             return jsonify({'error': '数据格式错误'}), 400
-        
-        # 检查两个条件
-        matched_85 = check_conditions(row_data, rules_85)
-        matched_80 = check_conditions(row_data, rules_80)
-        
-        result = {
-            'condition1': {
-                'matched': len(matched_85) > 0,
-                'count': len(matched_85),
-                'rules': []
-            },
-            'condition2': {
-                'matched': len(matched_80) > 0,
-                'count': len(matched_80),
-                'rules': []
-            }
+
+        # 版本取自与规则同一个字典：发布恰好发生在两次读取之间时，旧规则的结果也只会记在旧版本下
+        version = lib['version']
+        key = _check_cache_key(row_data, lib)
+        result = check_cache.get(version, key)
+        if result is None:
+            result = _check_result(row_data, lib)
+            check_cache.put(version, key, result)
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _check_result(row_data, lib):
+    """对一行数据检查两个条件，返回 /check 的响应内容。"""
+    # 检查两个条件
+    matched_85 = lib['match_85'](row_data)
+    matched_80 = lib['match_80'](row_data)
+    
+    result = {
+        'condition1': {
+            'matched': len(matched_85) > 0,
+            'count': len(matched_85),
+            'rules': []
+        },
+        'condition2': {
+            'matched': len(matched_80) > 0,
+            'count': len(matched_80),
+            'rules': []
         }
+    }
+    
+    # 添加匹配的规则信息（最多显示5条）
+    # 对于每个匹配的规则，重新筛选数据以显示实际结果
+    for rule in matched_85[:5]:
+        # 重新筛选数据（按形态组）、按场次去重后统计
+        actual_n_total, actual_shang, actual_xia, actual_zou = _rule_stats(rule, lib['rows'])
         
-        # 添加匹配的规则信息（最多显示5条）
-        # 对于每个匹配的规则，重新筛选数据以显示实际结果
-        for rule in matched_85[:5]:
-            # 重新筛选数据（按形态组）、按场次去重后统计
-            morph_arg = rule.get('morph_group') or [rule['morph']]
-            actual_matched = filter_rows(all_rows, morph_arg, **rule['conditions'])
-            actual_matched = unique_by_game(actual_matched)
-            actual_c = Counter(r['U'] for r in actual_matched)
-            actual_shang, actual_xia, actual_zou = actual_c.get('上', 0), actual_c.get('下', 0), actual_c.get('走', 0)
-            actual_n_total = len(actual_matched)
-            
-            # 计算新条件1的集中度显示值（取较大的一个比例）
-            actual_shang_zou_ratio = ((actual_shang + actual_zou) / actual_n_total * 100) if actual_n_total > 0 else 0
-            actual_xia_zou_ratio = ((actual_xia + actual_zou) / actual_n_total * 100) if actual_n_total > 0 else 0
-            actual_cond1_ratio = max(actual_shang_zou_ratio, actual_xia_zou_ratio)
-            
-            result['condition1']['rules'].append({
-                'feature': rule['feature'],
-                'conc': round(actual_cond1_ratio, 2),
-                'n_total': actual_n_total,
-                'shang': actual_shang,
-                'xia': actual_xia,
-                'zou': actual_zou,
-            })
+        # 计算新条件1的集中度显示值（取较大的一个比例）
+        actual_shang_zou_ratio = ((actual_shang + actual_zou) / actual_n_total * 100) if actual_n_total > 0 else 0
+        actual_xia_zou_ratio = ((actual_xia + actual_zou) / actual_n_total * 100) if actual_n_total > 0 else 0
+        actual_cond1_ratio = max(actual_shang_zou_ratio, actual_xia_zou_ratio)
         
-        for rule in matched_80[:5]:
-            # 重新筛选数据（按形态组）、按场次去重后统计
-            morph_arg = rule.get('morph_group') or [rule['morph']]
-            actual_matched = filter_rows(all_rows, morph_arg, **rule['conditions'])
-            actual_matched = unique_by_game(actual_matched)
-            actual_c = Counter(r['U'] for r in actual_matched)
-            actual_shang, actual_xia, actual_zou = actual_c.get('上', 0), actual_c.get('下', 0), actual_c.get('走', 0)
-            actual_n_total = len(actual_matched)
-            
-            # 计算新条件2的集中度显示值（取三者中最大的比例）
-            actual_shang_ratio = (actual_shang / actual_n_total * 100) if actual_n_total > 0 else 0
-            actual_zou_ratio = (actual_zou / actual_n_total * 100) if actual_n_total > 0 else 0
-            actual_xia_ratio = (actual_xia / actual_n_total * 100) if actual_n_total > 0 else 0
-            actual_cond2_ratio = max(actual_shang_ratio, actual_zou_ratio, actual_xia_ratio)
-            
-            result['condition2']['rules'].append({
-                'feature': rule['feature'],
-                'conc': round(actual_cond2_ratio, 2),
-                'n_total': actual_n_total,
-                'shang': actual_shang,
-                'xia': actual_xia,
-                'zou': actual_zou,
-            })
+        result['condition1']['rules'].append({
+            'feature': rule['feature'],
+            'conc': round(actual_cond1_ratio, 2),
+            'n_total': actual_n_total,
+            'shang': actual_shang,
+            'xia': actual_xia,
+            'zou': actual_zou,
+        })
+    
+    for rule in matched_80[:5]:
+        # 重新筛选数据（按形态组）、按场次去重后统计
+        actual_n_total, actual_shang, actual_xia, actual_zou = _rule_stats(rule, lib['rows'])
         
-        return jsonify(result)
+        # 计算新条件2的集中度显示值（取三者中最大的比例）
+        actual_shang_ratio = (actual_shang / actual_n_total * 100) if actual_n_total > 0 else 0
+        actual_zou_ratio = (actual_zou / actual_n_total * 100) if actual_n_total > 0 else 0
+        actual_xia_ratio = (actual_xia / actual_n_total * 100) if actual_n_total > 0 else 0
+        actual_cond2_ratio = max(actual_shang_ratio, actual_zou_ratio, actual_xia_ratio)
+        
+        result['condition2']['rules'].append({
+            'feature': rule['feature'],
+            'conc': round(actual_cond2_ratio, 2),
+            'n_total': actual_n_total,
+            'shang': actual_shang,
+            'xia': actual_xia,
+            'zou': actual_zou,
+        })
     
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return result
+
+# ---------------- /query：任意形态 + 条件的即时统计 ----------------
+
+# 具名形态组（/query 的 morph 可直接写组名）
+QUERY_MORPH_GROUPS = {
+    'web': web_morph_groups()[0],  # 网页规则库使用的形态组
+}
+# /query 返回的比赛字段
+_GAME_FIELDS = ('X', 'C', 'E', 'G', 'H', 'I', 'K', 'N', 'P', 'Q', 'R', 'S', 'T', 'U')
+_QUERY_GAME_LIMIT = 500
+
+_query_index = {'rows': None, 'index': None}
+_query_index_lock = threading.Lock()
+
+def _get_query_index(rows):
+    """当前数据行的 RangeIndex（数据行变化时重建一次，之后各形态的列索引按需懒建并复用）。"""
+    with _query_index_lock:
+        if _query_index['rows'] is not rows:
+            _query_index['index'] = RangeIndex(rows)
+            _query_index['rows'] = rows
+        return _query_index['index']
+
+def _parse_query_morph(spec):
+    """
+    /query 的 morph 参数 -> (B,D,F) 列表：
+    '客/0/0' 或 ['客','0','0'] 为单个形态；'0/0.25' 为该盘口的主+客；QUERY_MORPH_GROUPS 中的组名；
+    或以上写法组成的列表。无法识别时抛 ValueError。
+    """
+    if isinstance(spec, str):
+        s = spec.strip()
+        if s in QUERY_MORPH_GROUPS:
+            return list(QUERY_MORPH_GROUPS[s])
+        parts = [p.strip() for p in s.split('/')]
+        if len(parts) == 3:
+            return [tuple(parts)]
+        if len(parts) == 2:
+            return [('主', parts[0], parts[1]), ('客', parts[0], parts[1])]
+        raise ValueError(f'无法识别的形态：{spec}')
+    if isinstance(spec, (list, tuple)) and spec:
+        if len(spec) == 3 and all(isinstance(p, str) for p in spec) and spec[0] in ('主', '客'):
+            return [tuple(p.strip() for p in spec)]
+        out = []
+        for item in spec:
+            out.extend(_parse_query_morph(item))
+        return list(dict.fromkeys(out))
+    raise ValueError('缺少形态 morph')
+
+def _parse_query_conditions(spec):
+    """/query 的 conditions 参数 -> filter_rows 关键字参数。未识别的键、非数值的阈值抛 ValueError（不静默忽略）。"""
+    if spec is None:
+        return {}
+    if not isinstance(spec, dict):
+        raise ValueError('conditions 应为 {条件键: 阈值} 对象')
+    out = {}
+    for k, v in spec.items():
+        if k not in FILTER_OPS:
+            raise ValueError(f'未识别的条件：{k}（可用：{", ".join(FILTER_OPS)}）')
+        if v is None:
+            continue
+        try:
+            if FILTER_OPS[k][1] == 'range':
+                if not isinstance(v, (list, tuple)) or len(v) != 2:
+                    raise ValueError
+                out[k] = (float(v[0]), float(v[1]))
+            else:
+                out[k] = float(v)
+        except (TypeError, ValueError):
+            raise ValueError(f'条件 {k} 的阈值无效：{v!r}')
+    return out
+
+def _game_view(r):
+    g = {c: r.get(c) for c in _GAME_FIELDS}
+    if g['C'] is not None:
+        g['C'] = g['C'].isoformat(sep=' ')
+    g['source'] = os.path.basename(r.get('source') or '')
+    return g
+
+@app.route('/query', methods=['POST'])
+def query():
+    """
+    即时统计：{"morph": "客/0/0" | ["主/0/0", "客/0/0"] | "web", "conditions": {"K_gt": 3.25, "Q_lt": -0.05},
+    "include_games": false}。条件写法与 filter_rows 相同；按场次去重后返回上/下/走、
+    集中度（主要/(上+下)）及网页条件1/条件2 的含走比例，include_games 时附匹配的比赛（最多 500 场）。
+    """
+    t0 = time.perf_counter()
+    lib = LIBRARY
+    rows = lib['rows']
+    if rows is None:
+        error = STATE['rows_error'] or (STATE['error'] if STATE['phase'] == 'error' else None)
+        return jsonify({
+            'error': f"数据加载失败：{error}" if error else f"数据正在加载（{STATE['phase']}），请稍后再试",
+            'warming_up': error is None,
+        }), 503
+    data = request.get_json(silent=True) or {}
+    try:
+        morph = _parse_query_morph(data.get('morph'))
+        conditions = _parse_query_conditions(data.get('conditions'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    index = _get_query_index(rows)
+    n_total, shang, xia, zou = index.counts(morph, **conditions)
+    _, _, _, _, n_eff, main, conc = stats_from_counts(n_total, shang, xia, zou)
+    result = {
+        'morph': ['/'.join(m) for m in morph],
+        'conditions': conditions,
+        'n_total': n_total, 'shang': shang, 'xia': xia, 'zou': zou,
+        'n_eff': n_eff,
+        'main': main,
+        'conc': conc,
+        'cond1_ratio': round(max(shang + zou, xia + zou) / n_total * 100, 2) if n_total else 0,
+        'cond2_ratio': round(max(shang, xia, zou) / n_total * 100, 2) if n_total else 0,
+        'base_total': index.counts(morph)[0],
+        'version': lib['version'],
+    }
+    if data.get('include_games'):
+        games = index.rows(morph, **conditions)
+        result['games'] = [_game_view(r) for r in games[:_QUERY_GAME_LIMIT]]
+        result['games_truncated'] = len(games) > _QUERY_GAME_LIMIT
+    result['elapsed_ms'] = round((time.perf_counter() - t0) * 1000, 2)
+    return jsonify(result)
+
+# ---------------- 上传工作簿、后台重建规则库 ----------------
+
+# 上传文件大小上限（MB）
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('UPLOAD_MAX_MB', '64')) << 20
+# 设置后 /upload 须带请求头 X-Upload-Token；未设置时只接受本机（127.0.0.1 / ::1）的上传
+UPLOAD_TOKEN = os.environ.get('UPLOAD_TOKEN')
+
+rebuild_jobs = RebuildJobs(
+    on_publish=lambda rows, library: _publish(rows, library['rules_85'], library['rules_80'], 'upload'),
+    data_path=DATA_PATH,
+)
+
+def _upload_allowed():
+    if UPLOAD_TOKEN:
+        return request.headers.get('X-Upload-Token') == UPLOAD_TOKEN
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+def _upload_target(filename, requested):
+    """
+    上传的工作簿替换哪个数据文件：数据只有一个文件且未指定 target 时替换它；
+    否则按文件名替换同名的数据文件，或作为新文件放在数据目录（须被 ASIA_DATA 的通配符匹配，否则重建时读不到）。
+    """
+    paths = resolve_data_paths(DATA_PATH)
+    if not requested and len(paths) == 1:
+        return paths[0]
+    name = requested or filename
+    if os.path.basename(name) != name or name.startswith('.') or not name.lower().endswith('.xlsx'):
+        raise ValueError(f'无效的工作簿文件名：{name}')
+    for p in paths:
+        if os.path.basename(p) == name:
+            return p
+    target = os.path.join(os.path.dirname(paths[0]), name)
+    specs = [p for p in DATA_PATH.split(os.pathsep) if p]
+    if any(glob.has_magic(spec) and fnmatch.fnmatch(target, spec) for spec in specs):
+        return target
+    raise ValueError(f'{name} 不是当前数据文件，也不匹配 ASIA_DATA（{DATA_PATH}）')
+
+@app.route('/upload', methods=['POST'])
+def upload():
+    """
+    上传新的数据工作簿（multipart 字段 file，可选字段 target 指定替换的数据文件名），
+    在后台工作进程中重新解析并生成规则库，完成后原子发布。立即返回 202 和任务状态，用 /jobs/<id> 轮询进度。
+    """
+    if not _upload_allowed():
+        return jsonify({'error': '没有上传权限'}), 403
+    # 数据行加载失败（rows_error）时允许上传，用新工作簿修复
+    if STATE['phase'] != 'ready' or (LIBRARY['rows'] is None and not STATE['rows_error']):
+        return jsonify({'error': f"规则库正在预热（{STATE['phase']}），请稍后再试", 'warming_up': True}), 503
+    if rebuild_jobs.busy():
+        return jsonify({'error': '已有规则库重建任务在运行', 'jobs': rebuild_jobs.list()[:1]}), 409
+    f = request.files.get('file')
+    if f is None or not f.filename:
+        return jsonify({'error': '缺少上传文件（字段 file）'}), 400
+    try:
+        target = _upload_target(os.path.basename(f.filename), request.form.get('target'))
+    except (ValueError, OSError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    # 先存到数据目录下的临时文件（与目标同一文件系统，os.replace 为原子操作），检查是 xlsx（zip）后再替换
+    fd, tmp = tempfile.mkstemp(prefix='.upload-', suffix='.xlsx', dir=os.path.dirname(target) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            f.save(out)
+        if not zipfile.is_zipfile(tmp):
+            raise ValueError('上传的文件不是 xlsx 工作簿')
+        job = rebuild_jobs.submit(tmp, target, f.filename)
+    except ValueError as e:
+        os.remove(tmp)
+        return jsonify({'error': str(e)}), 400
+    except SubmitError as e:
+        # 上传文件已换入后又被换回，临时文件不存在了
+        return jsonify({'error': str(e), 'jobs': rebuild_jobs.list()[:1]}), 503
+    except RuntimeError as e:
+        os.remove(tmp)
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'job': job, 'status_url': f"/jobs/{job['id']}"}), 202
+
+@app.route('/jobs')
+def jobs():
+    """最近的规则库重建任务（新的在前）。"""
+    return jsonify({'jobs': rebuild_jobs.list(), 'version': STATE['version']})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """重建任务的状态与进度：status 为 queued / running / done / error，phase 为当前阶段，progress 为 0~1。"""
+    job = rebuild_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'任务不存在：{job_id}'}), 404
+    return jsonify(dict(job, version=STATE['version']))
 
 if __name__ == '__main__':
+    port = int(os.environ.get('PORT', '5000'))
+    start_warm_up()
     print("\n" + "=" * 60)
     print("Web应用已启动！")
     print("=" * 60)
-    print("请在浏览器中访问：http://localhost:5000")
+    print(f"请在浏览器中访问：http://localhost:{port}")
     print("按 Ctrl+C 停止服务器")
     print("=" * 60 + "\n")
     try:
-        app.run(debug=True, host='127.0.0.1', port=5000, use_reloader=False)
+        app.run(debug=True, host='127.0.0.1', port=port, use_reloader=False)
     except OSError as e:
         if "Address already in use" in str(e):
-            print(f"\n错误：端口5000已被占用，请尝试：")
-            print("1. 关闭占用5000端口的程序")
-            print("2. 或修改app.py中的端口号")
+            print(f"\n错误：端口{port}已被占用，请尝试：")
+            print(f"1. 关闭占用{port}端口的程序")
+            print("2. 或用环境变量 PORT 指定其他端口")
         else:
             print(f"\n启动错误：{e}")
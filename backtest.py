@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滚动回测（walk-forward）：检验 AI 规则在「发现之后」的比赛上是否仍然成立。
+- 数据按 C 列日期排序（无日期的行不参与）；
+- 每个窗口：在训练区间 [t, t+训练天数) 上按条件1/条件2 搜索规则（与 rule_engine.generate_rules 相同：
+  主+客、MORPH_GROUP_DF 合并为一大组，红色列条件 1～3 列组合），
+  再在紧随其后的测试区间上统计这些规则匹配的场次和命中率；窗口每次前移 step 天。
+- 排序后每个区间都是一段连续行号：条件掩码全程只算一次，每个窗口只把掩码截取到窗口范围，
+  每个组合只需几次按位与 + popcount，不必每个窗口从头筛选。
+- 场次去重在每个区间内单独进行（区间内同一场次只计第一条），与对该区间单独调用 unique_by_game 一致。
+
+命中率（按测试场次计，一场比赛被多条规则匹配也只计一次）：
+- 每场比赛的预测为匹配它的规则的预测结果；匹配规则的预测不一致时记为冲突场次，不计入命中率；
+- 条件1 预测方向 X（(X+走) 比例>85%）：命中率 = X / (上+下)，走盘退本不计；
+- 条件2 预测占比>80% 的结果 X：命中率 = X / 总场次。
+训练区间内是否成为规则完全由 rule_engine.CRITERIA 的判定函数决定（含最少场次要求）。
+"""
+import argparse
+import csv
+from datetime import timedelta
+
+from analyze_asia_concentration import (
+    DATA_PATH,
+    Dataset,
+    RED_CONDITIONS,
+    _game_key,
+    load_xlsx,
+)
+from mask_index import MaskIndex, mask_from_flags
+from rule_engine import CRITERIA, condition_combos, web_morph_groups
+
+
+def _hit_stats(criterion, pred, shang, xia, zou):
+    """返回 (命中场次, 计入分母的场次)。"""
+    hit = {'上': shang, '下': xia, '走': zou}[pred]
+    if criterion == 'rules_85':
+        return hit, shang + xia
+    return hit, shang + xia + zou
+
+
+def walk_forward(rows, train_days=120, test_days=14, step_days=None, morph_group=None):
+    """
+    逐窗口回测，返回每个窗口的结果字典列表（每个窗口 × 每个条件一条）。
+    morph_group 默认与网页规则库相同（主+客 × MORPH_GROUP_DF）。
+    train_days、test_days、step_days（默认等于 test_days）须为正数，否则抛 ValueError。
+    """
+    step_days = test_days if step_days is None else step_days
+    if min(train_days, test_days, step_days) <= 0:
+        raise ValueError('训练、测试窗口和前移天数都须为正数')
+    if morph_group is None:
+        morph_group = web_morph_groups()[0]
+
+    dated = sorted((r for r in rows if r.get('C') is not None), key=lambda r: r['C'])
+    data = Dataset(dated)
+    if not data:
+        return []
+    index = MaskIndex(data)
+    dates = [r['C'] for r in data]
+    n = len(data)
+
+    # prev[i]：与第 i 行同场次的上一行行号（没有则 -1），用于求「区间内第一次出现」
+    prev, last = [], {}
+    for i, r in enumerate(data):
+        k = _game_key(r)
+        prev.append(last.get(k, -1))
+        last[k] = i
+
+    group_mask = index.morph_mask(morph_group)
+    combos = condition_combos()
+    cond_masks = {}
+    for c in RED_CONDITIONS:
+        cm = index.cond_mask(c[1], c[2])
+        cond_masks[c] = group_mask if cm is None else group_mask & cm
+    om = index.outcome_masks
+
+    def first_in(a, b):
+        """区间 [a, b) 内每个场次第一次出现的行（相对 a 的掩码）。"""
+        return mask_from_flags(prev[i] < a for i in range(a, b))
+
+    def bisect_date(d, lo=0):
+        hi = n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if dates[mid] < d:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    results = []
+    start = dates[0]
+    while True:
+        train_end = start + timedelta(days=train_days)
+        test_end = train_end + timedelta(days=test_days)
+        a = bisect_date(start)
+        b = bisect_date(train_end, a)
+        c = bisect_date(test_end, b)
+        if b >= n:
+            break
+        span = (1 << (c - a)) - 1
+        train_first = first_in(a, b)
+        test_first = first_in(b, c) << (b - a)
+        local = {k: (m >> a) & span for k, m in cond_masks.items()}
+        local_om = {u: (m >> a) & span for u, m in om.items()}
+
+        found = {crit: [] for crit in CRITERIA}
+        for combo in combos:
+            m = local[combo[0]]
+            for cond in combo[1:]:
+                m &= local[cond]
+            tm = m & train_first
+            n_total = tm.bit_count()
+            if n_total == 0:
+                continue
+            shang = (tm & local_om['上']).bit_count()
+            xia = (tm & local_om['下']).bit_count()
+            zou = n_total - shang - xia
+            for crit, fn in CRITERIA.items():
+                pred = fn(shang, xia, zou, n_total)
+                if pred is not None:
+                    found[crit].append((pred, m & test_first))
+
+        for crit, rules in found.items():
+            # 每种预测结果的测试场次并集：同一场比赛只计一次
+            by_pred = {}
+            active = 0
+            for pred, test_m in rules:
+                if test_m:
+                    active += 1
+                    by_pred[pred] = by_pred.get(pred, 0) | test_m
+            covered = conflict = 0
+            for m in by_pred.values():
+                conflict |= covered & m
+                covered |= m
+            hits = total = 0
+            for pred, m in by_pred.items():
+                m &= ~conflict
+                h, t = _hit_stats(
+                    crit, pred,
+                    (m & local_om['上']).bit_count(),
+                    (m & local_om['下']).bit_count(),
+                    (m & local_om['走']).bit_count(),
+                )
+                hits += h
+                total += t
+            results.append({
+                '训练开始': start.date().isoformat(),
+                '测试开始': train_end.date().isoformat(),
+                '测试结束': test_end.date().isoformat(),
+                '条件': crit,
+                '训练场次': train_first.bit_count(),
+                '测试场次': test_first.bit_count(),
+                '规则数': len(rules),
+                '测试中触发规则数': active,
+                '测试覆盖场次': covered.bit_count(),
+                '冲突场次': conflict.bit_count(),
+                '命中': hits,
+                '计数': total,
+                '命中率': round(hits / total * 100, 2) if total else None,
+            })
+        if c >= n:
+            break
+        start = start + timedelta(days=step_days)
+    return results
+
+
+def _positive_int(s):
+    v = int(s)
+    if v <= 0:
+        raise argparse.ArgumentTypeError(f'须为正整数：{s}')
+    return v
+
+
+def main():
+    ap = argparse.ArgumentParser(description='AI 规则滚动回测（按 C 列日期）')
+    ap.add_argument('--train-days', type=_positive_int, default=120, help='训练窗口天数')
+    ap.add_argument('--test-days', type=_positive_int, default=14, help='测试窗口天数')
+    ap.add_argument('--step-days', type=_positive_int, default=None, help='窗口前移天数（默认等于测试窗口）')
+    ap.add_argument('--out', default='回测结果.csv')
+    args = ap.parse_args()
+
+    rows = load_xlsx(DATA_PATH)
+    n_dated = sum(1 for r in rows if r.get('C') is not None)
+    print(f'数据: {DATA_PATH}，共 {len(rows)} 行，其中有日期 {n_dated} 行')
+    results = walk_forward(rows, args.train_days, args.test_days, args.step_days)
+
+    fieldnames = ['训练开始', '测试开始', '测试结束', '条件', '训练场次', '测试场次',
+                  '规则数', '测试中触发规则数', '测试覆盖场次', '冲突场次', '命中', '计数', '命中率']
+    with open(args.out, 'w', newline='', encoding='utf-8-sig') as f:
+        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w.writeheader()
+        w.writerows(results)
+    print('已写入:', args.out)
+    for r in results:
+        rate = '—' if r['命中率'] is None else f"{r['命中率']}%"
+        print(f"  {r['测试开始']}~{r['测试结束']} {r['条件']}：规则 {r['规则数']} 条（触发 {r['测试中触发规则数']}），"
+              f"覆盖 {r['测试覆盖场次']}/{r['测试场次']} 场（冲突 {r['冲突场次']}），命中 {r['命中']}/{r['计数']} = {rate}")
+
+
+if __name__ == '__main__':
+    main()
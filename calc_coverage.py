@@ -5,34 +5,55 @@
 1. 除去走盘的，集中度≥90%的比赛场次有多少
 2. 算上走盘，集中度≥80%的比赛场次有多少
 重叠的场次只按1计算（去重）
+候选规则的匹配行由 MaskIndex 的单条件掩码按位与得到（不逐条 filter_rows），
+每条规则匹配的场次记为位掩码（每个场次一位），并集用按位或；
+另按贪心覆盖（每次选新增场次最多的规则）给出达到各覆盖率所需的最少规则子集。
 """
 import sys
 sys.path.insert(0, '/Users/sorari/Desktop/apps/ly')
-from analyze_asia_concentration import load_xlsx, filter_rows, RED_CONDITIONS, _no_duplicate_col
+from analyze_asia_concentration import DATA_PATH, load_xlsx, RED_CONDITIONS, COVER_TARGETS, _no_duplicate_col
+from mask_index import MaskIndex, greedy_cover, iter_bits, mask_from_positions, rules_needed
 from itertools import combinations
-from collections import defaultdict, Counter
+from collections import Counter
 
-def get_matching_rows(rows, morph, cond_combo):
-    """根据条件组合，返回匹配的比赛行（原始数据行）。"""
-    if not _no_duplicate_col(cond_combo):
-        return []
-    kw = {c[1]: c[2] for c in cond_combo}
-    return filter_rows(rows, morph, **kw)
+def cover_report(title, rules, union_mask):
+    """贪心覆盖报告：rules 为 [(规则描述, 场次掩码)]，返回 (汇总行, 按选中顺序的规则明细行)。"""
+    order = greedy_cover([m for _, m in rules], universe=union_mask)
+    total = union_mask.bit_count()
+    lines = [f"{title}：候选规则 {len(rules)} 条，覆盖 {total} 场"]
+    for ratio, n in rules_needed(order, total, COVER_TARGETS).items():
+        lines.append(f"  覆盖 {int(ratio * 100)}%：最少 {n} 条规则（贪心）" if n else f"  覆盖 {int(ratio * 100)}%：无规则")
+    detail = [f"  {k:3d}. {rules[i][0]}；新增 {gain} 场，累计 {cum} 场" for k, (i, gain, cum) in enumerate(order, 1)]
+    return lines, detail
 
 def calc_stats():
-    rows = load_xlsx('docs/20252026欧洲FB.xlsx')
+    rows = load_xlsx(DATA_PATH)
     
     # 只分析主/0/0和客/0/0
     target_morphs = [('主', '0', '0'), ('客', '0', '0')]
     
     # 为每场比赛创建唯一标识（使用行号索引，因为同一场比赛可能有多行数据）
-    # 但我们需要用实际数据字段来标识：B, D, F, S(强分), T(弱分), U(结果)
+    # 但我们需要用实际数据字段来标识：B, D, F, S(强分), T(弱分)，以及来源文件（多工作簿合并时区分赛季）
     def get_game_id(r):
-        return (r['B'], r['D'], r['F'], r.get('S'), r.get('T'))
+        return (r['B'], r['D'], r['F'], r.get('S'), r.get('T'), r.get('source'))
     
-    # 收集所有符合条件的规则匹配的比赛
-    games_no_zou_90 = set()  # 不含走，集中度≥90%的比赛
-    games_with_zou_80 = set()  # 含走，集中度≥80%的比赛
+    # 目标形态下每个场次分配一个位
+    game_bit = {}
+    for r in rows.morph_rows(target_morphs):
+        game_bit.setdefault(get_game_id(r), len(game_bit))
+    n_games = len(game_bit)
+
+    # 行掩码（与 filter_rows 结果一致，未去重）-> 场次掩码
+    index = MaskIndex(rows)
+    om = index.outcome_masks
+    game_of_row = [game_bit.get(get_game_id(r)) for r in index.rows]
+
+    def games_mask(row_mask):
+        return mask_from_positions({game_of_row[i] for i in iter_bits(row_mask)}, n_games)
+
+    # 收集所有符合条件的规则匹配的比赛（每条规则一个场次掩码）
+    rules_90 = []  # 不含走，集中度≥90%：[(规则描述, 场次掩码)]
+    rules_80 = []  # 含走，集中度≥80%
     
     print("正在分析所有规则...")
     
@@ -47,33 +68,31 @@ def calc_stats():
                 if not _no_duplicate_col(cond_combo):
                     continue
                 
-                matched = get_matching_rows(rows, morph, cond_combo)
+                matched = index.filter_mask(morph, **{c[1]: c[2] for c in cond_combo})
                 if not matched:
                     continue
                 
-                # 计算集中度
-                c = Counter(r['U'] for r in matched)
-                shang, xia, zou = c.get('上', 0), c.get('下', 0), c.get('走', 0)
+                # 计算集中度（按匹配行计，与逐行统计 U 列相同）
+                n_total = matched.bit_count()
+                shang, xia, zou = ((matched & om[u]).bit_count() for u in ('上', '下', '走'))
                 n_eff = shang + xia
                 if n_eff == 0:
                     continue
                 
                 main_val = max(shang, xia)
                 conc_no_zou = (main_val / n_eff * 100) if n_eff > 0 else 0
-                conc_with_zou = (main_val / len(matched) * 100) if len(matched) > 0 else 0
+                conc_with_zou = (main_val / n_total * 100) if n_total > 0 else 0
                 
                 # 如果规则满足条件，记录所有匹配的比赛（第一部分要求上/下/走至少有一项≥5）
-                n_total = len(matched)
                 at_least_5 = shang >= 5 or xia >= 5 or zou >= 5
                 # 第一部分：集中度≥85%，总场次≥6，且上/下/走至少有一项≥5
+                label = f"{morph_label}；{'，且'.join(c[0] for c in cond_combo)}"
                 if conc_no_zou >= 85 and n_total >= 6 and at_least_5:
-                    for r in matched:
-                        games_no_zou_90.add(get_game_id(r))
+                    rules_90.append((label, games_mask(matched)))
                 
                 # 第二部分：集中度≥80%，总场次≥5（不要求上/下/走≥5）
                 if conc_with_zou >= 80 and n_total >= 5:
-                    for r in matched:
-                        games_with_zou_80.add(get_game_id(r))
+                    rules_80.append((label, games_mask(matched)))
                 
                 rule_count += 1
         
@@ -85,14 +104,21 @@ def calc_stats():
     print("条件：第一部分 集中度≥85%，总场次≥6（且上/下/走至少有一项≥5）；第二部分 集中度≥80%，总场次≥5")
     print("=" * 60)
 
+    games_no_zou_90 = 0
+    for _, m in rules_90:
+        games_no_zou_90 |= m
+    games_with_zou_80 = 0
+    for _, m in rules_80:
+        games_with_zou_80 |= m
+
     # 有规则的比赛（任一条或多条符合，去重）
-    total_unique_games = len(set(get_game_id(r) for r in [r for r in rows if (r['B'], r['D'], r['F']) in target_morphs]))
+    total_unique_games = n_games
     games_any = games_no_zou_90 | games_with_zou_80
-    n_any = len(games_any)
+    n_any = games_any.bit_count()
     print(f"\n有规则的比赛（任一条或多条符合，去重）: {n_any} 场 / {total_unique_games} 场")
     
     # 找出这些比赛的实际数据
-    all_target_rows = [r for r in rows if (r['B'], r['D'], r['F']) in target_morphs]
+    all_target_rows = rows.morph_rows(target_morphs)
 
     games_90_list = []
     games_80_list = []
@@ -102,10 +128,11 @@ def calc_stats():
     
     for r in all_target_rows:
         gid = get_game_id(r)
-        if gid in games_no_zou_90 and gid not in seen_90:
+        bit = 1 << game_bit[gid]
+        if games_no_zou_90 & bit and gid not in seen_90:
             games_90_list.append(r)
             seen_90.add(gid)
-        if gid in games_with_zou_80 and gid not in seen_80:
+        if games_with_zou_80 & bit and gid not in seen_80:
             games_80_list.append(r)
             seen_80.add(gid)
     
@@ -136,8 +163,8 @@ def calc_stats():
     print(f"   说明：这些场次至少被一个'含走集中度≥80%且总场次≥5'的规则匹配")
     
     # 统计总场次
-    total_main00 = len([r for r in rows if (r['B'], r['D'], r['F']) == ('主', '0', '0')])
-    total_ke00 = len([r for r in rows if (r['B'], r['D'], r['F']) == ('客', '0', '0')])
+    total_main00 = rows.morph_count(('主', '0', '0'))
+    total_ke00 = rows.morph_count(('客', '0', '0'))
     total_all = total_main00 + total_ke00
     
     print(f"\n总场次统计：")
@@ -148,6 +175,15 @@ def calc_stats():
     print(f"\n覆盖率：")
     print(f"  集中度≥85%（不含走，总场次≥6）: {n_total_90}/{total_all} = {n_total_90/total_all*100:.1f}%")
     print(f"  集中度≥80%（含走，总场次≥5）: {n_total_80}/{total_all} = {n_total_80/total_all*100:.1f}%")
+
+    # 贪心覆盖：达到各覆盖率（相对该部分规则覆盖的全部场次）所需的最少规则子集
+    cover_lines = []
+    print("\n最少规则子集：")
+    for title, rules, union_mask in (("第一部分（不含走，集中度≥85%）", rules_90, games_no_zou_90),
+                                     ("第二部分（含走，集中度≥80%）", rules_80, games_with_zou_80)):
+        summary, detail = cover_report(title, rules, union_mask)
+        print("\n".join(summary))
+        cover_lines.extend(summary + detail)
     
     # 输出详细比赛信息到txt文件
     output_lines = []
@@ -231,6 +267,10 @@ def calc_stats():
     output_lines.append(f"总场次：主/0/0 {total_main00} 场，客/0/0 {total_ke00} 场，合计 {total_all} 场")
     output_lines.append(f"集中度≥90%（不含走）: {n_total_90} 场，覆盖率 {n_total_90/total_all*100:.1f}%")
     output_lines.append(f"集中度≥80%（含走）: {n_total_80} 场，覆盖率 {n_total_80/total_all*100:.1f}%")
+    output_lines.append("")
+    output_lines.append("最少规则子集（贪心覆盖，每次选新增场次最多的规则）")
+    output_lines.append("-" * 80)
+    output_lines.extend(cover_lines)
     
     # 写入文件
     output_file = '主客00高集中度场次详情.txt'
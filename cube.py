@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按红色列分箱的结果数据立方体：形态组 × 至多 3 列的分箱单元格，预先统计 上/下/走 场次数（按场次去重），
+任意阈值组合的计数 = 超矩形内单元格之和，用多维前缀和做 2^d 次查表得到，不再扫描行。
+
+分箱：每列的切分点取 RED_CONDITIONS 中该列全部条件的边界（已按 filter_rows 的容差方向换算）：
+- 键 (b, 0) 表示「x ≥ b」的边界，(b, 1) 表示「x > b」的边界；
+- 取值 x 的箱号 = bisect_right(切分点, (x, 0.5))，即满足的边界个数；None / NaN 单独一箱（不满足任何条件）。
+因此每个条件恰好对应一段连续的箱号区间，与 filter_rows 的逐行判断完全一致。
+
+立方体按 (形态组, 条件列) 懒建，前缀和存为 array('i')；总大小受内存预算限制（max_bytes，
+默认取环境变量 CUBE_MEMORY_MB，64 MB），超出时淘汰最久未用的立方体。
+阈值不在切分点上、条件超过 3 列或单个立方体超预算的查询无法回答，counts 返回 None，由调用方回退到逐行/位掩码统计。
+"""
+import os
+from array import array
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from itertools import accumulate, product
+
+from analyze_asia_concentration import RED_CONDITIONS, as_dataset, _game_key, morph_keys, _RANGE_EPS
+from range_index import conditions_by_column
+
+MAX_COLUMNS = 3
+_CODES = {'上': 0, '下': 1, '走': 2}  # 其他结果记为 3，只计入总场次
+
+
+def _boundary_keys(op, v):
+    """单个条件涉及的切分点：[(键, 条件在键的哪一侧)]，侧 'above' 表示满足条件的箱号 > 键的位置。"""
+    e = _RANGE_EPS
+    if op == 'ge':
+        return [((v - e, 0), 'above')]
+    if op == 'gt':
+        return [((v + e, 1), 'above')]
+    if op == 'gt_loose':
+        return [((v - e, 1), 'above')]
+    if op == 'le':
+        return [((v + e, 1), 'below')]
+    if op == 'lt':
+        return [((v - e, 0), 'below')]
+    return [((v[0] - e, 0), 'above'), ((v[1] + e, 1), 'below')]
+
+
+def _valid(x):
+    return x is not None and x == x
+
+
+class OutcomeCube:
+    """rows 上的分箱结果立方体；conditions 为 (显示名, 条件键, 阈值) 列表，决定切分点（默认 RED_CONDITIONS）。"""
+
+    def __init__(self, rows, conditions=None, max_bytes=None):
+        rows = as_dataset(rows)
+        self.dataset = rows
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('CUBE_MEMORY_MB', '64')) * 1024 * 1024)
+        self.max_bytes = max_bytes
+
+        keys = {}
+        for _, k, v in (RED_CONDITIONS if conditions is None else conditions):
+            for col, conds in conditions_by_column({k: v}).items():
+                for op, cv in conds:
+                    keys.setdefault(col, set()).update(key for key, _ in _boundary_keys(op, cv))
+        self.cuts = {col: sorted(s) for col, s in keys.items()}
+        self.cut_pos = {col: {key: i for i, key in enumerate(cut)} for col, cut in self.cuts.items()}
+
+        seen = set()
+        self._first = set()
+        for i, r in enumerate(rows):
+            k = _game_key(r)
+            if k not in seen:
+                seen.add(k)
+                self._first.add(i)
+        self._cubes = OrderedDict()
+        self.nbytes = 0
+        self._plans = {}
+        self._groups = {}
+
+    # ---- 分箱 ----
+    def n_bins(self, col):
+        """该列的取值箱数（不含 None 箱；None 箱的箱号等于此值）。"""
+        return len(self.cuts[col]) + 1
+
+    def bin_of(self, col, x):
+        return bisect_right(self.cuts[col], (x, 0.5)) if _valid(x) else self.n_bins(col)
+
+    def bin_range(self, col, conds):
+        """同一列若干 (op, v) 条件对应的箱号区间 [lo, hi)；阈值不是切分点时返回 None。"""
+        pos = self.cut_pos.get(col)
+        if pos is None:
+            return None
+        lo, hi = 0, self.n_bins(col)
+        for op, v in conds:
+            for key, side in _boundary_keys(op, v):
+                p = pos.get(key)
+                if p is None:
+                    return None
+                if side == 'above':
+                    lo = max(lo, p + 1)
+                else:
+                    hi = min(hi, p + 1)
+        return lo, max(lo, hi)
+
+    # ---- 立方体 ----
+    def _dims(self, cols):
+        # 每维：前缀补零 + 取值箱 + None 箱
+        return [self.n_bins(c) + 2 for c in cols]
+
+    def _strides(self, cols):
+        dims = self._dims(cols)
+        strides = [1] * len(dims)
+        for a in range(len(dims) - 2, -1, -1):
+            strides[a] = strides[a + 1] * dims[a + 1]
+        return strides
+
+    def _group_coords(self, group, col):
+        """形态组内各场次（首行）的结果码（col 为 None）或该列的立方体坐标 = 箱号 + 1（缓存，各立方体共用）。"""
+        g = self._groups.get(group)
+        if g is None:
+            rows = self.dataset
+            g = {'rows': [rows[i] for i in rows.morph_indices(list(group)) if i in self._first]}
+            g[None] = [_CODES.get(r['U'], 3) for r in g['rows']]
+            self._groups[group] = g
+        if col not in g:
+            g[col] = [self.bin_of(col, r.get(col)) + 1 for r in g['rows']]
+        return g[col]
+
+    def _build(self, group, cols):
+        """(形态组, 列) 的前缀和立方体：4 个 array（上/下/走/其他），按 _strides 的行主序展开。"""
+        dims = self._dims(cols)
+        strides = self._strides(cols)
+        size = strides[0] * dims[0] if dims else 1
+        arrays = [array('i', [0]) * size for _ in range(4)]
+        codes = self._group_coords(group, None)
+        offsets = [0] * len(codes)
+        for c, s in zip(cols, strides):
+            offsets = [o + x * s for o, x in zip(offsets, self._group_coords(group, c))]
+        for (code, idx), n in Counter(zip(codes, offsets)).items():
+            arrays[code][idx] = n
+        # 逐维累加：沿第 a 维对每条「该维坐标从 0 开始」的线做前缀和
+        for a, (d, s) in enumerate(zip(dims, strides)):
+            others = [range(dims[b]) for b in range(len(dims)) if b != a]
+            other_strides = [strides[b] for b in range(len(dims)) if b != a]
+            for coords in product(*others):
+                base = sum(c * st for c, st in zip(coords, other_strides))
+                end = base + s * d
+                for arr in arrays:
+                    arr[base:end:s] = array('i', accumulate(arr[base:end:s]))
+        return arrays
+
+    def cube(self, group, cols):
+        """(形态组, 列) 的立方体（懒建，LRU）；单个立方体超出内存预算时返回 None。"""
+        key = (group, cols)
+        if key in self._cubes:
+            self._cubes.move_to_end(key)
+            return self._cubes[key]
+        nbytes = 4 * 4
+        for d in self._dims(cols):
+            nbytes *= d
+        if nbytes > self.max_bytes:
+            return None
+        while self._cubes and self.nbytes + nbytes > self.max_bytes:
+            _, old = self._cubes.popitem(last=False)
+            self.nbytes -= sum(a.itemsize * len(a) for a in old)
+        self._cubes[key] = self._build(group, cols)
+        self.nbytes += nbytes
+        return self._cubes[key]
+
+    def plan(self, kwargs):
+        """
+        条件 -> 查询计划 (列, [(前缀和下标, 符号), ...])，与形态组无关、可复用（缓存）。
+        条件互斥（某列区间为空）时返回 ()，无法用立方体回答时返回 None。
+        """
+        by_col = conditions_by_column(kwargs)
+        pk = tuple(sorted(by_col.items()))
+        if pk in self._plans:
+            return self._plans[pk]
+        plan = None
+        if len(by_col) <= MAX_COLUMNS:
+            cols = tuple(sorted(by_col))
+            ranges = [self.bin_range(c, by_col[c]) for c in cols]
+            if any(rng is None for rng in ranges):
+                plan = None
+            elif any(lo >= hi for lo, hi in ranges):
+                plan = ()
+            else:
+                # 前缀和坐标 i = 「箱号 < i 的单元格之和」，区间 [lo, hi) = P[hi] - P[lo]，多维按容斥展开成 2^d 项
+                terms = [(0, 1)]
+                for (lo, hi), st in zip(ranges, self._strides(cols)):
+                    terms = [(i + hi * st, sg) for i, sg in terms] + [(i + lo * st, -sg) for i, sg in terms]
+                plan = (cols, terms)
+        self._plans[pk] = plan
+        return plan
+
+    @staticmethod
+    def group_key(morph):
+        """filter_rows 的 morph 参数 -> 立方体使用的形态组键。"""
+        return tuple(sorted(morph_keys(morph)))
+
+    def counts(self, morph, **kwargs):
+        """
+        等价于 stats(unique_by_game(filter_rows(rows, morph, **kwargs)))[:4] 的 (总场次, 上, 下, 走)；
+        无法用立方体回答时返回 None。
+        """
+        return self.evaluate(self.group_key(morph), self.plan(kwargs))
+
+    def evaluate(self, group, plan):
+        """按 plan 的结果在形态组 group（group_key 的返回值）上求和；批量统计时 plan / group 各算一次即可。"""
+        if plan is None:
+            return None
+        if not plan:
+            return 0, 0, 0, 0
+        cols, terms = plan
+        cube = self.cube(group, cols)
+        if cube is None:
+            return None
+        out = [sum(sign * arr[idx] for idx, sign in terms) for arr in cube]
+        return out[0] + out[1] + out[2] + out[3], out[0], out[1], out[2]
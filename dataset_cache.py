@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据工作簿的行缓存（pickle），工作簿只在末尾追加行时只解析新增部分。
+
+每个工作簿一个缓存文件（工作簿所在目录的 .row_cache/ 下），记录：
+- 已解析出的数据行（与 rows_from_cells 的结果相同）及最后一个已解析的 Excel 行号；
+- 工作表 <sheetData> 内已解析部分的字节长度和 SHA-256；
+- sharedStrings 中已解码部分（从第一个 <si> 起）的字节长度、SHA-256，以及解码后的字符串列表。
+
+重新加载时：
+1. 文件修改时间和大小都没变：直接返回缓存的行；
+2. 两段前缀的哈希都与缓存一致（之前的行和字符串没有改动）：只解析 <sheetData> 中前缀之后的行片段
+   和 sharedStrings 中新增的字符串，追加到缓存的行后面；
+3. 否则（中间行被修改、重新排序、表头变化等）整表重新解析并重建缓存。
+第 2 种情况仍需解压整张表并计算前缀哈希（C 实现，很快），XML 解析和建行只针对新增的行。
+
+缓存按列投影（schema，见 analyze_asia_concentration.schema_columns）分开存放：默认 SEARCH_SCHEMA 为 <文件名>.rows.pkl，
+更宽的 schema 在文件名中加上多出的列（如 SUMMARY_SCHEMA 为 <文件名>.LOVW.rows.pkl），互不覆盖。
+
+环境变量 ASIA_ROW_CACHE=0 关闭缓存（每次整表解析）。
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+from xlsx_reader import Workbook, iter_rows_xml, shared_strings_xml
+
+ENABLED = os.environ.get('ASIA_ROW_CACHE', '1') != '0'
+CACHE_DIRNAME = '.row_cache'
+_FORMAT = 1
+_SST = 'xl/sharedStrings.xml'
+# 缓存记录必须有的字段及类型（sheet_len / sheet_hash 可为 None）
+_RECORD_TYPES = {
+    'mtime_ns': int, 'size': int, 'sheet': str, 'last_row': int,
+    'sheet_len': (int, type(None)), 'sheet_hash': (str, type(None)),
+    'sst_len': int, 'sst_hash': str, 'strings': list, 'rows': list,
+}
+
+
+def cache_path(path, schema=None):
+    """工作簿（及列投影）对应的缓存文件路径。"""
+    from analyze_asia_concentration import SEARCH_SCHEMA, schema_columns
+
+    d, name = os.path.split(os.path.abspath(path))
+    extra = ''.join(c for c in schema_columns(schema) if c not in SEARCH_SCHEMA)
+    return os.path.join(d, CACHE_DIRNAME, name + (f'.{extra}' if extra else '') + '.rows.pkl')
+
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _start_tag(data, tag):
+    """返回 (开始标签的起点, 开始标签结束后的位置)；没有该标签返回 (-1, -1)。"""
+    i = data.find(b'<' + tag)
+    if i < 0:
+        return -1, -1
+    return i, data.find(b'>', i) + 1
+
+
+def _sheet_regions(data):
+    """工作表 XML -> (根元素开始标签, sheetData 内容起点, sheetData 内容终点)。自闭合的空 <sheetData/> 返回 None。"""
+    root_i, root_end = _start_tag(data, b'worksheet')
+    sd_i, sd_end = _start_tag(data, b'sheetData')
+    if root_i < 0 or sd_i < 0 or data[sd_end - 2:sd_end] == b'/>':
+        return None
+    close = data.find(b'</sheetData>', sd_end)
+    if close < 0:
+        return None
+    return data[root_i:root_end], sd_end, close
+
+
+def _sst_regions(data):
+    """sharedStrings XML -> (根元素开始标签, 第一个 <si> 的位置, </sst> 的位置)。"""
+    root_i, root_end = _start_tag(data, b'sst')
+    close = data.rfind(b'</sst>')
+    if root_i < 0 or close < 0:
+        return None
+    first = data.find(b'<si', root_end, close)
+    return data[root_i:root_end], (close if first < 0 else first), close
+
+
+def _read_parts(wb):
+    sheet = wb.sheet_path()
+    sheet_data = wb.read(sheet)
+    sst_data = wb.read(_SST) if wb.has(_SST) else b''
+    return sheet, sheet_data, sst_data
+
+
+def _full_parse(path, wb, st, cols):
+    """整表解析（只取 cols 列），返回 (行, 缓存记录)。"""
+    from analyze_asia_concentration import rows_from_cells
+
+    sheet, sheet_data, sst_data = _read_parts(wb)
+    strings = []
+    sst_len, sst_hash = 0, _sha(b'')
+    if sst_data:
+        strings = shared_strings_xml(sst_data)
+        reg = _sst_regions(sst_data)
+        if reg is not None:
+            _, first, close = reg
+            sst_len, sst_hash = close - first, _sha(sst_data[first:close])
+    cell_rows = list(iter_rows_xml(sheet_data, strings, cols))
+    rows = rows_from_cells(cell_rows, path, cols)
+    reg = _sheet_regions(sheet_data)
+    record = {
+        'format': _FORMAT,
+        'columns': cols,
+        'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+        'sheet': sheet,
+        'last_row': cell_rows[-1][0] if cell_rows else 0,
+        'sheet_len': None if reg is None else reg[2] - reg[1],
+        'sheet_hash': None if reg is None else _sha(sheet_data[reg[1]:reg[2]]),
+        'sst_len': sst_len, 'sst_hash': sst_hash, 'strings': strings,
+        'rows': rows,
+    }
+    return rows, record
+
+
+def _tail_parse(path, wb, st, cached, cols):
+    """前缀未变时只解析新增部分；前缀有变化返回 None（由调用方整表重建）。"""
+    from analyze_asia_concentration import rows_from_cells
+
+    if cached.get('sheet_len') is None:
+        return None
+    sheet, sheet_data, sst_data = _read_parts(wb)
+    if sheet != cached['sheet']:
+        return None
+    reg = _sheet_regions(sheet_data)
+    if reg is None:
+        return None
+    root_tag, sd_start, sd_close = reg
+    cut = sd_start + cached['sheet_len']
+    if cut > sd_close or _sha(sheet_data[sd_start:cut]) != cached['sheet_hash']:
+        return None
+
+    strings = cached['strings']
+    sst_len, sst_hash = cached['sst_len'], cached['sst_hash']
+    if sst_data:
+        sreg = _sst_regions(sst_data)
+        if sreg is None:
+            return None
+        sst_root, first, close = sreg
+        s_cut = first + cached['sst_len']
+        if s_cut > close or _sha(sst_data[first:s_cut]) != cached['sst_hash']:
+            return None
+        if s_cut < close:
+            strings = strings + shared_strings_xml(sst_root + sst_data[s_cut:close] + b'</sst>')
+            sst_len, sst_hash = close - first, _sha(sst_data[first:close])
+    elif cached['sst_len']:
+        return None
+
+    tail = sheet_data[cut:sd_close]
+    cell_rows = list(iter_rows_xml(root_tag + b'<sheetData>' + tail + b'</sheetData></worksheet>', strings, cols))
+    if cell_rows and cell_rows[0][0] <= cached['last_row']:
+        return None
+    if cached['rows'] and cached['rows'][0]['source'] != path:
+        for r in cached['rows']:
+            r['source'] = path
+    new_rows = rows_from_cells(cell_rows, path, cols)
+    rows = cached['rows'] + new_rows
+    record = dict(cached, mtime_ns=st.st_mtime_ns, size=st.st_size,
+                  last_row=cell_rows[-1][0] if cell_rows else cached['last_row'],
+                  sheet_len=sd_close - sd_start, sheet_hash=_sha(sheet_data[sd_start:sd_close]),
+                  sst_len=sst_len, sst_hash=sst_hash, strings=strings, rows=rows)
+    return rows, record, len(new_rows)
+
+
+def _read_cache(cp, cols):
+    """读取并校验缓存记录；文件缺失、损坏（unpickle 可能抛出任意异常）或字段不全都返回 None，由调用方整表重建。"""
+    try:
+        with open(cp, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(cached, dict) or cached.get('format') != _FORMAT:
+        return None
+    if not all(isinstance(cached.get(k), t) for k, t in _RECORD_TYPES.items()):
+        return None
+    if cached['rows'] and not isinstance(cached['rows'][0], dict):
+        return None
+    # 没有 columns 的旧缓存都是按 SEARCH_SCHEMA 解析的
+    from analyze_asia_concentration import SEARCH_SCHEMA
+    return cached if tuple(cached.get('columns', SEARCH_SCHEMA)) == cols else None
+
+
+def _write_cache(cp, record):
+    """写入唯一命名的临时文件后原子替换，多个进程同时重建同一缓存也不会互相覆盖半写的文件。"""
+    d = os.path.dirname(cp)
+    try:
+        os.makedirs(d, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=d, prefix=os.path.basename(cp) + '.', suffix='.tmp')
+    except OSError:
+        # 目录只读等情况下不缓存，不影响加载结果
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cp)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+# 最近一次 load_rows 的方式：{路径: ('cache' | 'tail' | 'full', 新解析的数据行数)}
+LAST_LOAD = {}
+
+
+def load_rows(path, schema=None):
+    """
+    读取工作簿第一张表的数据行（与 rows_from_cells(..., schema) 整表解析的结果相同），按上面的规则使用/更新缓存。
+    schema 为要保留的列，默认 SEARCH_SCHEMA。
+    """
+    from analyze_asia_concentration import schema_columns
+
+    cols = schema_columns(schema)
+    st = os.stat(path)
+    cp = cache_path(path, cols)
+    cached = _read_cache(cp, cols)
+    if cached is not None and cached['mtime_ns'] == st.st_mtime_ns and cached['size'] == st.st_size:
+        rows = cached['rows']
+        if rows and rows[0]['source'] != path:
+            for r in rows:
+                r['source'] = path
+        LAST_LOAD[path] = ('cache', 0)
+        return rows
+
+    with Workbook(path) as wb:
+        result = _tail_parse(path, wb, st, cached, cols) if cached is not None else None
+        if result is not None:
+            rows, record, n_new = result
+            LAST_LOAD[path] = ('tail', n_new)
+        else:
+            rows, record = _full_parse(path, wb, st, cols)
+            LAST_LOAD[path] = ('full', len(rows))
+    _write_cache(cp, record)
+    return rows
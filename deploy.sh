@@ -26,7 +26,7 @@ fi
 
 # 添加文件
 echo "添加文件到Git..."
-git add index.html static/rules.json README_github_pages.md DEPLOY.md .gitignore
+git add index.html static/rules.json static/summary_types_v2.json static/match_worker.js static/shards README_github_pages.md DEPLOY.md .gitignore
 
 # 检查是否有未提交的更改
 if git diff --staged --quiet; then
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一次运行比较多种形态分组方式下的 AI 规则库（rule_engine.generate_rules_by_grouping）：
+逐形态、按主客、按盘口 (D,F)、全部合并、网页规则库的形态组，各形态的条件掩码只统计一次。
+
+输出 JSON（默认 分组规则库.json）：
+    {"meta": {...}, "groupings": {分组名称: {"groups": [[形态, ...], ...], "rules_85": [...], "rules_80": [...]}}}
+规则格式与 static/rules.json 相同。
+
+用法：
+    python3 export_grouping_rules.py                                # 全部分组方式
+    python3 export_grouping_rules.py --groupings per_side,per_df    # 只算指定的分组方式
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analyze_asia_concentration import DATA_PATH, load_xlsx
+from rule_engine import CRITERIA_DESCRIPTIONS, generate_rules_by_grouping, morph_groupings, rule_to_dict
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='一次运行生成多种形态分组方式的规则库')
+    ap.add_argument('--groupings', help='逗号分隔的分组方式（默认全部）：per_morph, per_side, per_df, all, web')
+    ap.add_argument('--output', default='分组规则库.json', help='输出文件')
+    args = ap.parse_args(argv)
+
+    rows = load_xlsx(DATA_PATH)
+    print(f"已加载 {len(rows)} 条数据")
+    morphs = sorted(m for m in rows.by_morph if m[0] in ('主', '客'))
+    names = [n.strip() for n in args.groupings.split(',') if n.strip()] if args.groupings else None
+    try:
+        groupings = morph_groupings(morphs, names)
+    except ValueError as e:
+        ap.error(str(e))
+
+    t0 = time.perf_counter()
+    result = generate_rules_by_grouping(rows, groupings)
+    elapsed = time.perf_counter() - t0
+
+    output = {
+        'meta': {
+            'source': DATA_PATH,
+            'description': dict(CRITERIA_DESCRIPTIONS),
+        },
+        'groupings': {
+            name: {
+                'groups': [[list(m) for m in g] for g in groupings[name]],
+                **{crit: [rule_to_dict(r) for r in rules] for crit, rules in lib.items()},
+            }
+            for name, lib in result.items()
+        },
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+
+    print(f"{'分组方式':<12}{'形态组':>6}{'条件1':>8}{'条件2':>8}")
+    for name, lib in result.items():
+        print(f"{name:<12}{len(groupings[name]):>6}{len(lib['rules_85']):>8}{len(lib['rules_80']):>8}")
+    print(f"统计与生成用时 {elapsed:.2f}s，已导出到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
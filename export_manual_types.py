@@ -5,17 +5,20 @@
 
 来源：
 - 规则：docs/规则.xlsx
-- 数据：docs/20252026欧洲FB.xlsx
+- 数据：docs/20252026欧洲FB.xlsx（默认，可用环境变量 ASIA_DATA 指定多个工作簿）
 """
 
 import os
 import json
 
 from manual_types import build_manual_types
+from xlsx_reader import workbook_session
 
 
 def export_manual_types() -> None:
-    data = build_manual_types()
+    # 一次导出运行内复用已解析的工作簿，结束时关闭
+    with workbook_session():
+        data = build_manual_types()
     os.makedirs("static", exist_ok=True)
     output_file = os.path.join("static", "manual_types.json")
     with open(output_file, "w", encoding="utf-8") as f:
@@ -25,7 +28,7 @@ def export_manual_types() -> None:
     txt_lines = []
     txt_lines.append("=" * 80)
     txt_lines.append("手工类型库结果（严格按 docs/规则.xlsx 条件，AI 重新筛选验证）")
-    txt_lines.append("数据来源: docs/20252026欧洲FB.xlsx，按场次去重统计")
+    txt_lines.append(f"数据来源: {data['meta']['data_file']}，按场次去重统计")
     txt_lines.append("=" * 80)
     txt_lines.append("")
     meta = data.get("meta", {})
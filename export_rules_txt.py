@@ -49,6 +49,12 @@ def export_rules_txt():
         lines.append(f"  (下+走)比例: {rule.get('xia_zou_ratio', 0):.2f}%")
         lines.append(f"  总场次: {rule.get('n_total', 0)}")
         lines.append(f"  统计: 上{rule.get('shang', 0)} 下{rule.get('xia', 0)} 走{rule.get('zou', 0)}")
+        if rule.get('q_value') is not None:
+            lines.append(f"  显著性: p={rule['p_value']:.3g} q={rule['q_value']:.3g}")
+        if rule.get('variants'):
+            lines.append(f"  等价变体: {'；'.join(rule['variants'])}")
+        if rule.get('n_subsumed'):
+            lines.append(f"  覆盖的更严格规则: {rule['n_subsumed']} 条（已删除）")
         lines.append("")
 
     lines.append("-" * 80)
@@ -67,6 +73,12 @@ def export_rules_txt():
         lines.append(f"  下比例: {rule.get('xia_ratio', 0):.2f}%")
         lines.append(f"  总场次: {rule.get('n_total', 0)}")
         lines.append(f"  统计: 上{rule.get('shang', 0)} 下{rule.get('xia', 0)} 走{rule.get('zou', 0)}")
+        if rule.get('q_value') is not None:
+            lines.append(f"  显著性: p={rule['p_value']:.3g} q={rule['q_value']:.3g}")
+        if rule.get('variants'):
+            lines.append(f"  等价变体: {'；'.join(rule['variants'])}")
+        if rule.get('n_subsumed'):
+            lines.append(f"  覆盖的更严格规则: {rule['n_subsumed']} 条（已删除）")
         lines.append("")
 
     lines.append("=" * 80)
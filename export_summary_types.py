@@ -4,52 +4,16 @@
 从 docs/2026欧洲FB手工形态汇总.xlsx 的「汇总」表导出最新人工确认的类型库，
 仅用于网页快速判断，不再连数据库重算。
 
-输出：static/summary_types.json
+输出：static/summary_types_v2.json，以及 static/shards/summary_types_v2/ 下按形态拆分的分片（见 static_shards）
 """
 
 import os
 import re
 import json
-import zipfile
-import xml.etree.ElementTree as ET
-from collections import defaultdict
 from typing import Any, Dict, List, Optional, Tuple
 
-
-def _find_sheet_xml_by_name(z: zipfile.ZipFile, sheet_name: str) -> str:
-    """从 workbook.xml 中按 sheet name 定位 worksheet xml 路径（如 xl/worksheets/sheet1.xml）。"""
-    ns = {
-        "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
-        "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
-        "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
-    }
-
-    wb_root = ET.parse(z.open("xl/workbook.xml")).getroot()
-    rels_root = ET.parse(z.open("xl/_rels/workbook.xml.rels")).getroot()
-
-    rid_to_target: Dict[str, str] = {}
-    for rel in rels_root.findall("rel:Relationship", ns):
-        rid = rel.get("Id")
-        target = rel.get("Target") or ""
-        if rid:
-            rid_to_target[rid] = target
-
-    sheets_el = wb_root.find("main:sheets", ns)
-    if sheets_el is None:
-        raise ValueError("workbook.xml missing sheets")
-
-    for sh in sheets_el.findall("main:sheet", ns):
-        name = sh.get("name") or ""
-        if name != sheet_name:
-            continue
-        rid = sh.get("{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id") or ""
-        target = rid_to_target.get(rid, "")
-        if not target:
-            raise ValueError(f"sheet '{sheet_name}' has no relationship target")
-        # target like "worksheets/sheet1.xml"
-        return "xl/" + target.lstrip("/")
-
-    raise ValueError(f"sheet not found by name: {sheet_name}")
+from xlsx_reader import read_rows, workbook_session
+from static_shards import SHARDS_DIR, summary_type_shards, write_shards
 
 
 def _load_summary_sheet(path: str) -> List[Dict[str, Any]]:
@@ -57,48 +21,10 @@ def _load_summary_sheet(path: str) -> List[Dict[str, Any]]:
     if not os.path.exists(path):
         raise FileNotFoundError(path)
 
-    with zipfile.ZipFile(path, "r") as z:
-        ns = {"main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
-
-        # 读取 sharedStrings
-        with z.open("xl/sharedStrings.xml") as f:
-            ss_root = ET.parse(f).getroot()
-        strings: List[str] = []
-        for si in ss_root.findall(".//main:si", ns):
-            texts = si.findall(".//main:t", ns)
-            strings.append("".join(t.text or "" for t in texts) if texts else "")
-
-        sheet_xml = _find_sheet_xml_by_name(z, "汇总")
-        with z.open(sheet_xml) as f:
-            sheet_root = ET.parse(f).getroot()
-
-    rows_raw: Dict[int, Dict[str, str]] = defaultdict(dict)
-
-    for row in sheet_root.findall(".//main:sheetData/main:row", ns):
-        r_idx_attr = row.get("r")
-        try:
-            r_idx = int(r_idx_attr)
-        except (TypeError, ValueError):
-            continue
-        for c in row.findall("main:c", ns):
-            ref = c.get("r")  # 如 "A2"
-            if not ref:
-                continue
-            v = c.find("main:v", ns)
-            t = c.get("t")
-            if v is not None and v.text is not None:
-                if t == "s":
-                    idx = int(v.text)
-                    val = strings[idx] if 0 <= idx < len(strings) else ""
-                else:
-                    val = v.text
-            else:
-                val = ""
-            m = re.match(r"([A-Z]+)\d+", ref)
-            if not m:
-                continue
-            col = m.group(1)
-            rows_raw[r_idx][col] = (val or "").strip()
+    # 「汇总」表按名称定位：行号 → {列字母: 文本}
+    rows_raw: Dict[int, Dict[str, str]] = {}
+    for r_idx, cells in read_rows(path, "汇总"):
+        rows_raw[r_idx] = {col: (val or "").strip() for col, val in cells.items()}
 
     def is_group_header(s: str) -> bool:
         s = (s or "").strip()
@@ -366,7 +292,8 @@ def build_summary_types(
 
 
 def main() -> None:
-    data = build_summary_types()
+    with workbook_session():
+        data = build_summary_types()
     os.makedirs("static", exist_ok=True)
     out_path = os.path.join("static", "summary_types_v2.json")
     with open(out_path, "w", encoding="utf-8") as f:
@@ -374,6 +301,11 @@ def main() -> None:
     print(f"已导出汇总类型库到: {out_path}")
     print(f"  类型总数: {data['meta']['total_types']}")
 
+    # 按形态分片，网页按需加载
+    manifest = write_shards("summary_types_v2", summary_type_shards(data), source=out_path,
+                            meta=data["meta"], total=data["meta"]["total_types"])
+    print(f"  形态分片: {len(manifest['shards'])} 个（{os.path.join(SHARDS_DIR, 'summary_types_v2')}）")
+
 
 if __name__ == "__main__":
     main()
@@ -6,7 +6,7 @@
 """
 import sys
 sys.path.insert(0, '/Users/sorari/Desktop/apps/ly')
-from analyze_asia_concentration import load_xlsx, filter_rows, RED_CONDITIONS, _no_duplicate_col
+from analyze_asia_concentration import DATA_PATH, load_xlsx, filter_rows, RED_CONDITIONS, _no_duplicate_col
 from itertools import combinations
 from collections import Counter
 
@@ -18,14 +18,14 @@ def get_matching_rows(rows, morph, cond_combo):
     return filter_rows(rows, morph, **kw)
 
 def generate_summary():
-    rows = load_xlsx('docs/20252026欧洲FB.xlsx')
+    rows = load_xlsx(DATA_PATH)
     
     # 只分析主/0/0和客/0/0
     target_morphs = [('主', '0', '0'), ('客', '0', '0')]
     
     # 统计总场次
-    total_main00 = len([r for r in rows if (r['B'], r['D'], r['F']) == ('主', '0', '0')])
-    total_ke00 = len([r for r in rows if (r['B'], r['D'], r['F']) == ('客', '0', '0')])
+    total_main00 = rows.morph_count(('主', '0', '0'))
+    total_ke00 = rows.morph_count(('客', '0', '0'))
     
     output_lines = []
     output_lines.append("# 主/0/0 和 客/0/0 形态下的高集中度数据特征")
@@ -40,7 +40,7 @@ def generate_summary():
     
     for morph in target_morphs:
         morph_label = f"{morph[0]}/{morph[1]}/{morph[2]}"
-        total_morph = len([r for r in rows if (r['B'], r['D'], r['F']) == morph])
+        total_morph = rows.morph_count(morph)
         
         # 枚举所有条件组合（1-3列）
         for n_cond in range(1, min(4, len(RED_CONDITIONS) + 1)):
@@ -110,7 +110,7 @@ def generate_summary():
     
     for morph in target_morphs:
         morph_label = f"{morph[0]}/{morph[1]}/{morph[2]}"
-        total_morph = len([r for r in rows if (r['B'], r['D'], r['F']) == morph])
+        total_morph = rows.morph_count(morph)
         
         # 枚举所有条件组合（1-3列）
         for n_cond in range(1, min(4, len(RED_CONDITIONS) + 1)):
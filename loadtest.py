@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/check 本地压测：在本机启动 app.py，用从数据集中抽样的真实 A-R 行按指定并发（和速率）反复提交，
+报告吞吐量与 p50 / p95 / p99 延迟，用于估算单进程能承受的并发、比较匹配实现、发现性能回退。
+
+每个「匹配实现 × 规则库倍数」组合单独启动一个 app 进程：
+- 匹配实现（--matchers）：linear = 逐条 check_conditions，indexed = rule_engine.RuleMatcher（环境变量 MATCHER）；
+- 规则库倍数（--scales）：把 static/rules.json 的每条规则复制 k 份（阈值逐份微移、特征名加 #序号）
+  写成临时快照交给 app（环境变量 RULES_SNAPSHOT），观察延迟随规则数增长的情况；
+- 默认关闭 /check 结果缓存（CHECK_CACHE_SIZE=0），否则反复提交的行全部命中缓存；--cache 保留默认缓存。
+app 就绪（/readyz）且数据行加载完（/check 重新统计前5条时使用）后才开始计时。
+
+用法：
+    python3 loadtest.py                                        # linear 与 indexed，8 并发，各 2000 个请求
+    python3 loadtest.py --concurrency 32 --rate 200            # 32 并发，总速率限制 200 请求/秒
+    python3 loadtest.py --matchers indexed --scales 1,4,16     # 规则库扩大 4 倍、16 倍
+    python3 loadtest.py --url http://127.0.0.1:5000            # 压测已在运行的服务（不启动 app）
+    python3 loadtest.py --output 压测结果.csv                   # 结果另存 CSV
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from analyze_asia_concentration import DATA_PATH, load_xlsx
+from rule_engine import MATCHERS, SNAPSHOT_PATH, load_snapshot, save_snapshot
+
+AR_COLS = [chr(c) for c in range(ord('A'), ord('R') + 1)]
+
+
+# ---------------- 请求样本与规则库 ----------------
+
+def sample_inputs(rows, n, rnd):
+    """从数据集中抽 n 行（只取 B 为主/客的行），转成网页表单提交的 A-R 字符串字典。"""
+    pool = [r for r in rows if r.get('B') in ('主', '客')]
+    if not pool:
+        raise SystemExit('数据中没有 B 列为主/客的行')
+    out = []
+    for r in (rnd.choice(pool) for _ in range(n)):
+        out.append({c: ('' if r.get(c) is None else str(r.get(c))) for c in AR_COLS})
+    return out
+
+
+def _shift(val, d):
+    if isinstance(val, (tuple, list)):
+        return type(val)(v + d for v in val)
+    return val + d
+
+
+def scaled_library(library, k):
+    """每条规则复制 k 份：第 j 份（j>=1）的阈值整体加 j*0.001，特征名加 #j，使各份是不同的规则。"""
+    if k <= 1:
+        return library
+    out = {}
+    for name, rules in library.items():
+        scaled = []
+        for rule in rules:
+            scaled.append(rule)
+            for j in range(1, k):
+                copy = dict(rule)
+                copy['feature'] = f"{rule['feature']} #{j}"
+                copy['conditions'] = {key: _shift(v, j * 0.001) for key, v in rule['conditions'].items()}
+                scaled.append(copy)
+        out[name] = scaled
+    return out
+
+
+# ---------------- 启动被测服务 ----------------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _get_json(url, timeout=5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+def wait_ready(base, timeout):
+    """等到 /readyz 返回 200 且数据行已加载；返回 /healthz 的内容。"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            code, st = _get_json(base + '/healthz')
+            if st.get('phase') == 'error':
+                raise SystemExit(f"被测服务预热失败：{st.get('error')}")
+            if code == 200 and st.get('phase') == 'ready' and st.get('rows_loaded'):
+                return st
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f'被测服务 {timeout}s 内未就绪')
+
+
+def start_app(matcher, snapshot, cache, log):
+    """在空闲端口上启动 app.py，返回 (进程, 地址)。"""
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), MATCHER=matcher, RULES_SNAPSHOT=snapshot, PYTHONUNBUFFERED='1')
+    if not cache:
+        env['CHECK_CACHE_SIZE'] = '0'
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'app.py')], cwd=ROOT, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+    return proc, f'http://127.0.0.1:{port}'
+
+
+# ---------------- 发压与统计 ----------------
+
+def percentile(sorted_values, p):
+    """最近秩百分位（sorted_values 已排序）。"""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def run_load(base, inputs, concurrency, rate=None, warmup=0):
+    """
+    以 concurrency 个线程把 inputs 依次 POST 到 base/check；rate 为总速率上限（请求/秒，None 不限）。
+    前 warmup 个请求不计入统计。返回 {requests, errors, seconds, throughput, p50, p95, p99, max}（延迟单位 ms）。
+    """
+    url = base + '/check'
+    bodies = [json.dumps(x, ensure_ascii=False).encode('utf-8') for x in inputs]
+    lock = threading.Lock()
+    state = {'next': 0, 'start': None}
+    latencies = []
+    errors = []
+
+    def post(body):
+        req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                resp.read()
+                ok = resp.status == 200
+        except (OSError, urllib.error.HTTPError):
+            ok = False
+        return ok, (time.perf_counter() - t0) * 1000
+
+    def worker():
+        while True:
+            with lock:
+                i = state['next']
+                if i >= len(bodies):
+                    return
+                state['next'] += 1
+                if i == warmup:
+                    state['start'] = time.perf_counter()
+            if rate and i >= warmup:
+                # 按总速率排定第 i 个请求的发出时刻（开环：前面的请求慢了也不推迟后面的）
+                delay = state['start'] + (i - warmup) / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            ok, ms = post(bodies[i])
+            if i >= warmup:
+                with lock:
+                    (latencies if ok else errors).append(ms)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        for _ in range(concurrency):
+            ex.submit(worker)
+    seconds = time.perf_counter() - (state['start'] or time.perf_counter())
+    latencies.sort()
+    done = len(latencies) + len(errors)
+    return {
+        'requests': done,
+        'errors': len(errors),
+        'seconds': round(seconds, 3),
+        'throughput': round(done / seconds, 1) if seconds > 0 else None,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'max': latencies[-1] if latencies else None,
+    }
+
+
+def _ms(v):
+    return '-' if v is None else f'{v:.2f}'
+
+
+def print_results(results):
+    print('\n' + '=' * 88)
+    print(f"{'匹配实现':<10}{'倍数':>5}{'规则数':>8}{'并发':>6}{'请求':>7}{'错误':>6}"
+          f"{'吞吐/s':>9}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'最大ms':>9}")
+    for r in results:
+        print(f"{r['matcher']:<12}{r['scale']:>5}{r['rules']:>9}{r['concurrency']:>7}{r['requests']:>8}{r['errors']:>7}"
+              f"{r['throughput'] or 0:>10.1f}{_ms(r['p50']):>9}{_ms(r['p95']):>9}{_ms(r['p99']):>9}{_ms(r['max']):>9}")
+    print('=' * 88)
+
+
+def write_csv(path, results):
+    fields = ['matcher', 'scale', 'rules', 'concurrency', 'rate', 'requests', 'errors', 'seconds',
+              'throughput', 'p50', 'p95', 'p99', 'max']
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        w.writeheader()
+        for r in results:
+            w.writerow({k: (round(v, 3) if isinstance(v, float) else v) for k, v in r.items()})
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='/check 本地压测：吞吐量与延迟分位数')
+    ap.add_argument('--matchers', default=','.join(MATCHERS), help=f"逗号分隔的匹配实现（{', '.join(MATCHERS)}）")
+    ap.add_argument('--scales', default='1', help='逗号分隔的规则库倍数（默认 1，即 static/rules.json 原样）')
+    ap.add_argument('--concurrency', default='8', help='并发数，可逗号分隔多个（默认 8）')
+    ap.add_argument('--rate', type=float, default=None, help='总请求速率上限（请求/秒，默认不限）')
+    ap.add_argument('--requests', type=int, default=2000, help='每个组合计时的请求数（默认 2000）')
+    ap.add_argument('--warmup', type=int, default=100, help='每个组合开始计时前的预热请求数（默认 100）')
+    ap.add_argument('--cache', action='store_true', help='保留 /check 结果缓存（默认关闭以测匹配本身）')
+    ap.add_argument('--url', help='压测已在运行的服务（如 http://127.0.0.1:5000），此时忽略 --matchers/--scales')
+    ap.add_argument('--seed', type=int, default=20240601, help='抽样随机种子')
+    ap.add_argument('--timeout', type=float, default=600, help='等待服务就绪的秒数（默认 600）')
+    ap.add_argument('--output', help='结果另存为 CSV')
+    args = ap.parse_args(argv)
+    # 数据路径（ASIA_DATA 等）以仓库根目录为准，与 app.py 一致
+    os.chdir(ROOT)
+
+    matchers = [m.strip() for m in args.matchers.split(',') if m.strip()]
+    unknown = [m for m in matchers if m not in MATCHERS]
+    if unknown:
+        ap.error(f"未知的匹配实现: {', '.join(unknown)}（可用：{', '.join(MATCHERS)}）")
+    scales = _int_list(args.scales)
+    concurrencies = _int_list(args.concurrency)
+
+    rows = load_xlsx(DATA_PATH)
+    rnd = random.Random(args.seed)
+    inputs = sample_inputs(rows, args.warmup + args.requests, rnd)
+    print(f"已加载 {len(rows)} 条数据，抽样 {len(inputs)} 个请求")
+
+    results = []
+    if args.url:
+        st = wait_ready(args.url.rstrip('/'), args.timeout)
+        for c in concurrencies:
+            r = run_load(args.url.rstrip('/'), inputs, c, args.rate, args.warmup)
+            results.append(dict(r, matcher=st.get('matcher', '?'), scale=1,
+                                rules=st['rules_85'] + st['rules_80'], concurrency=c, rate=args.rate))
+    else:
+        if not os.path.exists(SNAPSHOT_PATH):
+            raise SystemExit(f'没有规则快照 {SNAPSHOT_PATH}，请先运行 export_rules.py')
+        library = load_snapshot(SNAPSHOT_PATH)
+        with tempfile.TemporaryDirectory(prefix='loadtest_') as tmp:
+            for k in scales:
+                snapshot = os.path.join(tmp, f'rules_x{k}.json')
+                # 临时快照晚于数据文件，app 直接使用、不会现场重算
+                save_snapshot(scaled_library(library, k), snapshot, source=f'loadtest x{k}')
+                for matcher in matchers:
+                    with open(os.path.join(tmp, f'app_{matcher}_x{k}.log'), 'w') as log:
+                        proc, base = start_app(matcher, snapshot, args.cache, log)
+                        try:
+                            st = wait_ready(base, args.timeout)
+                            for c in concurrencies:
+                                print(f"[{matcher} x{k}] 并发 {c} ...", flush=True)
+                                r = run_load(base, inputs, c, args.rate, args.warmup)
+                                results.append(dict(r, matcher=matcher, scale=k,
+                                                    rules=st['rules_85'] + st['rules_80'], concurrency=c,
+                                                    rate=args.rate))
+                        finally:
+                            proc.terminate()
+                            proc.wait()
+
+    print_results(results)
+    if args.output:
+        write_csv(args.output, results)
+        print(f"已导出到: {args.output}")
+    return 1 if any(r['errors'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,18 +2,18 @@
 # -*- coding: utf-8 -*-
 """
 从 docs/规则.xlsx 读取人工统计规则，解析为程序可用的条件，
-并基于 docs/20252026欧洲FB.xlsx 重新统计上/走/下场次，生成“手工类型库”。
+并基于 docs/20252026欧洲FB.xlsx（或 ASIA_DATA 指定的多个工作簿）重新统计上/走/下场次，生成“手工类型库”。
 """
 
 import os
 import re
 import json
-import zipfile
-import xml.etree.ElementTree as ET
-from collections import Counter, defaultdict
+from collections import defaultdict
 from typing import Any, Dict, List, Tuple
 
-from analyze_asia_concentration import load_xlsx, filter_rows, unique_by_game
+from analyze_asia_concentration import DATA_PATH, SEARCH_SCHEMA, load_xlsx
+from mask_index import MaskIndex
+from xlsx_reader import read_rows
 
 
 def _read_rules_xlsx(path: str) -> List[Dict[str, Any]]:
@@ -36,56 +36,10 @@ def _read_rules_xlsx(path: str) -> List[Dict[str, Any]]:
     if not os.path.exists(path):
         raise FileNotFoundError(path)
 
-    with zipfile.ZipFile(path, "r") as z:
-        ns = {"main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
-
-        # 读取 sharedStrings
-        with z.open("xl/sharedStrings.xml") as f:
-            ss_root = ET.parse(f).getroot()
-        strings: List[str] = []
-        for s in ss_root.findall(".//main:si", ns):
-            texts = s.findall(".//main:t", ns)
-            strings.append("".join(x.text or "" for x in texts) if texts else "")
-
-        # 读取 sheet1
-        with z.open("xl/worksheets/sheet1.xml") as f:
-            root = ET.parse(f).getroot()
-
-    # 把 sheet1 解析成行/列 → 文本
-    rows_raw: Dict[int, Dict[str, str]] = defaultdict(dict)
-
-    for row in root.findall(".//main:row", ns):
-        r_idx_attr = row.get("r")
-        # 有些文件不会给 row.r，直接按子节点推断也可以，但当前文件有 r，这里直接用
-        try:
-            r_idx = int(r_idx_attr)
-        except (TypeError, ValueError):
-            continue
-
-        for c in row.findall("main:c", ns):
-            ref = c.get("r")  # 如 "A2"
-            if not ref:
-                continue
-            v = c.find("main:v", ns)
-            t = c.get("t")
-            if v is not None and v.text is not None:
-                try:
-                    idx = int(v.text)
-                except ValueError:
-                    idx = None
-                if t == "s" and idx is not None and 0 <= idx < len(strings):
-                    val = strings[idx]
-                else:
-                    val = v.text
-            else:
-                val = ""
-            # 记录列字母 → 文本
-            # ref 形如 "A2" / "AA3"，只取前面的字母部分
-            m = re.match(r"([A-Z]+)\d+", ref)
-            if not m:
-                continue
-            col_letter = m.group(1)
-            rows_raw[r_idx][col_letter] = (val or "").strip()
+    # 读取第一张表：行号 → {列字母: 文本}
+    rows_raw: Dict[int, Dict[str, str]] = {}
+    for r_idx, cells in read_rows(path):
+        rows_raw[r_idx] = {col: (val or "").strip() for col, val in cells.items()}
 
     # 识别分组标题行：A 列为形如 "0/0.25" 的盘口组
     def _is_group_header(s: str) -> bool:
@@ -266,15 +220,16 @@ def _build_feature_text(cols: Dict[str, str]) -> str:
 
 def build_manual_types(
     rules_xlsx_path: str = "docs/规则.xlsx",
-    data_xlsx_path: str = "docs/20252026欧洲FB.xlsx",
+    data_xlsx_path: str = DATA_PATH,
 ) -> Dict[str, Any]:
     """
     构建“手工类型库”：
     - 从 docs/规则.xlsx 读取所有手工规则；
     - 按条件解析为 filter_rows 可用的条件；
-    - 基于 docs/20252026欧洲FB.xlsx 重新统计上/下/走场次。
+    - 基于数据工作簿（默认 DATA_PATH，可为多个赛季文件）重新统计上/下/走场次。
     """
-    all_rows = load_xlsx(data_xlsx_path)
+    # 手工规则只用到 _COL_BASE_MAP 中的 G、I、K、N、P、Q、R，按搜索用的列读取即可
+    all_rows = load_xlsx(data_xlsx_path, schema=SEARCH_SCHEMA)
     raw_rules = _read_rules_xlsx(rules_xlsx_path)
 
     types: List[Dict[str, Any]] = []
@@ -324,28 +279,12 @@ def build_manual_types(
         except ValueError:
             xia_manual = 0
 
-        # 重新筛选并统计
-        matched = filter_rows(all_rows, morph, **conditions)
-        matched_unique = unique_by_game(matched)
-        c = Counter(r2["U"] for r2 in matched_unique)
-        shang = c.get("上", 0)
-        xia = c.get("下", 0)
-        zou = c.get("走", 0)
-        n_total = len(matched_unique)
-
         # 预测列
         prediction = cols.get("I", "")
 
         feature_text = _build_feature_text(cols)
 
-        diff = {
-            "shang": shang - shang_manual,
-            "zou": zou - zou_manual,
-            "xia": xia - xia_manual,
-        }
-        if diff["shang"] or diff["zou"] or diff["xia"]:
-            inconsistent_count += 1
-
+        # stats / diff 在全部规则解析完后批量统计时填入
         types.append(
             {
                 "id": idx,
@@ -356,22 +295,37 @@ def build_manual_types(
                 "feature_text": feature_text,
                 "prediction": prediction,
                 "conditions": conditions,
-                "stats": {
-                    "n_total": n_total,
-                    "shang": shang,
-                    "xia": xia,
-                    "zou": zou,
-                },
+                "stats": None,
                 "manual_stats": {
                     "shang": shang_manual,
                     "zou": zou_manual,
                     "xia": xia_manual,
                 },
-                "diff": diff,
+                "diff": None,
                 "parse_errors": parse_errors,
             }
         )
 
+    # 重新筛选并统计：所有规则的条件编译成位掩码后一次性求值，不再逐条规则扫全表
+    index = MaskIndex(all_rows)
+    batch = index.batch_counts([(tuple(t["morph"]), t["conditions"]) for t in types])
+    for t, (n_total, shang, xia, zou) in zip(types, batch):
+        manual = t["manual_stats"]
+        t["stats"] = {
+            "n_total": n_total,
+            "shang": shang,
+            "xia": xia,
+            "zou": zou,
+        }
+        diff = {
+            "shang": shang - manual["shang"],
+            "zou": zou - manual["zou"],
+            "xia": xia - manual["xia"],
+        }
+        t["diff"] = diff
+        if diff["shang"] or diff["zou"] or diff["xia"]:
+            inconsistent_count += 1
+
     result = {
         "meta": {
             "source_rules_file": rules_xlsx_path,
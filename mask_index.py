@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+位图（bitset）批量筛选：数据只扫描一遍，把每个条件编译成覆盖全部行的位掩码（Python int，
+第 i 位 = 第 i 行），规则 = 形态掩码 & 各条件掩码，统计 = 与「场次首行」及结果掩码求交后 popcount。
+
+与 filter_rows + unique_by_game + stats 的语义完全一致：
+- 条件按 FILTER_OPS 解释（同样的容差方向，未识别的键忽略，None 值不满足任何条件）；
+- 场次键包含全部条件列，同一场次的多行要么全部满足、要么全部不满足，
+  所以「筛选后按场次保留第一条」等价于「先取全表每个场次的第一行，再与筛选掩码求交」。
+"""
+import heapq
+
+from analyze_asia_concentration import as_dataset, _game_key, condition_predicate, morph_keys, FILTER_OPS
+
+OUTCOMES = ('上', '下', '走')
+
+
+def mask_from_flags(flags):
+    """布尔序列 -> 位掩码（第 i 个元素为真则第 i 位为 1）。按二进制字符串一次性构造，避免逐位 OR 的平方开销。"""
+    s = ''.join('1' if f else '0' for f in flags)
+    return int(s[::-1], 2) if s else 0
+
+
+def iter_bits(mask):
+    """按从低到高的顺序返回掩码中为 1 的位序号。"""
+    s = bin(mask)[:1:-1]
+    i = s.find('1')
+    while i != -1:
+        yield i
+        i = s.find('1', i + 1)
+
+
+class MaskIndex:
+    """一次性为数据行建立形态、结果、场次首行掩码，并按需缓存条件掩码。"""
+
+    def __init__(self, rows):
+        rows = as_dataset(rows)
+        self.rows = rows
+        self.n = len(rows)
+        self.all_mask = (1 << self.n) - 1
+
+        seen = set()
+        first_flags = []
+        outcome_flags = {u: [] for u in OUTCOMES}
+        for r in rows:
+            k = _game_key(r)
+            first_flags.append(k not in seen)
+            seen.add(k)
+            for u in OUTCOMES:
+                outcome_flags[u].append(r['U'] == u)
+
+        self.first_mask = mask_from_flags(first_flags)
+        self.outcome_masks = {u: mask_from_flags(f) for u, f in outcome_flags.items()}
+        # 形态掩码直接由 Dataset 加载时建立的形态分区生成
+        self.morph_masks = {m: mask_from_flags(_positions_to_flags(pos, self.n)) for m, pos in rows.by_morph.items()}
+        self._cols = {}
+        self._cond_cache = {}
+
+    def column(self, col):
+        """某列全部行的取值列表（缓存）。"""
+        if col not in self._cols:
+            self._cols[col] = [r.get(col) for r in self.rows]
+        return self._cols[col]
+
+    def morph_mask(self, morph):
+        """单个 (B,D,F) 或其列表的形态掩码。"""
+        m = 0
+        for key in morph_keys(morph):
+            m |= self.morph_masks.get(key, 0)
+        return m
+
+    def cond_mask(self, key, value):
+        """单个条件的掩码；filter_rows 会忽略的条件返回 None（不做约束）。"""
+        if isinstance(value, list):
+            value = tuple(value)
+        ck = (key, value)
+        if ck not in self._cond_cache:
+            pred = condition_predicate(key, value)
+            if pred is None:
+                self._cond_cache[ck] = None
+            else:
+                col = self.column(FILTER_OPS[key][0])
+                self._cond_cache[ck] = mask_from_flags(x is not None and pred(x) for x in col)
+        return self._cond_cache[ck]
+
+    def filter_mask(self, morph, **kwargs):
+        """等价于 filter_rows(rows, morph, **kwargs) 的掩码（未去重）。"""
+        m = self.morph_mask(morph)
+        for k, v in kwargs.items():
+            if not m:
+                break
+            cm = self.cond_mask(k, v)
+            if cm is not None:
+                m &= cm
+        return m
+
+    def counts(self, mask):
+        """按场次去重后的 (总场次, 上, 下, 走)。"""
+        u = mask & self.first_mask
+        om = self.outcome_masks
+        return (
+            u.bit_count(),
+            (u & om['上']).bit_count(),
+            (u & om['下']).bit_count(),
+            (u & om['走']).bit_count(),
+        )
+
+    def rows_of(self, mask, unique=True):
+        """掩码对应的数据行（保持原顺序）；unique=True 时等价于 unique_by_game 的结果。"""
+        if unique:
+            mask &= self.first_mask
+        return [self.rows[i] for i in iter_bits(mask)]
+
+    def batch_counts(self, items):
+        """
+        批量统计：items 为 [(morph, conditions), ...]。
+        先把所有规则用到的 (键, 值) 去重编译成条件掩码（即「条件 × 行」的谓词矩阵），
+        再逐条规则做按位与 + popcount。返回与 items 对应的 (总场次, 上, 下, 走) 列表。
+        """
+        for _, conditions in items:
+            for k, v in conditions.items():
+                self.cond_mask(k, v)
+        return [self.counts(self.filter_mask(morph, **conditions)) for morph, conditions in items]
+
+
+def _positions_to_flags(pos, n):
+    flags = [False] * n
+    for i in pos:
+        flags[i] = True
+    return flags
+
+
+def mask_from_positions(pos, n):
+    """位序号集合 -> 位掩码（n 为总位数）。"""
+    return mask_from_flags(_positions_to_flags(pos, n))
+
+
+def greedy_cover(masks, universe=None, target=None):
+    """
+    贪心集合覆盖：每一步选「新增覆盖最多」的规则（新增 = popcount(rule & ~covered)），
+    直到覆盖 target 个元素（默认 = 全部规则的并集）或没有规则能再新增。
+    用惰性堆：覆盖只增不减，规则的新增量只会变小，堆顶重算后仍不小于次大者即可直接选中，
+    不必每步重算全部规则，上万条候选规则也只需毫秒级。新增量相同时选序号小的，与逐步重算全部规则的朴素贪心结果相同。
+    返回 [(规则序号, 新增数, 累计覆盖数), ...]，按选中顺序排列。
+    """
+    if universe is None:
+        universe = 0
+        for m in masks:
+            universe |= m
+    if target is None:
+        target = universe.bit_count()
+    heap = [(-(m & universe).bit_count(), i) for i, m in enumerate(masks)]
+    heapq.heapify(heap)
+    covered = 0
+    n_covered = 0
+    order = []
+    while heap and n_covered < target:
+        _, i = heapq.heappop(heap)
+        gain = (masks[i] & universe & ~covered).bit_count()
+        if gain == 0:
+            continue
+        if heap and (-gain, i) > heap[0]:
+            heapq.heappush(heap, (-gain, i))
+            continue
+        covered |= masks[i] & universe
+        n_covered += gain
+        order.append((i, gain, n_covered))
+    return order
+
+
+def rules_needed(order, total, ratios):
+    """根据 greedy_cover 的结果，返回 {比例: 达到该覆盖率所需的最少规则数（贪心近似），不可达为 None}。"""
+    out = {}
+    for ratio in ratios:
+        need = ratio * total
+        out[ratio] = next((k + 1 for k, (_, _, c) in enumerate(order) if c >= need - 1e-9), None)
+    return out
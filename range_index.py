@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按形态的区间计数索引：一列、两列阈值条件下的 (总场次, 上, 下, 走) 用二分查找得到，不再逐行筛选。
+
+每个形态只取场次首行（与 unique_by_game 相同；场次键含全部条件列，先去重再筛选与先筛选再去重一致），然后：
+- 单列：该列非空值排序，附三种结果的前缀计数，一个条件 = 排序数组上的一段连续区间，两次二分即得计数；
+- 两列：以第一列排序为下标建归并排序树（线段树，每个节点存区间内第二列取值的有序数组及前缀计数），
+  第一列区间拆成 O(log n) 个节点，每个节点对第二列二分，合计 O(log² n)；
+- 三列及以上：每列条件同样是排序位置上的一段区间，取区间最窄的一列的候选行，
+  其余列只需比较行在该列中的排序位置（整数比较），不再逐个浮点条件判断。
+
+条件按 FILTER_OPS 解释，与 filter_rows 完全一致：容差方向相同（H_gt 为 x > v - eps），
+未识别的键和值为 None 的条件忽略，None（及 NaN）不满足任何条件；同一列的多个条件取区间交集。
+
+条件 -> 区间的结果按形态做有界 LRU 缓存（RANGE_CACHE_SIZE 条）：规则搜索反复用到的红色列条件常驻，
+/query 传入的任意阈值不会让缓存无限增长。
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from heapq import merge
+
+from analyze_asia_concentration import as_dataset, _game_key, morph_keys, FILTER_OPS, _RANGE_EPS
+
+_CODES = {'上': 0, '下': 1, '走': 2}
+# 每个形态缓存的 (列, 条件) -> 区间 条数上限
+RANGE_CACHE_SIZE = 4096
+
+
+def _bounds(vals, op, v):
+    """有序数组 vals 中满足单个条件的下标区间 [lo, hi)。"""
+    e = _RANGE_EPS
+    if op == 'ge':
+        return bisect_left(vals, v - e), len(vals)
+    if op == 'le':
+        return 0, bisect_right(vals, v + e)
+    if op == 'lt':
+        return 0, bisect_left(vals, v - e)
+    if op == 'gt':
+        return bisect_right(vals, v + e), len(vals)
+    if op == 'gt_loose':
+        return bisect_right(vals, v - e), len(vals)
+    return bisect_left(vals, v[0] - e), bisect_right(vals, v[1] + e)
+
+
+def _range_of(vals, conds):
+    """同一列上若干 (op, v) 条件的交集区间 [lo, hi)。"""
+    lo, hi = 0, len(vals)
+    for op, v in conds:
+        a, b = _bounds(vals, op, v)
+        lo, hi = max(lo, a), min(hi, b)
+    return lo, max(lo, hi)
+
+
+class _Sorted:
+    """一组 (值, 结果码) 按值排序后的数组及三种结果的前缀计数。"""
+    __slots__ = ('vals', 'cum')
+
+    def __init__(self, pairs):
+        self.vals = [x for x, _ in pairs]
+        cum = ([0], [0], [0])
+        for _, code in pairs:
+            for u in range(3):
+                cum[u].append(cum[u][-1] + (code == u))
+        self.cum = cum
+
+    def counts(self, lo, hi):
+        c = self.cum
+        return hi - lo, c[0][hi] - c[0][lo], c[1][hi] - c[1][lo], c[2][hi] - c[2][lo]
+
+
+def _valid(x):
+    return x is not None and x == x
+
+
+class _MergeSortTree:
+    """以 a 列排序位置为下标的线段树，节点存该段内 b 列取值的 _Sorted。"""
+
+    def __init__(self, a_order, b_col, codes):
+        # a_order：a 列非空的行（形态内序号）按 a 值排序
+        size = 1
+        while size < len(a_order):
+            size *= 2
+        self.size = size
+        nodes = [None] * (2 * size)
+        leaves = [[] for _ in range(size)]
+        for pos, i in enumerate(a_order):
+            if _valid(b_col[i]):
+                leaves[pos] = [(b_col[i], codes[i])]
+        for pos in range(size):
+            nodes[size + pos] = leaves[pos]
+        for k in range(size - 1, 0, -1):
+            nodes[k] = list(merge(nodes[2 * k], nodes[2 * k + 1], key=lambda p: p[0]))
+        self.nodes = [None] + [_Sorted(p) for p in nodes[1:]]
+
+    def counts(self, lo, hi, b_conds):
+        """a 列排序位置在 [lo, hi) 且 b 列满足 b_conds 的计数。"""
+        total = [0, 0, 0, 0]
+        lo += self.size
+        hi += self.size
+        nodes = self.nodes
+        while lo < hi:
+            if lo & 1:
+                self._add(total, nodes[lo], b_conds)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                self._add(total, nodes[hi], b_conds)
+            lo //= 2
+            hi //= 2
+        return tuple(total)
+
+    @staticmethod
+    def _add(total, node, b_conds):
+        a, b = _range_of(node.vals, b_conds)
+        if a < b:
+            for u, c in enumerate(node.counts(a, b)):
+                total[u] += c
+
+
+class _MorphIndex:
+    """单个 (B,D,F) 形态的去重行及按需建立的列索引、两列归并排序树。"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.codes = [_CODES.get(r['U'], 3) for r in rows]
+        self.total = (len(rows),) + tuple(self.codes.count(u) for u in range(3))
+        self._values = {}
+        self._orders = {}
+        self._sorted = {}
+        self._ranks = {}
+        self._trees = {}
+        self._range_cache = OrderedDict()
+        self._range_lock = threading.Lock()
+
+    def values(self, col):
+        if col not in self._values:
+            self._values[col] = [r.get(col) for r in self.rows]
+        return self._values[col]
+
+    def order(self, col):
+        """该列非空的行（形态内序号）按值排序。"""
+        if col not in self._orders:
+            vals = self.values(col)
+            self._orders[col] = sorted((i for i, x in enumerate(vals) if _valid(x)), key=vals.__getitem__)
+        return self._orders[col]
+
+    def rank(self, col):
+        """每行在该列排序中的位置；该列为空的行为 -1（不落在任何区间内）。"""
+        if col not in self._ranks:
+            rank = [-1] * len(self.rows)
+            for pos, i in enumerate(self.order(col)):
+                rank[i] = pos
+            self._ranks[col] = rank
+        return self._ranks[col]
+
+    def column(self, col):
+        if col not in self._sorted:
+            vals, codes = self.values(col), self.codes
+            self._sorted[col] = _Sorted([(vals[i], codes[i]) for i in self.order(col)])
+        return self._sorted[col]
+
+    def tree(self, a, b):
+        if (a, b) not in self._trees:
+            self._trees[(a, b)] = _MergeSortTree(self.order(a), self.values(b), self.codes)
+        return self._trees[(a, b)]
+
+    def range_of(self, col, conds):
+        """该列条件对应的排序位置区间 [lo, hi)（LRU 缓存，/query 的请求线程共用）。"""
+        key = (col, conds)
+        cache = self._range_cache
+        with self._range_lock:
+            r = cache.get(key)
+            if r is not None:
+                cache.move_to_end(key)
+                return r
+        r = _range_of(self.column(col).vals, conds)
+        with self._range_lock:
+            cache[key] = r
+            if len(cache) > RANGE_CACHE_SIZE:
+                cache.popitem(last=False)
+        return r
+
+    def counts(self, by_col):
+        if not by_col:
+            return self.total
+        ranges = {col: self.range_of(col, conds) for col, conds in by_col.items()}
+        if any(lo >= hi for lo, hi in ranges.values()):
+            return 0, 0, 0, 0
+        if len(ranges) == 1:
+            (col, (lo, hi)), = ranges.items()
+            return self.column(col).counts(lo, hi)
+        if len(ranges) == 2:
+            # 列对按列名排序，(K, N) 与 (N, K) 共用一棵树
+            a, b = sorted(ranges)
+            return self.tree(a, b).counts(*ranges[a], by_col[b])
+        # 三列及以上：从区间最窄的一列取候选行，其余列比较排序位置
+        first = min(ranges, key=lambda c: ranges[c][1] - ranges[c][0])
+        others = [(self.rank(c), lo, hi) for c, (lo, hi) in ranges.items() if c != first]
+        lo, hi = ranges[first]
+        total = [0, 0, 0, 0]
+        codes = self.codes
+        for i in self.order(first)[lo:hi]:
+            if all(a <= rank[i] < b for rank, a, b in others):
+                total[0] += 1
+                if codes[i] < 3:
+                    total[codes[i] + 1] += 1
+        return tuple(total)
+
+
+def _matches(r, by_col):
+    """单行是否满足全部条件（单个值看作长度为 1 的有序数组，与区间查询同一套边界）。"""
+    for col, conds in by_col.items():
+        x = r.get(col)
+        if not _valid(x) or _range_of([x], conds) != (0, 1):
+            return False
+    return True
+
+
+def conditions_by_column(kwargs):
+    """filter_rows 的条件参数 -> {列: ((op, v), ...)}，去掉 filter_rows 会忽略的条件。"""
+    by_col = {}
+    for k, v in kwargs.items():
+        if v is None or k not in FILTER_OPS:
+            continue
+        col, op = FILTER_OPS[k]
+        if op == 'range':
+            v = tuple(v)
+        by_col[col] = by_col.get(col, ()) + ((op, v),)
+    return by_col
+
+
+class RangeIndex:
+    """
+    全部数据的区间计数索引（按形态懒建）。
+    counts(morph, **kwargs) 等价于 stats(unique_by_game(filter_rows(rows, morph, **kwargs)))[:4]。
+    """
+
+    def __init__(self, rows):
+        rows = as_dataset(rows)
+        self.dataset = rows
+        seen = set()
+        self._first = set()
+        for i, r in enumerate(rows):
+            k = _game_key(r)
+            if k not in seen:
+                seen.add(k)
+                self._first.add(i)
+        self._morphs = {}
+
+    def morph(self, key):
+        """单个 (B,D,F) 的 _MorphIndex（懒建）。"""
+        if key not in self._morphs:
+            rows = self.dataset
+            self._morphs[key] = _MorphIndex([rows[i] for i in rows.morph_indices(key) if i in self._first])
+        return self._morphs[key]
+
+    def counts(self, morph, **kwargs):
+        """(总场次, 上, 下, 走)，按场次去重；morph 为单个 (B,D,F) 或其列表（各形态场次互不重叠，直接相加）。"""
+        by_col = conditions_by_column(kwargs)
+        total = [0, 0, 0, 0]
+        for key in morph_keys(morph):
+            for u, c in enumerate(self.morph(key).counts(by_col)):
+                total[u] += c
+        return tuple(total)
+
+    def rows(self, morph, **kwargs):
+        """等价于 unique_by_game(filter_rows(rows, morph, **kwargs)) 的行（逐行判断，保持原顺序）。"""
+        by_col = conditions_by_column(kwargs)
+        rows = self.dataset
+        return [rows[i] for i in rows.morph_indices(morph) if i in self._first and _matches(rows[i], by_col)]
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台重建规则库：上传的新工作簿在独立的工作进程中 解析 -> 生成规则 -> 导出快照，
+app 进程里只有一个监视线程收进度、发布结果，处理 /check 的请求线程不参与解析和搜索（也不争 GIL）。
+
+任务状态（RebuildJobs.get / list 返回的字典）：
+    {"id", "status": queued / running / done / error, "phase": queued / loading_data / computing /
+     exporting / publishing / done / error, "progress": 0~1, "filename", "target", "error",
+     "rules_85", "rules_80", "rows", "created_at", "started_at", "finished_at"}
+发布：工作进程把快照写到临时文件；app 进程先把新形态分片写到临时目录，全部写好后才把快照、分片目录
+换入 static/（原文件改名备份），再调用 on_publish(数据行, 规则库) 整体替换内存中的规则库。
+任何一步失败都换回原快照和分片、恢复原工作簿，旧规则库继续服务。
+同一时间只运行一个任务（工作簿替换、快照与分片都是全局的）。
+"""
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from rule_engine import SNAPSHOT_PATH, build_rules, save_snapshot
+from static_shards import SHARDS_DIR, rule_shards, write_shards
+
+# 保留最近的任务记录条数
+JOB_HISTORY = 20
+
+
+class SubmitError(Exception):
+    """任务没能提交到进程池（已恢复原工作簿，任务记为失败）。"""
+
+# ---------------- 工作进程 ----------------
+
+_progress_queue = None
+
+
+def _init_worker(queue):
+    global _progress_queue
+    _progress_queue = queue
+
+
+def _run_job(job_id, data_path, snapshot_tmp, source):
+    """工作进程：加载数据、生成规则库、把快照写到 snapshot_tmp。返回 (数据行, 规则库, 快照内容)。"""
+    last = {'phase': None, 'progress': -1.0}
+
+    def progress(phase, fraction):
+        # generate_rules 每个组合回调一次，只在阶段变化或进度前进 1% 时发送
+        if phase != last['phase'] or fraction - last['progress'] >= 0.01 or fraction >= 1.0:
+            last['phase'], last['progress'] = phase, fraction
+            _progress_queue.put((job_id, phase, fraction))
+
+    rows, library = build_rules(data_path, progress=progress)
+    progress('exporting', 0.0)
+    output = save_snapshot(library, snapshot_tmp, source=source)
+    return rows, library, output
+
+
+# ---------------- app 进程 ----------------
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _swap_back(swapped):
+    """撤销 _swap_in：删除换入的新文件，把备份改回原名。"""
+    for live, bak in reversed(swapped):
+        _remove(live)
+        if bak:
+            os.replace(bak, live)
+
+
+def _swap_in(pairs, tag):
+    """
+    把 (新路径, 线上路径) 依次换入，线上原有的文件或目录先改名为 <线上路径>.<tag>.bak。
+    返回 [(线上路径, 备份路径或 None), ...] 供 _swap_back 恢复；中途失败时已换入的部分自动恢复。
+    """
+    swapped = []
+    try:
+        for new, live in pairs:
+            bak = f'{live}.{tag}.bak' if os.path.exists(live) else None
+            if bak:
+                _remove(bak)
+                os.replace(live, bak)
+            swapped.append((live, bak))
+            os.replace(new, live)
+    except Exception:
+        _swap_back(swapped)
+        raise
+    return swapped
+
+
+class RebuildJobs:
+    """
+    上传任务管理：submit 替换工作簿并提交到进程池，get / list 查询状态。
+    on_publish(rows, library) 在监视线程中调用，负责替换内存中的规则库。
+    """
+
+    def __init__(self, on_publish, data_path):
+        self.on_publish = on_publish
+        self.data_path = data_path
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._queue = None
+
+    def _ensure_pool(self):
+        # spawn：app 进程里有请求线程，fork 出的子进程可能继承被其他线程持有的锁
+        ctx = multiprocessing.get_context('spawn')
+        # 进度队列和收进度的线程只建一次；进程池损坏后重建时沿用同一个队列
+        if self._queue is None:
+            self._queue = ctx.Queue()
+            threading.Thread(target=self._drain_progress, name='rebuild-progress', daemon=True).start()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=ctx,
+                                             initializer=_init_worker, initargs=(self._queue,))
+
+    def _drain_progress(self):
+        while True:
+            job_id, phase, fraction = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                # 发布阶段之后到达的迟到进度忽略
+                if job is not None and job['status'] in ('queued', 'running') and job['phase'] != 'publishing':
+                    if job['status'] == 'queued':
+                        job['status'] = 'running'
+                        job['started_at'] = time.time()
+                    job['phase'] = phase
+                    job['progress'] = round(fraction, 4)
+
+    def busy(self):
+        with self._lock:
+            return any(j['status'] in ('queued', 'running') for j in self._jobs.values())
+
+    def submit(self, upload_path, target, filename):
+        """
+        用 upload_path（已保存的上传文件）替换工作簿 target（原文件改名为 target.bak），
+        提交重建任务并返回任务状态。已有任务在运行时抛 RuntimeError；
+        提交到进程池失败时恢复原工作簿、任务记为失败并抛 SubmitError。
+        """
+        with self._lock:
+            if any(j['status'] in ('queued', 'running') for j in self._jobs.values()):
+                raise RuntimeError('已有规则库重建任务在运行')
+            job_id = uuid.uuid4().hex[:12]
+            backup = target + '.bak' if os.path.exists(target) else None
+            if backup:
+                os.replace(target, backup)
+            os.replace(upload_path, target)
+            job = {
+                'id': job_id,
+                'status': 'queued',
+                'phase': 'queued',
+                'progress': 0.0,
+                'filename': filename,
+                'target': target,
+                'error': None,
+                'rules_85': None,
+                'rules_80': None,
+                'rows': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+            }
+            self._jobs[job_id] = job
+            while len(self._jobs) > JOB_HISTORY:
+                self._jobs.popitem(last=False)
+        snapshot_tmp = f'{SNAPSHOT_PATH}.{job_id}.tmp'
+        source = f'AI 自动从 {self.data_path} 按 RED_CONDITIONS 和条件1/2 生成的高集中度规则（上传 {filename}）'
+        try:
+            self._ensure_pool()
+            fut = self._pool.submit(_run_job, job_id, self.data_path, snapshot_tmp, source)
+        except Exception as e:
+            # 进程池已损坏或已关闭：下次提交时重建；本任务不会运行，换回原工作簿并释放任务槽
+            self._pool = None
+            self._restore_workbook(target, backup)
+            self._set(job_id, status='error', phase='error', error=f'{type(e).__name__}: {e}',
+                      finished_at=time.time())
+            raise SubmitError(f'提交重建任务失败：{e}') from e
+        fut.add_done_callback(lambda f: self._finish(job_id, f, snapshot_tmp, backup))
+        return self.get(job_id)
+
+    def _finish(self, job_id, fut, snapshot_tmp, backup):
+        """
+        任务结束（在进程池的管理线程中调用）：成功则发布，失败则恢复原工作簿。
+        新分片先写到 static/shards.<任务id>.tmp/，快照和分片目录都准备好后才换入，
+        on_publish 失败时换回原快照和分片，磁盘上不会留下被拒绝的上传生成的规则。
+        """
+        job = self._jobs[job_id]
+        staging = f'{SHARDS_DIR}.{job_id}.tmp'
+        live_dir = os.path.join(SHARDS_DIR, 'rules')
+        staged_dir = os.path.join(staging, 'rules')
+        swapped = []
+        try:
+            rows, library, output = fut.result()
+            self._set(job_id, phase='publishing', progress=1.0)
+            # 从现有分片复制起，内容没变的分片保留修改时间（与直接重写时相同）
+            if os.path.isdir(live_dir):
+                shutil.copytree(live_dir, staged_dir)
+            write_shards('rules', rule_shards(output), source=SNAPSHOT_PATH, meta=output.get('meta', {}),
+                         total=len(output['rules_85']) + len(output['rules_80']), root=staging)
+            swapped = _swap_in([(snapshot_tmp, SNAPSHOT_PATH), (staged_dir, live_dir)], job_id)
+            self.on_publish(rows, library)
+            for _, bak in swapped:
+                if bak:
+                    _remove(bak)
+            self._set(job_id, status='done', phase='done', rows=len(rows),
+                      rules_85=len(library['rules_85']), rules_80=len(library['rules_80']))
+        except Exception as e:
+            _swap_back(swapped)
+            if os.path.exists(snapshot_tmp):
+                os.remove(snapshot_tmp)
+            self._restore_workbook(job['target'], backup)
+            if isinstance(e, BrokenProcessPool):
+                self._pool = None  # 工作进程异常退出，下次提交时重建进程池
+            self._set(job_id, status='error', phase='error', error=f'{type(e).__name__}: {e}')
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            self._set(job_id, finished_at=time.time())
+
+    @staticmethod
+    def _restore_workbook(target, backup):
+        """任务失败：把原工作簿换回；新增的工作簿直接删除（否则下次启动会被读入）。"""
+        if backup and os.path.exists(backup):
+            os.replace(backup, target)
+        elif not backup and os.path.exists(target):
+            os.remove(target)
+
+    def _set(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self):
+        """最近的任务（新的在前）。"""
+        with self._lock:
+            return [dict(j) for j in reversed(self._jobs.values())]
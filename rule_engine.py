@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI 规则库引擎：生成、去冗余、快照读写、单行匹配，不依赖 Flask。
+- generate_rules(dataset, criteria)：按红色列条件 1～3 列组合搜索满足条件1/条件2 的规则（分箱立方体统计），
+  附 p 值 / q 值，并去冗余；
+- generate_rules_by_grouping：各形态只统计一次，一次运行得到多种形态分组方式（逐形态、按主客、按盘口、全部合并等）的规则库；
+- save_snapshot / load_snapshot：static/rules.json（网页与 app 共用的快照格式）；
+- check_conditions：判断一行输入匹配哪些规则（app /check、check_one.py 共用）；
+  RuleMatcher 为其按形态、按列阈值建位掩码索引的版本，结果相同（app 用 MATCHER=indexed 启用）。
+
+数据相关的模块（analyze_asia_concentration、mask_index、cube、significance）在函数内按需导入，
+只做匹配的工具（如 check_one.py）导入本模块不需要解析任何工作簿。
+"""
+import json
+import os
+from bisect import bisect_left, bisect_right
+from itertools import combinations
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'rules.json')
+
+# 浮点比较容差：筛选（analyze_asia_concentration._RANGE_EPS）与单行匹配共用这一个值
+RANGE_EPS = 1e-9
+
+
+def _cond1_prediction(shang, xia, zou, n_total):
+    """条件1：(上+走)或(下+走)比例>85%，总场次>6，差值>3。满足则返回预测方向，否则 None。"""
+    if n_total <= 6:
+        return None
+    if (shang + zou) / n_total * 100 > 85 and shang - zou > 3:
+        return '上'
+    if (xia + zou) / n_total * 100 > 85 and xia - zou > 3:
+        return '下'
+    return None
+
+
+def _cond2_prediction(shang, xia, zou, n_total):
+    """条件2：上/走/下任一比例>80%，总场次>4。满足则返回该结果，否则 None。"""
+    if n_total <= 4:
+        return None
+    for label, v in (('上', shang), ('走', zou), ('下', xia)):
+        if v / n_total * 100 > 80:
+            return label
+    return None
+
+
+# 规则库名 -> 判定函数 (上, 下, 走, 总场次) -> 预测结果或 None
+CRITERIA = {
+    'rules_85': _cond1_prediction,
+    'rules_80': _cond2_prediction,
+}
+
+CRITERIA_DESCRIPTIONS = {
+    'condition1': '(上+走)或(下+走)比例>85%，总场次>6，差值>3',
+    'condition2': '上/走/下任一比例>80%，总场次>4',
+    'p_value': '占比最高的结果相对形态组基准比例的双侧精确二项检验（分母为总场次）',
+    'q_value': '对全部评估过的条件组合做 Benjamini–Hochberg 校正后的 q 值',
+    'variants': '与本规则匹配场次完全相同、已合并的其他条件组合（保留条件最少的一条）',
+    'n_subsumed': '因本规则条件是其真子集且预测结果相同而被删除的规则数',
+}
+
+
+def web_morph_groups():
+    """网页规则库的形态分组：一大组 = 主与客各 MORPH_GROUP_DF 的 4 种 (D,F)，共 8 个 morph。"""
+    from analyze_asia_concentration import MORPH_GROUP_DF
+    return [
+        [('主', d, f) for d, f in MORPH_GROUP_DF] + [('客', d, f) for d, f in MORPH_GROUP_DF],
+    ]
+
+
+def condition_combos():
+    """红色列条件的 1～3 列组合（同一列不重复），顺序与逐个 combinations 枚举一致。"""
+    from analyze_asia_concentration import RED_CONDITIONS, _no_duplicate_col
+    out = []
+    for n_cond in range(1, min(4, len(RED_CONDITIONS) + 1)):
+        for cond_combo in combinations(RED_CONDITIONS, n_cond):
+            if _no_duplicate_col(cond_combo):
+                out.append(cond_combo)
+    return out
+
+
+def _resolve_criteria(criteria):
+    if criteria is None:
+        return dict(CRITERIA)
+    if isinstance(criteria, dict):
+        return dict(criteria)
+    return {name: CRITERIA[name] for name in criteria}
+
+
+def generate_rules(dataset, criteria=None, morph_groups=None, progress=None, prune=True, index=None, cube=None):
+    """
+    在 dataset（load_xlsx 的结果或行列表）上生成规则库。
+    criteria：规则库名列表或 {名: 判定函数}，默认 CRITERIA（rules_85 条件1、rules_80 条件2）；
+    morph_groups：形态分组列表，默认 web_morph_groups()；
+    progress(已完成组合数, 组合总数)：可选进度回调；
+    prune：是否去冗余（见 prune_rules）。
+    每条规则附 p_value（占比最高的结果相对形态组基准比例的双侧精确二项检验，分母为总场次）
+    和 q_value（对全部评估过的组合做 BH 校正）。
+    统计查 cube.OutcomeCube 的分箱前缀和（红色列阈值都是切分点），立方体回答不了的组合回退到 MaskIndex 位掩码，
+    两者都与 filter_rows + unique_by_game 的结果一致。只改判定标准重新生成时，传入同一个 index / cube 即可只做查表。
+    返回 {规则库名: [规则, ...]}。
+    """
+    from cube import OutcomeCube
+    from mask_index import MaskIndex
+
+    criteria = _resolve_criteria(criteria)
+    if morph_groups is None:
+        morph_groups = web_morph_groups()
+    if index is None:
+        index = MaskIndex(dataset)
+    if cube is None:
+        cube = OutcomeCube(index.rows)
+    combos = condition_combos()
+    plans = [cube.plan({c[1]: c[2] for c in cond_combo}) for cond_combo in combos]
+    total = len(combos) * len(morph_groups)
+    done = 0
+
+    out = {name: [] for name in criteria}
+    # 全部评估过的组合的 (占比最高结果的场次, 总场次, 该结果在形态组中的基准比例, rule_info)，
+    # 循环结束后一次性批量算双侧二项 p 值和 BH q 值
+    evaluated = []
+    for morph_group in morph_groups:
+        group = cube.group_key(morph_group)
+        group_total = (cube.evaluate(group, cube.plan({}))
+                       or index.counts(index.morph_mask(morph_group)))
+
+        def counts():
+            nonlocal done
+            for cond_combo, plan in zip(combos, plans):
+                done += 1
+                if progress is not None and done % 500 == 0:
+                    progress(done, total)
+                yield (cube.evaluate(group, plan)
+                       or index.counts(index.filter_mask(morph_group, **{c[1]: c[2] for c in cond_combo})))
+
+        _collect_rules(morph_group, combos, counts(), group_total, criteria, out, evaluated)
+
+    return _finish_rules(out, evaluated, criteria, prune, index)
+
+
+def _collect_rules(morph_group, combos, counts, group_total, criteria, out, evaluated):
+    """
+    形态组在各条件组合下的统计 counts（与 combos 一一对应的 (总场次, 上, 下, 走)）-> 规则，
+    满足判定的追加到 out[规则库名]，全部非空组合追加到 evaluated（见 generate_rules；不满足任何判定的 rule_info 为 None）。
+    """
+    g_total, g_shang, g_xia, g_zou = group_total
+    base_rate = {u: (v / g_total if g_total else 0)
+                 for u, v in (('上', g_shang), ('下', g_xia), ('走', g_zou))}
+    predicts = list(criteria.items())
+    for cond_combo, (n_total, shang, xia, zou) in zip(combos, counts):
+        if n_total == 0:
+            continue
+        # 占比最高的结果（并列时按 上、下、走 的顺序取先出现的）
+        main_label, main_val = '上', shang
+        if xia > main_val:
+            main_label, main_val = '下', xia
+        if zou > main_val:
+            main_label, main_val = '走', zou
+        hits = [name for name, predict in predicts if predict(shang, xia, zou, n_total) is not None]
+        # 只为满足判定的组合建规则字典；其余组合只参与 q 值校正
+        rule_info = _rule_info(morph_group, cond_combo, n_total, shang, xia, zou) if hits else None
+        evaluated.append((main_val, n_total, base_rate[main_label], rule_info))
+        for name in hits:
+            out[name].append(rule_info)
+
+
+def _rule_info(morph_group, cond_combo, n_total, shang, xia, zou):
+    return {
+        'morph': morph_group[0],  # 兼容前端显示
+        'morph_group': morph_group,
+        'feature': '，且'.join([c[0] for c in cond_combo]),
+        'conditions': {c[1]: c[2] for c in cond_combo},
+        'shang_zou_ratio': (shang + zou) / n_total * 100,
+        'xia_zou_ratio': (xia + zou) / n_total * 100,
+        'shang_ratio': shang / n_total * 100,
+        'zou_ratio': zou / n_total * 100,
+        'xia_ratio': xia / n_total * 100,
+        'n_total': n_total,
+        'shang': shang,
+        'xia': xia,
+        'zou': zou,
+    }
+
+
+def _finish_rules(out, evaluated, criteria, prune, index):
+    """给 evaluated 中的规则批量附 p 值、q 值，按需去冗余，返回 {规则库名: [规则, ...]}。"""
+    from significance import binom_two_sided, bh_qvalues
+
+    pvals = binom_two_sided([e[0] for e in evaluated], [e[1] for e in evaluated], [e[2] for e in evaluated])
+    qvals = bh_qvalues(pvals)
+    for (_, _, _, rule_info), p, q in zip(evaluated, pvals, qvals):
+        if rule_info is not None:
+            rule_info['p_value'] = p
+            rule_info['q_value'] = q
+
+    if prune:
+        out = {name: prune_rules(rules, criteria[name], index) for name, rules in out.items()}
+    return out
+
+
+def morph_groupings(morphs, names=None):
+    """
+    常用的形态分组方式：{名称: 形态组列表}。morphs 为参与分组的 (B,D,F) 列表（web 除外）：
+    - per_morph：每个形态单独一组（与 run_search 逐形态搜索相同）；
+    - per_side：主、客各一组（合并全部盘口）；
+    - per_df：每个 (D,F) 盘口一组（主+客合并）；
+    - all：全部形态合并为一组；
+    - web：网页规则库的形态组（web_morph_groups，与 morphs 无关）。
+    names 为要返回的分组名称列表，默认全部。
+    """
+    morphs = list(dict.fromkeys(tuple(m) for m in morphs))
+    by_side, by_df = {}, {}
+    for m in morphs:
+        by_side.setdefault(m[0], []).append(m)
+        by_df.setdefault(m[1:], []).append(m)
+    groupings = {
+        'per_morph': [[m] for m in morphs],
+        'per_side': list(by_side.values()),
+        'per_df': list(by_df.values()),
+        'all': [morphs] if morphs else [],
+        'web': web_morph_groups(),
+    }
+    if names is None:
+        return groupings
+    unknown = [n for n in names if n not in groupings]
+    if unknown:
+        raise ValueError(f"未知的形态分组: {', '.join(unknown)}（可用：{', '.join(groupings)}）")
+    return {n: groupings[n] for n in names}
+
+
+def generate_rules_by_grouping(dataset, groupings=None, criteria=None, progress=None, prune=True, index=None):
+    """
+    一次运行得到多种形态分组方式的规则库：{分组名称: {规则库名: [规则, ...]}}。
+    groupings 为 {分组名称: 形态组列表}，默认 morph_groupings(数据中全部主/客形态)。
+
+    各形态的数据行互不重叠（场次键含 B、D、F），形态组的掩码是组内各形态掩码的 OR，计数就是各形态计数之和。
+    所以每个形态只建一次自己的条件掩码（只覆盖该形态的行，很短），逐条件组合求交、popcount，
+    存成按组合排列的计数数组；各分组方式的每个形态组只把组内形态的数组逐项相加，不再统计数据。
+    每种分组方式单独做 p 值 / q 值和去冗余，结果与 generate_rules(dataset, criteria, morph_groups=该分组) 完全相同。
+    progress(已统计的 形态×组合 数, 总数)：可选进度回调（只覆盖统计阶段）。
+    """
+    from array import array
+
+    from analyze_asia_concentration import morph_keys
+    from mask_index import MaskIndex, OUTCOMES
+
+    criteria = _resolve_criteria(criteria)
+    if index is None:
+        index = MaskIndex(dataset)
+    rows = index.rows
+    if groupings is None:
+        groupings = morph_groupings(sorted(m for m in rows.by_morph if m[0] in ('主', '客')))
+    combos = condition_combos()
+
+    # 形态 -> (形态总计, 4 个 array('i')：各组合的 总场次/上/下/走)；数据中没有的形态不统计，按 0 处理
+    morphs = list(dict.fromkeys(m for groups in groupings.values() for g in groups for m in morph_keys(g)))
+    present = [m for m in morphs if rows.morph_count(m)]
+    total = len(present) * len(combos)
+    done = 0
+    table = {}
+    for morph in present:
+        sub = MaskIndex(rows.morph_rows(morph))
+        first = sub.first_mask
+        up, down, push = (sub.outcome_masks[u] for u in OUTCOMES)
+        cols = ([], [], [], [])
+        for cond_combo in combos:
+            m = first
+            for c in cond_combo:
+                cm = sub.cond_mask(c[1], c[2])
+                if cm is not None:
+                    m &= cm
+            cols[0].append(m.bit_count())
+            cols[1].append((m & up).bit_count())
+            cols[2].append((m & down).bit_count())
+            cols[3].append((m & push).bit_count())
+        done += len(combos)
+        if progress is not None:
+            progress(done, total)
+        table[morph] = (sub.counts(sub.all_mask), tuple(array('i', col) for col in cols))
+
+    zeros = array('i', [0]) * len(combos)
+    result = {}
+    for name, groups in groupings.items():
+        out = {crit: [] for crit in criteria}
+        evaluated = []
+        for morph_group in groups:
+            members = [table[m] for m in morph_keys(morph_group) if m in table]
+            group_total = tuple(sum(t[0][k] for t in members) for k in range(4))
+            if len(members) == 1:
+                cols = members[0][1]
+            else:
+                cols = [[sum(v) for v in zip(*(t[1][k] for t in members))] if members else zeros for k in range(4)]
+            _collect_rules(morph_group, combos, zip(*cols), group_total, criteria, out, evaluated)
+        result[name] = _finish_rules(out, evaluated, criteria, prune, index)
+    return result
+
+
+def prune_rules(rules, predict, index):
+    """
+    规则库去冗余（predict 为该规则库的判定函数，见 CRITERIA）：
+    1. 匹配场次完全相同的规则只保留条件条数最少的一条（同条数保留先出现的），
+       其余记入保留规则的 variants（特征列表）；
+    2. 若某条规则的条件（键+值）是另一条保留规则条件的真子集、且两者按该条件预测的结果相同，
+       则较严格的规则不会带来新的命中，删除，并记入子集规则的 subsumes。
+    匹配场次用位掩码比较（按场次去重后的掩码），不重新筛选数据。返回去冗余后的规则列表（保持原顺序）。
+    """
+    # 各规则库共用同一批 rule_info，复制后再写 variants/subsumes，避免互相影响
+    rules = [dict(r) for r in rules]
+    by_mask = {}
+    for rule in rules:
+        m = index.filter_mask(rule['morph_group'], **rule['conditions']) & index.first_mask
+        key = (tuple(rule['morph_group']), m)
+        rep = by_mask.get(key)
+        if rep is None or len(rule['conditions']) < len(rep['conditions']):
+            if rep is not None:
+                rule.setdefault('variants', []).extend([rep['feature']] + rep.pop('variants', []))
+            by_mask[key] = rule
+        else:
+            rep.setdefault('variants', []).append(rule['feature'])
+    kept = set(id(r) for r in by_mask.values())
+    reps = [r for r in rules if id(r) in kept]
+
+    # 按条件条数从少到多处理，子集规则一定先于较严格的规则确定去留
+    kept_by_items = {}
+    result = set()
+    for rule in sorted(reps, key=lambda r: len(r['conditions'])):
+        items = tuple(sorted(rule['conditions'].items()))
+        pred = predict(rule['shang'], rule['xia'], rule['zou'], rule['n_total'])
+        owner = None
+        for k in range(1, len(items)):
+            for sub in combinations(items, k):
+                cand = kept_by_items.get((tuple(rule['morph_group']), sub))
+                if cand is not None and predict(cand['shang'], cand['xia'], cand['zou'], cand['n_total']) == pred:
+                    owner = cand
+                    break
+            if owner is not None:
+                break
+        if owner is not None:
+            owner.setdefault('subsumes', []).append(rule['feature'])
+            continue
+        kept_by_items[(tuple(rule['morph_group']), items)] = rule
+        result.add(id(rule))
+    return [r for r in reps if id(r) in result]
+
+
+def build_rules(data_path=None, progress=None):
+    """
+    加载数据并生成规则库。data_path 默认 DATA_PATH；progress(阶段, 进度0~1) 可选。
+    返回 (数据行, {规则库名: [规则, ...]})。
+    """
+    from analyze_asia_concentration import DATA_PATH, load_xlsx
+    from mask_index import MaskIndex
+
+    if progress:
+        progress('loading_data', 0.0)
+    rows = load_xlsx(data_path or DATA_PATH)
+    print(f"已加载 {len(rows)} 条数据")
+    index = MaskIndex(rows)
+    raw = generate_rules(rows, prune=False, index=index,
+                         progress=(lambda done, total: progress('computing', done / total)) if progress else None)
+    library = {name: prune_rules(rules, CRITERIA[name], index) for name, rules in raw.items()}
+    print(f"规则去冗余: 条件1 {len(raw['rules_85'])} -> {len(library['rules_85'])} 条，"
+          f"条件2 {len(raw['rules_80'])} -> {len(library['rules_80'])} 条")
+    print(f"已计算规则 - 条件1 [(上+走)或(下+走)>85%, 总场次>6, 差值>3]: {len(library['rules_85'])} 条")
+    print(f"已计算规则 - 条件2 [上/走/下任一>80%, 总场次>4]: {len(library['rules_80'])} 条")
+    return rows, library
+
+
+# ---- 快照（static/rules.json）----
+
+def rule_to_dict(rule):
+    """内存中的规则 -> JSON 可序列化的字典（rules.json 格式）。"""
+    d = {
+        'morph': list(rule['morph']),  # 兼容：单形态
+        'feature': rule['feature'],
+        'conditions': {k: (list(v) if isinstance(v, tuple) else v) for k, v in rule['conditions'].items()},
+        'shang_zou_ratio': rule['shang_zou_ratio'],
+        'xia_zou_ratio': rule['xia_zou_ratio'],
+        'shang_ratio': rule['shang_ratio'],
+        'zou_ratio': rule['zou_ratio'],
+        'xia_ratio': rule['xia_ratio'],
+        'n_total': rule['n_total'],
+        'shang': rule['shang'],
+        'xia': rule['xia'],
+        'zou': rule['zou'],
+        'p_value': rule.get('p_value'),
+        'q_value': rule.get('q_value'),
+        'variants': rule.get('variants', []),
+        'n_subsumed': len(rule.get('subsumes', [])),
+    }
+    if rule.get('morph_group'):
+        d['morph_group'] = [list(m) for m in rule['morph_group']]
+    return d
+
+
+def rule_from_dict(d):
+    """rules.json 中的规则 -> 内存格式（形态为元组，范围条件为元组）。"""
+    rule = dict(d)
+    rule['morph'] = tuple(d['morph'])
+    if d.get('morph_group'):
+        rule['morph_group'] = [tuple(m) for m in d['morph_group']]
+    rule['conditions'] = {k: (tuple(v) if isinstance(v, list) else v) for k, v in d['conditions'].items()}
+    return rule
+
+
+def save_snapshot(library, path=SNAPSHOT_PATH, source=None):
+    """把 {规则库名: [规则]} 写成 rules.json（网页直接读取的格式）。"""
+    output = {name: [rule_to_dict(r) for r in rules] for name, rules in library.items()}
+    output['meta'] = {
+        'count_85': len(output.get('rules_85', [])),
+        'count_80': len(output.get('rules_80', [])),
+        'description': dict(CRITERIA_DESCRIPTIONS),
+        'source': source,
+    }
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """读取 rules.json，返回 {规则库名: [规则（内存格式）]}。"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {name: [rule_from_dict(r) for r in data.get(name, [])] for name in CRITERIA}
+
+
+# ---- 匹配 ----
+
+def _num(row_data, col):
+    """取数值列；空值、无法解析和 NaN 都返回 None，两种匹配实现都按「该列无值」处理。"""
+    val = row_data.get(col)
+    if val is None:
+        return None
+    if not isinstance(val, (int, float)):
+        if isinstance(val, str):
+            val = val.strip()
+            if not val:
+                return None
+        try:
+            val = float(val)
+        except (ValueError, TypeError):
+            return None
+    return None if val != val else val
+
+
+def _morph_in_group(rule, morph):
+    group = rule.get('morph_group')
+    if not group:
+        return tuple(rule['morph']) == morph
+    return any(tuple(m) == morph for m in group)
+
+
+def check_conditions(row_data, rules):
+    """返回 row_data（列名 -> 值）匹配的规则列表。只判断主/客；条件带浮点容差 RANGE_EPS。"""
+    B = str(row_data.get('B', '')).strip()  # 主/客
+    D = str(row_data.get('D', '')).strip()  # 澳门
+    F = str(row_data.get('F', '')).strip()  # 马会
+    if B not in ('主', '客'):
+        return []
+    morph = (B, D, F)
+    col_val = {c: _num(row_data, c) for c in ('G', 'I', 'K', 'N', 'P', 'Q', 'R')}
+    e = RANGE_EPS
+
+    matched = []
+    for rule in rules:
+        if not _morph_in_group(rule, morph):
+            continue
+        ok = True
+        for key, val in rule['conditions'].items():
+            cv = col_val.get(key.split('_')[0])  # G_ge -> G
+            if cv is None:
+                ok = False
+            elif key.endswith('_ge'):
+                ok = cv >= val - e
+            elif key.endswith('_le'):
+                ok = cv <= val + e
+            elif key.endswith('_gt'):
+                ok = cv > val - e
+            elif key.endswith('_lt'):
+                ok = cv < val + e
+            elif key.endswith('_range'):
+                ok = val[0] - e <= cv <= val[1] + e
+            if not ok:
+                break
+        if ok:
+            matched.append(rule)
+    return matched
+
+
+# check_conditions 读取的条件列；其他列上的条件在 check_conditions 中取不到值，规则永远不匹配
+_MATCH_COLS = ('G', 'I', 'K', 'N', 'P', 'Q', 'R')
+
+
+def _cond_bounds(key, val, e):
+    """
+    条件 -> 该列上的 (下界, 上界)，None 为无界；界写成 (阈值, 0/1)，输入值 x 写成 (x, 0.5) 比较，
+    与 check_conditions 的比较方式逐一对应：
+        x >= a ⇔ (x, .5) > (a, 0)    x > a ⇔ (x, .5) > (a, 1)
+        x <= a ⇔ (x, .5) < (a, 1)    x < a ⇔ (x, .5) < (a, 0)
+    未识别的后缀只要求该列有值（check_conditions 中不改变结果）。
+    """
+    if key.endswith('_ge'):
+        return (val - e, 0), None
+    if key.endswith('_le'):
+        return None, (val + e, 1)
+    if key.endswith('_gt'):
+        return (val - e, 1), None
+    if key.endswith('_lt'):
+        return None, (val + e, 0)
+    if key.endswith('_range'):
+        return (val[0] - e, 0), (val[1] + e, 1)
+    return None, None
+
+
+class RuleMatcher:
+    """
+    check_conditions 的索引版：结果（含顺序）与 check_conditions(row_data, rules) 完全相同。
+
+    规则按形态（形态组展开）分桶，桶内第 i 条规则占位 i；每个条件列把桶内所有阈值排成切分点，
+    相邻切分点之间的每一段预先算好「该列条件成立的规则」位掩码（没有该列条件的规则恒为 1）。
+    匹配一行 = 每列二分查找所在段，7 个位掩码相与，不再逐条规则比较。
+    """
+
+    def __init__(self, rules):
+        e = RANGE_EPS
+        buckets = {}
+        for rule in rules:
+            group = rule.get('morph_group') or [rule['morph']]
+            for morph in dict.fromkeys(tuple(m) for m in group):
+                buckets.setdefault(morph, []).append(rule)
+        self.rules = rules
+        self._by_morph = {}
+        for morph, bucket in buckets.items():
+            kept = []
+            per_col = {}  # 列 -> [(位, 下界, 上界), ...]
+            for rule in bucket:
+                cols = {}
+                for key, val in rule['conditions'].items():
+                    col = key.split('_')[0]
+                    if col not in _MATCH_COLS:
+                        cols = None
+                        break
+                    lo, hi = _cond_bounds(key, val, e)
+                    old_lo, old_hi = cols.get(col, (None, None))
+                    if old_lo is not None and (lo is None or old_lo > lo):
+                        lo = old_lo
+                    if old_hi is not None and (hi is None or old_hi < hi):
+                        hi = old_hi
+                    cols[col] = (lo, hi)
+                if cols is None:
+                    continue
+                bit = 1 << len(kept)
+                kept.append(rule)
+                for col, (lo, hi) in cols.items():
+                    per_col.setdefault(col, []).append((bit, lo, hi))
+            if kept:
+                full = (1 << len(kept)) - 1
+                self._by_morph[morph] = (kept, full, [self._column(col, per_col[col], full) for col in _MATCH_COLS
+                                                      if col in per_col])
+
+    @staticmethod
+    def _column(col, items, full):
+        """一列的 (列名, 切分点, 各段位掩码, 该列无值时的位掩码)。"""
+        cuts = sorted({b for _, lo, hi in items for b in (lo, hi) if b is not None})
+        constrained = 0
+        add = [0] * (len(cuts) + 2)
+        drop = [0] * (len(cuts) + 2)
+        for bit, lo, hi in items:
+            constrained |= bit
+            # 输入落在第 p 段（p = 小于它的切分点个数）时：x 高于下界 ⇔ p > 下界序号，低于上界 ⇔ p <= 上界序号
+            start = 0 if lo is None else bisect_left(cuts, lo) + 1
+            end = len(cuts) + 1 if hi is None else bisect_left(cuts, hi) + 1
+            if start < end:
+                add[start] |= bit
+                drop[end] |= bit
+        free = full & ~constrained
+        segments = []
+        running = 0
+        for p in range(len(cuts) + 1):
+            running = (running | add[p]) & ~drop[p]
+            segments.append(running | free)
+        return col, cuts, segments, free
+
+    def match(self, row_data):
+        """返回 row_data 匹配的规则列表（与 check_conditions 相同）。"""
+        B = str(row_data.get('B', '')).strip()
+        D = str(row_data.get('D', '')).strip()
+        F = str(row_data.get('F', '')).strip()
+        if B not in ('主', '客'):
+            return []
+        entry = self._by_morph.get((B, D, F))
+        if entry is None:
+            return []
+        kept, mask, columns = entry
+        for col, cuts, segments, free in columns:
+            x = _num(row_data, col)
+            if x is None:  # 空值（含 NaN）：该列的条件都不成立
+                mask &= free
+            else:
+                mask &= segments[bisect_right(cuts, (x, 0.5))]
+            if not mask:
+                return []
+        matched = []
+        while mask:
+            low = mask & -mask
+            matched.append(kept[low.bit_length() - 1])
+            mask ^= low
+        return matched
+
+
+# /check 可选的匹配实现：名称 -> 工厂 f(规则列表) -> 匹配函数 g(行) -> 匹配到的规则列表
+MATCHERS = {
+    'linear': lambda rules: (lambda row_data: check_conditions(row_data, rules)),
+    'indexed': lambda rules: RuleMatcher(rules).match,
+}
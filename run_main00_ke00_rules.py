@@ -14,7 +14,9 @@ from collections import Counter
 from itertools import combinations
 
 from analyze_asia_concentration import (
+    DATA_PATH,
     load_xlsx,
+    resolve_data_paths,
     filter_rows,
     unique_by_game,
     outcome_set,
@@ -22,7 +24,6 @@ from analyze_asia_concentration import (
     _no_duplicate_col,
 )
 
-DATA_PATH = 'docs/20252026欧洲FB.xlsx'
 TARGET_MORPHS = [('主', '0', '0'), ('客', '0', '0')]
 
 
@@ -98,11 +99,15 @@ def compute_rules(rows):
 
 
 def main():
-    if not os.path.exists(DATA_PATH):
-        print(f"数据文件不存在: {DATA_PATH}")
+    try:
+        missing = [p for p in resolve_data_paths(DATA_PATH) if not os.path.exists(p)]
+    except FileNotFoundError:
+        missing = [DATA_PATH]
+    if missing:
+        print(f"数据文件不存在: {', '.join(missing)}")
         sys.exit(1)
     rows = load_xlsx(DATA_PATH)
-    base = [r for r in rows if (r['B'], r['D'], r['F']) in TARGET_MORPHS]
+    base = rows.morph_rows(TARGET_MORPHS)
     base_u = len(unique_by_game(base))
     print(f"数据: {DATA_PATH}")
     print(f"主/0/0 + 客/0/0 总行数: {len(base)}，按场次去重: {base_u}")
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导出流水线：按声明的输入/输出依次（能并行的并行）运行各导出脚本，输入内容没变的步骤直接跳过。
+
+每个步骤声明：
+- 数据输入（工作簿、上一步的输出等）和输出文件；
+- 脚本本身及其 import 的本仓库模块（用 ast 递归找出，函数内的延迟 import 也算），代码改了同样会重跑。
+输入、输出按 SHA-256 比较，记录在 .pipeline_state.json；文件大小和修改时间都没变时直接沿用记录的哈希，不重新读文件。
+步骤满足以下全部条件时跳过：上次成功、输入文件集合与哈希都相同、输出文件仍在且未被改动。
+
+步骤之间的依赖由「某步的输入是另一步的输出」自动得出；互不依赖的步骤（AI 规则库 vs 手工/汇总类型库）并行运行。
+结束时打印每步的状态与耗时。
+
+用法：
+    python3 run_pipeline.py                 # 只跑有变化的步骤
+    python3 run_pipeline.py --force         # 全部重跑
+    python3 run_pipeline.py --only rules    # 只跑指定步骤（其上游步骤有变化也会先跑）
+    python3 run_pipeline.py --dry-run       # 只显示哪些步骤会运行及原因
+有步骤失败时退出码为 1。
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(ROOT, '.pipeline_state.json')
+
+
+def _data_paths():
+    from analyze_asia_concentration import DATA_PATH, resolve_data_paths
+    return resolve_data_paths(DATA_PATH)
+
+
+# 步骤：名称 -> {script, inputs, outputs}；inputs 可为函数（运行时求值，如 ASIA_DATA 指定的工作簿列表）。
+# 路径相对仓库根目录（各脚本也以仓库根目录为工作目录运行）。
+STEPS = {
+    'rules': {
+        'script': 'export_rules.py',
+        'inputs': _data_paths,
+        'outputs': ['static/rules.json', 'static/shards/rules/manifest.json'],
+    },
+    'rules_txt': {
+        'script': 'export_rules_txt.py',
+        'inputs': ['static/rules.json'],
+        'outputs': ['AI类型库_条件1条件2.txt'],
+    },
+    'manual_types': {
+        'script': 'export_manual_types.py',
+        'inputs': lambda: ['docs/规则.xlsx'] + _data_paths(),
+        'outputs': ['static/manual_types.json', '手工类型库结果.txt'],
+    },
+    'summary_types': {
+        'script': 'export_summary_types.py',
+        'inputs': ['docs/202605欧洲FB.xlsx'],
+        'outputs': ['static/summary_types_v2.json', 'static/shards/summary_types_v2/manifest.json'],
+    },
+    'verify_deploy': {
+        'script': 'verify_deploy.py',
+        'inputs': ['index.html', 'static/rules.json',
+                   'static/shards/rules/manifest.json', 'static/shards/summary_types_v2/manifest.json'],
+        'outputs': [],
+    },
+}
+
+
+# ---------------- 代码依赖 ----------------
+
+def local_imports(script, _seen=None):
+    """脚本及其递归 import 的本仓库模块（相对路径，排序）。"""
+    seen = set() if _seen is None else _seen
+    if script in seen or not os.path.exists(os.path.join(ROOT, script)):
+        return sorted(seen)
+    seen.add(script)
+    with open(os.path.join(ROOT, script), 'rb') as f:
+        tree = ast.parse(f.read(), filename=script)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            path = name.split('.')[0] + '.py'
+            if os.path.exists(os.path.join(ROOT, path)):
+                local_imports(path, seen)
+    return sorted(seen)
+
+
+# ---------------- 哈希与状态 ----------------
+
+def load_state():
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}, 'steps': {}}
+
+
+def save_state(state):
+    tmp = STATE_PATH + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, STATE_PATH)
+
+
+def file_hash(path, state):
+    """文件的 SHA-256（不存在为 None）；大小和修改时间与上次相同时沿用 state['files'] 中的记录。"""
+    full = os.path.join(ROOT, path)
+    try:
+        st = os.stat(full)
+    except OSError:
+        return None
+    cached = state['files'].get(path)
+    if cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+        return cached['sha256']
+    h = hashlib.sha256()
+    with open(full, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    state['files'][path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': h.hexdigest()}
+    return h.hexdigest()
+
+
+def step_inputs(name):
+    """步骤的全部输入：数据输入 + 脚本及其 import 的本仓库模块。"""
+    spec = STEPS[name]
+    data = spec['inputs']() if callable(spec['inputs']) else spec['inputs']
+    return list(dict.fromkeys(list(data) + local_imports(spec['script'])))
+
+
+def stale_reason(name, inputs, state):
+    """需要运行的原因；可以跳过时返回 None。inputs 为 {路径: 哈希}。"""
+    rec = state['steps'].get(name)
+    if rec is None:
+        return '没有运行记录'
+    if not rec.get('ok'):
+        return '上次运行失败'
+    missing = [p for p, h in inputs.items() if h is None]
+    if missing:
+        return f'输入不存在: {", ".join(missing)}'
+    old = rec.get('inputs', {})
+    changed = [p for p in inputs if old.get(p) != inputs[p]]
+    removed = [p for p in old if p not in inputs]
+    if changed or removed:
+        return f'输入有变化: {", ".join(changed + removed)}'
+    for p, h in rec.get('outputs', {}).items():
+        if file_hash(p, state) != h:
+            return f'输出缺失或被改动: {p}'
+    return None
+
+
+# ---------------- 调度 ----------------
+
+def dependencies(names):
+    """步骤 -> 它依赖的上游步骤（其输出是本步骤的输入）。"""
+    producer = {out: n for n in STEPS for out in STEPS[n]['outputs']}
+    deps = {}
+    for n in names:
+        spec = STEPS[n]
+        data = spec['inputs']() if callable(spec['inputs']) else spec['inputs']
+        deps[n] = sorted({producer[p] for p in data if p in producer and producer[p] != n})
+    return deps
+
+
+def with_upstream(names):
+    """加上所选步骤的全部上游步骤，按 STEPS 中的顺序返回。"""
+    deps = dependencies(list(STEPS))
+    out = set()
+    stack = list(names)
+    while stack:
+        n = stack.pop()
+        if n not in out:
+            out.add(n)
+            stack.extend(deps[n])
+    return [n for n in STEPS if n in out]
+
+
+def run_step(name):
+    """运行一个步骤的脚本，返回 (是否成功, 耗时秒数, 输出文本)。"""
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.join(ROOT, STEPS[name]['script'])],
+                          cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    return proc.returncode == 0, time.perf_counter() - t0, proc.stdout.decode('utf-8', 'replace')
+
+
+def run_pipeline(names, force=False, dry_run=False, jobs=None):
+    """运行（或跳过）names 中的步骤，返回 [(步骤, 状态, 耗时, 说明), ...]，状态为 运行/跳过/失败/未运行。"""
+    state = load_state()
+    deps = dependencies(names)
+    pending = list(names)
+    running = {}
+    done = {}
+    summary = []
+    with ThreadPoolExecutor(max_workers=jobs or len(names) or 1) as ex:
+        while pending or running:
+            for name in list(pending):
+                busy = set(pending) | {n for n, _ in running.values()}
+                if any(d in busy for d in deps[name]):
+                    continue
+                pending.remove(name)
+                failed_up = [d for d in deps[name] if done.get(d) in ('失败', '未运行')]
+                if failed_up:
+                    done[name] = '未运行'
+                    summary.append((name, '未运行', 0.0, f'上游失败: {", ".join(failed_up)}'))
+                    continue
+                inputs = {p: file_hash(p, state) for p in step_inputs(name)}
+                reason = '强制重跑' if force else stale_reason(name, inputs, state)
+                if dry_run and reason is None and any(done.get(d) == '将运行' for d in deps[name]):
+                    reason = '上游将运行'
+                if reason is None:
+                    done[name] = '跳过'
+                    summary.append((name, '跳过', 0.0, '输入未变化'))
+                    continue
+                if dry_run:
+                    done[name] = '将运行'
+                    summary.append((name, '将运行', 0.0, reason))
+                    continue
+                print(f'[{name}] 开始：{reason}', flush=True)
+                running[ex.submit(run_step, name)] = (name, reason)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name, reason = running.pop(fut)
+                ok, seconds, output = fut.result()
+                print(f'---- [{name}] 输出 ----\n{output.rstrip()}', flush=True)
+                outputs = {p: file_hash(p, state) for p in STEPS[name]['outputs']}
+                missing = [p for p, h in outputs.items() if h is None]
+                if ok and missing:
+                    ok, reason = False, f'运行后缺少输出: {", ".join(missing)}'
+                # 输入在运行后重新取哈希：运行期间被改动的输入下次会再触发
+                state['steps'][name] = {
+                    'ok': ok,
+                    'inputs': {p: file_hash(p, state) for p in step_inputs(name)},
+                    'outputs': outputs,
+                    'seconds': round(seconds, 3),
+                    'finished_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                }
+                save_state(state)
+                done[name] = '运行' if ok else '失败'
+                summary.append((name, done[name], seconds, reason))
+    if not dry_run:
+        save_state(state)
+    order = {n: i for i, n in enumerate(names)}
+    return sorted(summary, key=lambda s: order[s[0]])
+
+
+def print_summary(summary, total):
+    print('\n' + '=' * 60)
+    print(f"{'步骤':<16}{'状态':<8}{'耗时':>8}  说明")
+    for name, status, seconds, note in summary:
+        print(f"{name:<16}{status:<8}{seconds:>7.2f}s  {note}")
+    print(f"总耗时 {total:.2f}s")
+    print('=' * 60)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='按内容哈希增量运行导出流水线')
+    ap.add_argument('--force', action='store_true', help='忽略记录，全部重跑')
+    ap.add_argument('--only', help='逗号分隔的步骤名（自动带上游步骤）：' + ', '.join(STEPS))
+    ap.add_argument('--dry-run', action='store_true', help='只显示哪些步骤会运行')
+    ap.add_argument('--jobs', type=int, default=None, help='最多同时运行的步骤数（默认不限）')
+    args = ap.parse_args(argv)
+    # 数据路径（ASIA_DATA 等）和各脚本的相对路径都以仓库根目录为准
+    os.chdir(ROOT)
+
+    names = list(STEPS)
+    if args.only:
+        picked = [n.strip() for n in args.only.split(',') if n.strip()]
+        unknown = [n for n in picked if n not in STEPS]
+        if unknown:
+            ap.error(f'未知步骤: {", ".join(unknown)}（可用：{", ".join(STEPS)}）')
+        names = with_upstream(picked)
+
+    t0 = time.perf_counter()
+    summary = run_pipeline(names, force=args.force, dry_run=args.dry_run, jobs=args.jobs)
+    print_summary(summary, time.perf_counter() - t0)
+    return 1 if any(s[1] in ('失败', '未运行') for s in summary) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则显著性：精确二项检验 p 值 + Benjamini–Hochberg q 值（控制错误发现率 FDR）。
+被检验的是看过数据后选出的占比最高的结果，用双侧 p 值（观察值一侧的尾概率翻倍），单侧会偏小最多一半。
+
+组合搜索会评估上万个条件组合，集中度>80% 的组合里有不少只是噪声。这里对「全部评估过的组合」
+一次性批量计算：
+- 按 (n, p0) 把组合分组，每组只建一张尾概率表 P(X>=k)（对数空间累加，O(n)），
+  之后每个组合查表即可，不逐条做 Python 级的求和；
+- q 值按全部 p 值统一做 BH 校正。
+"""
+import math
+from collections import defaultdict
+
+
+def _tail_table(n, p):
+    """返回长度 n+2 的列表 t，t[k] = P(X >= k)，X ~ Binomial(n, p)。"""
+    if p <= 0:
+        return [1.0] + [0.0] * (n + 1)
+    if p >= 1:
+        return [1.0] * (n + 1) + [0.0]
+    lp, lq = math.log(p), math.log1p(-p)
+    lgn = math.lgamma(n + 1)
+    t = [0.0] * (n + 2)
+    acc = -math.inf
+    for k in range(n, -1, -1):
+        lpmf = lgn - math.lgamma(k + 1) - math.lgamma(n - k + 1) + k * lp + (n - k) * lq
+        hi, lo = (acc, lpmf) if acc > lpmf else (lpmf, acc)
+        acc = hi + math.log1p(math.exp(lo - hi)) if lo != -math.inf else hi
+        t[k] = min(1.0, math.exp(acc))
+    return t
+
+
+def binom_sf(ks, ns, ps=0.5):
+    """
+    批量单侧 p 值 P(X >= k)。ks、ns 为等长序列；ps 为单个概率或与之等长的序列。
+    相同 (n, p) 的组合共用一张尾概率表。
+    """
+    ks, ns = list(ks), list(ns)
+    ps = list(ps) if isinstance(ps, (list, tuple)) else [ps] * len(ks)
+    groups = defaultdict(list)
+    for i, (n, p) in enumerate(zip(ns, ps)):
+        groups[(n, p)].append(i)
+    out = [1.0] * len(ks)
+    for (n, p), idx in groups.items():
+        t = _tail_table(n, p)
+        for i in idx:
+            out[i] = t[max(0, min(ks[i], n + 1))]
+    return out
+
+
+def binom_two_sided(ks, ns, ps=0.5):
+    """
+    批量双侧 p 值：k 所在一侧的尾概率翻倍，上限 1（k >= n·p 取 P(X >= k)，否则取 P(X <= k)）。
+    p0 = 0.5 时即 2 × P(X >= max(k, n-k))。下尾按 P(n-X >= n-k) 查表，不做 1 - 上尾 的相减。
+    """
+    ks, ns = list(ks), list(ns)
+    ps = list(ps) if isinstance(ps, (list, tuple)) else [ps] * len(ks)
+    upper = binom_sf(ks, ns, ps)
+    lower = binom_sf([n - k for k, n in zip(ks, ns)], ns, [1 - p for p in ps])
+    return [min(1.0, 2 * (u if k >= n * p else lo))
+            for k, n, p, u, lo in zip(ks, ns, ps, upper, lower)]
+
+
+def bh_qvalues(pvals):
+    """Benjamini–Hochberg q 值，与输入顺序对应。"""
+    m = len(pvals)
+    order = sorted(range(m), key=lambda i: pvals[i])
+    q = [1.0] * m
+    running = 1.0
+    for rank in range(m, 0, -1):
+        i = order[rank - 1]
+        running = min(running, pvals[i] * m / rank)
+        q[i] = min(1.0, running)
+    return q
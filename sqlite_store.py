@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可选的 SQLite 存储后端（只用标准库 sqlite3）：
+- 把 load_xlsx 的结果写入本地 SQLite 文件，形态 (B,D,F) 建复合索引，红色列 G/I/K/N/P/Q/R 各建单列索引；
+- 把 filter_rows 的条件（K_ge、G_range ...）编译成参数化 SQL，容差与 filter_rows 完全一致
+  （按 FILTER_OPS 解释，未识别的键同样忽略；SQL 中 NULL 不满足任何比较，对应 None）；
+- 按场次去重在库内完成（每个场次键取最小行号），查询不需要把整张表读进内存。
+
+用法：
+    python3 sqlite_store.py ingest [库文件]                      # 按 DATA_PATH 导入
+    python3 sqlite_store.py query 客/0/0 K_gt=3.25 Q_lt=-0.05     # 按条件统计上/下/走
+"""
+import os
+import sys
+import sqlite3
+from datetime import datetime
+
+from analyze_asia_concentration import DATA_PATH, FILTER_OPS, _RANGE_EPS, morph_keys
+
+DB_PATH = 'docs/rows.sqlite'
+
+# 列名 -> SQLite 类型；行号 id 保持导入顺序，用于复现 unique_by_game「保留第一条」
+_COLUMN_TYPES = (
+    ('X', 'TEXT'), ('C', 'TEXT'), ('B', 'TEXT'), ('D', 'TEXT'), ('F', 'TEXT'), ('U', 'TEXT'),
+    ('E', 'REAL'), ('G', 'REAL'), ('H', 'REAL'), ('I', 'REAL'), ('K', 'REAL'),
+    ('N', 'REAL'), ('P', 'REAL'), ('Q', 'REAL'), ('R', 'REAL'), ('S', 'REAL'), ('T', 'REAL'),
+    ('source', 'TEXT'),
+)
+COLUMNS = tuple(c for c, _ in _COLUMN_TYPES)
+# 与 _game_key 相同的列
+GAME_KEY_COLUMNS = ('B', 'D', 'F', 'E', 'G', 'H', 'I', 'K', 'N', 'P', 'Q', 'R', 'S', 'T', 'source')
+INDEXED_COLUMNS = ('G', 'I', 'K', 'N', 'P', 'Q', 'R')
+
+
+def _to_sql(v):
+    """C 列的 datetime 存为 ISO 文本（可按字符串排序），其他值原样写入。"""
+    return v.isoformat(sep=' ') if isinstance(v, datetime) else v
+
+
+def compile_conditions(morph, **kwargs):
+    """把 filter_rows(rows, morph, **kwargs) 编译成 (WHERE 子句, 参数列表)。"""
+    keys = morph_keys(morph)
+    clauses = ['(' + ' OR '.join('(B = ? AND D = ? AND F = ?)' for _ in keys) + ')']
+    params = [x for k in keys for x in k]
+    e = _RANGE_EPS
+    for k, v in kwargs.items():
+        if v is None or k not in FILTER_OPS:
+            continue
+        col, op = FILTER_OPS[k]
+        if op == 'ge':
+            clauses.append(f'{col} >= ?')
+            params.append(v - e)
+        elif op == 'le':
+            clauses.append(f'{col} <= ?')
+            params.append(v + e)
+        elif op == 'lt':
+            clauses.append(f'{col} < ?')
+            params.append(v - e)
+        elif op == 'gt':
+            clauses.append(f'{col} > ?')
+            params.append(v + e)
+        elif op == 'gt_loose':
+            clauses.append(f'{col} > ?')
+            params.append(v - e)
+        else:
+            clauses.append(f'{col} BETWEEN ? AND ?')
+            params.extend((v[0] - e, v[1] + e))
+    return ' AND '.join(clauses), params
+
+
+class SqliteStore:
+    """SQLite 行存储，接口与 filter_rows / unique_by_game / stats 对应。"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        cols = ', '.join(f'{c} {t}' for c, t in _COLUMN_TYPES)
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS rows (id INTEGER PRIMARY KEY, {cols})')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_rows_morph ON rows (B, D, F)')
+        for c in INDEXED_COLUMNS:
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_rows_{c} ON rows ({c})')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+
+    def ingest(self, rows, replace=True):
+        """写入行（可为生成器）；replace=True 时先清空旧数据。返回写入行数。"""
+        with self.conn:
+            if replace:
+                self.conn.execute('DELETE FROM rows')
+            placeholders = ', '.join('?' for _ in COLUMNS)
+            cur = self.conn.executemany(
+                f'INSERT INTO rows ({", ".join(COLUMNS)}) VALUES ({placeholders})',
+                (tuple(_to_sql(r.get(c)) for c in COLUMNS) for r in rows),
+            )
+        return cur.rowcount
+
+    def _select(self, sql, params):
+        cur = self.conn.execute(sql, params)
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, rec)) for rec in cur]
+
+    def filter_rows(self, morph, **kwargs):
+        """等价于 filter_rows(rows, morph, **kwargs)，按导入顺序返回行字典。"""
+        where, params = compile_conditions(morph, **kwargs)
+        return self._select(f'SELECT {", ".join(COLUMNS)} FROM rows WHERE {where} ORDER BY id', params)
+
+    def _unique_ids_sql(self, where):
+        key = ', '.join(GAME_KEY_COLUMNS)
+        return f'SELECT MIN(id) FROM rows WHERE {where} GROUP BY {key}'
+
+    def unique_rows(self, morph, **kwargs):
+        """等价于 unique_by_game(filter_rows(rows, morph, **kwargs))。"""
+        where, params = compile_conditions(morph, **kwargs)
+        sql = (f'SELECT {", ".join(COLUMNS)} FROM rows WHERE id IN ({self._unique_ids_sql(where)}) '
+               f'ORDER BY id')
+        return self._select(sql, params)
+
+    def counts(self, morph, **kwargs):
+        """按场次去重后的 (总场次, 上, 下, 走)，全部在库内聚合。"""
+        where, params = compile_conditions(morph, **kwargs)
+        sql = f'SELECT U, COUNT(*) FROM rows WHERE id IN ({self._unique_ids_sql(where)}) GROUP BY U'
+        c = dict(self.conn.execute(sql, params).fetchall())
+        shang, xia, zou = c.get('上', 0), c.get('下', 0), c.get('走', 0)
+        return sum(c.values()), shang, xia, zou
+
+
+def _parse_cli_condition(text):
+    """'K_gt=3.25' -> ('K_gt', 3.25)；'G_range=0.89,0.99' -> ('G_range', (0.89, 0.99))。"""
+    key, _, val = text.partition('=')
+    if key.endswith('_range'):
+        lo, hi = val.split(',')
+        return key, (float(lo), float(hi))
+    return key, float(val)
+
+
+def main(argv):
+    if len(argv) >= 1 and argv[0] == 'ingest':
+        from analyze_asia_concentration import load_xlsx
+        db = argv[1] if len(argv) > 1 else DB_PATH
+        if os.path.dirname(db):
+            os.makedirs(os.path.dirname(db), exist_ok=True)
+        store = SqliteStore(db)
+        n = store.ingest(load_xlsx(DATA_PATH))
+        print(f'已写入 {n} 行到 {db}（数据: {DATA_PATH}）')
+        return
+    if len(argv) >= 2 and argv[0] == 'query':
+        store = SqliteStore(os.environ.get('ASIA_DB', DB_PATH))
+        morph = tuple(argv[1].split('/'))
+        kw = dict(_parse_cli_condition(a) for a in argv[2:])
+        n_total, shang, xia, zou = store.counts(morph, **kw)
+        print(f"类型：{'/'.join(morph)}；条件：{kw}；总场次 {n_total}；上{shang}下{xia}走{zou}")
+        return
+    print(__doc__)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,265 @@
+// 批量匹配：2026 汇总类型库 + AI 规则库（static/rules.json 的 rules_85 / rules_80）。
+//
+// 作为 Web Worker 运行时（new Worker('static/match_worker.js')），消息协议：
+//   页面 -> worker  {type: 'init', summaryTypes, rules}          规则库只发送一次，按形态建好索引
+//                   {type: 'shard', library, morph, data}        或按形态分片发送（static/shards/，见 static_shards.py），
+//                                                                library 为 'summary' / 'rules'，morph 为 'B/D/F'；
+//                                                                data.morphs 存在时（规则库按形态组分片）对其中每个形态生效
+//                   {type: 'match', jobId, rows: [{index, layout, data, error}, ...], last}
+//                   {type: 'cancel', jobId}
+//   worker -> 页面  {type: 'ready', summaryCount, ruleCount}
+//                   {type: 'results', jobId, results: [...]}      每处理 CHUNK_SIZE 行发送一次
+//                   {type: 'done', jobId, count, elapsedMs}
+// 同一个 jobId 可以多次发送 match（页面边解析边发送），按到达顺序排队处理；最后一次带 last: true。
+// layout 为 'summary'（2026 汇总布局 A B C D E F G H I K L M O P Q U V W X）时匹配汇总类型库，
+// 为 'AR'（A-R 列，与 /check 相同）时匹配 AI 规则库。
+//
+// 页面不能创建 Worker（如通过 file:// 打开）时，以普通 <script> 引入本文件，
+// 调用 handleMatchMessage(msg, post) 在主线程上分批处理，逻辑完全相同。
+
+const CHUNK_SIZE = 25;
+const RANGE_EPS = 1e-9;  // 与 rule_engine.RANGE_EPS 相同
+const SUMMARY_EPS = 1e-9;
+
+const matchState = {
+    summaryByMorph: new Map(),  // '主/0/0' -> [type, ...]
+    rules85ByMorph: new Map(),  // '主/0/0' -> [rule, ...]（按形态组展开）
+    rules80ByMorph: new Map(),
+    queue: [],                  // 待处理的 {jobId, row}
+    jobs: new Map(),            // jobId -> {count, start, ended}
+    cancelled: new Set(),
+    scheduled: false,
+};
+
+function morphKey(B, D, F) {
+    return `${B}/${D}/${F}`;
+}
+
+function pushTo(map, key, item) {
+    if (!map.has(key)) map.set(key, []);
+    map.get(key).push(item);
+}
+
+function initLibraries(summaryTypes, rules) {
+    matchState.summaryByMorph = new Map();
+    matchState.rules85ByMorph = new Map();
+    matchState.rules80ByMorph = new Map();
+    const types = (summaryTypes && summaryTypes.types) || [];
+    for (const t of types) {
+        const tm = t.morph || [];
+        if (tm.length !== 3) continue;
+        pushTo(matchState.summaryByMorph, morphKey(tm[0], tm[1], tm[2]), t);
+    }
+    // 与 rule_engine._morph_in_group 相同：有形态组时按组内任一形态匹配，否则按规则自身形态
+    const indexRules = (list, map) => {
+        for (const rule of list || []) {
+            const group = rule.morph_group && rule.morph_group.length ? rule.morph_group : [rule.morph];
+            const seen = new Set();
+            for (const m of group) {
+                const key = morphKey(m[0], m[1], m[2]);
+                if (seen.has(key)) continue;
+                seen.add(key);
+                pushTo(map, key, rule);
+            }
+        }
+    };
+    indexRules(rules && rules.rules_85, matchState.rules85ByMorph);
+    indexRules(rules && rules.rules_80, matchState.rules80ByMorph);
+    return {
+        summaryCount: types.length,
+        ruleCount: ((rules && rules.rules_85) || []).length + ((rules && rules.rules_80) || []).length,
+    };
+}
+
+// 单个形态的分片：汇总类型库分片为 {morph, types}，AI 规则库分片为 {morph, rules_85, rules_80}（规则已按形态组展开）
+function addShard(library, key, data) {
+    const keys = data && data.morphs ? data.morphs.map(m => morphKey(m[0], m[1], m[2])) : [key];
+    for (const k of keys) {
+        if (library === 'summary') {
+            matchState.summaryByMorph.set(k, (data && data.types) || []);
+        } else if (library === 'rules') {
+            matchState.rules85ByMorph.set(k, (data && data.rules_85) || []);
+            matchState.rules80ByMorph.set(k, (data && data.rules_80) || []);
+        }
+    }
+}
+
+// 2026 汇总类型库：与原页面 checkSummaryTypes 的判断相同
+function checkSummaryTypes(rowData) {
+    const B = String(rowData.B || '').trim();
+    const D = String(rowData.D || '').trim();
+    const F = String(rowData.F || '').trim();
+    if (B !== '主' && B !== '客') return [];
+
+    function getNum(col) {
+        const val = rowData[col];
+        if (val === null || val === undefined || val === '') return null;
+        const num = parseFloat(val);
+        return isNaN(num) ? null : num;
+    }
+
+    const matched = [];
+    for (const t of matchState.summaryByMorph.get(morphKey(B, D, F)) || []) {
+        const conds = t.conditions || {};
+        let ok = true;
+        outer: for (const [colName, condList] of Object.entries(conds)) {
+            const v = getNum(colName);
+            if (v === null) {
+                ok = false;
+                break;
+            }
+            for (const c of condList) {
+                const val = c.value;
+                if ((c.op === '>=' && !(v >= val)) ||
+                    (c.op === '<=' && !(v <= val)) ||
+                    (c.op === '>' && !(v > val)) ||
+                    (c.op === '<' && !(v < val)) ||
+                    (c.op === '=' && !(Math.abs(v - val) <= SUMMARY_EPS))) {
+                    ok = false;
+                    break outer;
+                }
+            }
+        }
+        if (ok) matched.push(t);
+    }
+    return matched;
+}
+
+// 与 rule_engine._num 相同：空值、非数字为 null
+function toNum(val) {
+    if (val === null || val === undefined) return null;
+    if (typeof val === 'number') return val;
+    const s = String(val).trim();
+    if (!s) return null;
+    const num = Number(s);
+    return isNaN(num) ? null : num;
+}
+
+// AI 规则库：与 rule_engine.check_conditions 相同（_gt 为 x > v - eps，_lt 为 x < v + eps）
+function checkAiRules(rowData, byMorph) {
+    const B = String(rowData.B || '').trim();
+    const D = String(rowData.D || '').trim();
+    const F = String(rowData.F || '').trim();
+    if (B !== '主' && B !== '客') return [];
+    const e = RANGE_EPS;
+    const matched = [];
+    for (const rule of byMorph.get(morphKey(B, D, F)) || []) {
+        let ok = true;
+        for (const [key, val] of Object.entries(rule.conditions || {})) {
+            const cv = toNum(rowData[key.split('_')[0]]);
+            if (cv === null) {
+                ok = false;
+            } else if (key.endsWith('_ge')) {
+                ok = cv >= val - e;
+            } else if (key.endsWith('_le')) {
+                ok = cv <= val + e;
+            } else if (key.endsWith('_gt')) {
+                ok = cv > val - e;
+            } else if (key.endsWith('_lt')) {
+                ok = cv < val + e;
+            } else if (key.endsWith('_range')) {
+                ok = val[0] - e <= cv && cv <= val[1] + e;
+            }
+            if (!ok) break;
+        }
+        if (ok) matched.push(rule);
+    }
+    return matched;
+}
+
+function ruleView(rule, kind) {
+    // 集中度显示值与 /check 相同：条件1 取 (上+走)/(下+走) 较大者，条件2 取上/走/下中最大者
+    const conc = kind === 1
+        ? Math.max(rule.shang_zou_ratio || 0, rule.xia_zou_ratio || 0)
+        : Math.max(rule.shang_ratio || 0, rule.zou_ratio || 0, rule.xia_ratio || 0);
+    return {
+        feature: rule.feature,
+        conc: Math.round(conc * 100) / 100,
+        n_total: rule.n_total,
+        shang: rule.shang,
+        xia: rule.xia,
+        zou: rule.zou,
+    };
+}
+
+function matchRow(row) {
+    const data = row.data || {};
+    const out = {
+        index: row.index,
+        layout: row.layout,
+        morph: [data.B, data.D, data.F].map(v => String(v || '').trim()).join('/'),
+        summary: [],
+        condition1: [],
+        condition2: [],
+    };
+    if (row.error) {
+        out.error = row.error;
+    } else if (row.layout === 'AR') {
+        out.condition1 = checkAiRules(data, matchState.rules85ByMorph).map(r => ruleView(r, 1));
+        out.condition2 = checkAiRules(data, matchState.rules80ByMorph).map(r => ruleView(r, 2));
+    } else {
+        out.summary = checkSummaryTypes(data);
+    }
+    return out;
+}
+
+function processQueue(post) {
+    matchState.scheduled = false;
+    const batch = matchState.queue.splice(0, CHUNK_SIZE);
+    const byJob = new Map();
+    for (const {jobId, row} of batch) {
+        if (matchState.cancelled.has(jobId)) continue;
+        pushTo(byJob, jobId, matchRow(row));
+    }
+    for (const [jobId, results] of byJob) {
+        matchState.jobs.get(jobId).count += results.length;
+        post({type: 'results', jobId, results});
+    }
+    // 某个任务的行全部处理完（队列中不再有它的行）时发送 done
+    const pending = new Set(matchState.queue.map(item => item.jobId));
+    for (const [jobId, job] of matchState.jobs) {
+        if (pending.has(jobId) || !job.ended) continue;
+        if (!matchState.cancelled.has(jobId)) {
+            post({type: 'done', jobId, count: job.count, elapsedMs: Date.now() - job.start});
+        }
+        matchState.jobs.delete(jobId);
+        matchState.cancelled.delete(jobId);
+    }
+    schedule(post);
+}
+
+function schedule(post) {
+    // 每批之间让出事件循环：新到的 match / cancel 消息可以插进来
+    if (!matchState.scheduled && (matchState.queue.length || [...matchState.jobs.values()].some(j => j.ended))) {
+        matchState.scheduled = true;
+        setTimeout(() => processQueue(post), 0);
+    }
+}
+
+function handleMatchMessage(msg, post) {
+    if (msg.type === 'init') {
+        const counts = initLibraries(msg.summaryTypes, msg.rules);
+        post({type: 'ready', ...counts});
+    } else if (msg.type === 'shard') {
+        addShard(msg.library, msg.morph, msg.data);
+    } else if (msg.type === 'match') {
+        if (!matchState.jobs.has(msg.jobId)) {
+            matchState.jobs.set(msg.jobId, {count: 0, start: Date.now(), ended: false});
+        }
+        for (const row of msg.rows || []) {
+            matchState.queue.push({jobId: msg.jobId, row});
+        }
+        // last 为 true 表示该任务的行已全部发送
+        if (msg.last) matchState.jobs.get(msg.jobId).ended = true;
+        schedule(post);
+    } else if (msg.type === 'cancel') {
+        matchState.cancelled.add(msg.jobId);
+        matchState.queue = matchState.queue.filter(item => item.jobId !== msg.jobId);
+        if (matchState.jobs.has(msg.jobId)) matchState.jobs.get(msg.jobId).ended = true;
+        schedule(post);
+    }
+}
+
+if (typeof importScripts === 'function') {
+    self.onmessage = e => handleMatchMessage(e.data, msg => self.postMessage(msg));
+}
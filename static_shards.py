@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态规则库按形态分片：网页判断一行只用得到该行 (B, D, F) 形态的类型/规则，按形态拆成小文件按需加载。
+
+static/shards/<库名>/ 下是分片 JSON 文件，另有 manifest.json：
+    {"library", "source", "meta", "total", "prefetch": [形态键, ...],
+     "shards": {"主/0/0": {"file": "home_0_0.json", "count": 条数, "hash": "..."}, ...}}
+- 形态键为 "B/D/F"，file 相对 manifest 所在目录；多个形态可以指向同一个文件；
+- hash 为分片内容 SHA-256 的前 12 位，网页请求分片时作为查询参数，内容不变就走浏览器缓存；
+- prefetch 为网页空闲时预取的形态（PREFETCH_GROUPS 中各盘口组合的主、客）。
+汇总类型库每个形态一个分片（内容带 "morph"）。AI 规则库按形态组分片：所属形态组相同的形态共用一个分片
+（内容带 "morphs"，多于一个形态时文件名为 group_<哈希>.json），每条规则只写一次，网页按文件下载、对分片内全部形态生效。
+先写分片，最后原子替换 manifest，并删除不再使用的旧分片。
+"""
+import hashlib
+import json
+import os
+
+# 相对本模块所在目录（与 rule_engine.SNAPSHOT_PATH 一致），不随工作目录变化
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+SHARDS_DIR = os.path.join(_ROOT, 'static', 'shards')
+PREFETCH_GROUPS = ('0/0', '0/0.25')
+_SIDES = {'主': 'home', '客': 'away'}
+
+
+def morph_key(morph):
+    """(B, D, F) -> "B/D/F"（与网页用 B、D、F 输入拼出的键相同）。"""
+    return '/'.join(str(x) for x in morph)
+
+
+def shard_filename(morph):
+    B, D, F = morph
+    return f'{_SIDES.get(B, B)}_{D}_{F}.json'
+
+
+def group_filename(morphs):
+    """多个形态共用的分片文件名（由形态集合决定，与内容无关，文件名在规则更新后保持不变）。"""
+    keys = '\n'.join(sorted(morph_key(m) for m in morphs))
+    return f"group_{hashlib.sha256(keys.encode('utf-8')).hexdigest()[:10]}.json"
+
+
+def write_shards(library, shards, source, meta, total, root=None):
+    """
+    写出一个库的分片与 manifest。shards 为 {(B, D, F): 分片内容 dict}；多个形态对应同一个内容对象时
+    （见 rule_shards）只写一个文件，manifest 中这些形态指向它。
+    分片中 types / rules_85 / rules_80 列表的总长度记为 count。返回 manifest。
+    root 为分片根目录（默认 SHARDS_DIR；先写到临时目录再整体换入时指定）。
+    """
+    out_dir = os.path.join(root or SHARDS_DIR, library)
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}  # id(分片内容) -> manifest 条目
+    entries = {}
+    for morph in sorted(shards):
+        content = shards[morph]
+        if id(content) in written:
+            entries[morph_key(morph)] = dict(written[id(content)])
+            continue
+        body = json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        name = group_filename(content['morphs']) if len(content.get('morphs', ())) > 1 else shard_filename(morph)
+        path = os.path.join(out_dir, name)
+        # 内容没变时不重写，保留修改时间（流水线按哈希判断，部署时也少一次变更）
+        try:
+            with open(path, 'rb') as f:
+                unchanged = f.read() == body
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            with open(path, 'wb') as f:
+                f.write(body)
+        count = sum(len(content.get(k, ())) for k in ('types', 'rules_85', 'rules_80'))
+        entries[morph_key(morph)] = written[id(content)] = {
+            'file': name,
+            'count': count,
+            'hash': hashlib.sha256(body).hexdigest()[:12],
+        }
+
+    prefetch = []
+    for group in PREFETCH_GROUPS:
+        for side in _SIDES:
+            key = f'{side}/{group}'
+            if key in entries:
+                prefetch.append(key)
+    manifest = {
+        'library': library,
+        'source': os.path.relpath(source, _ROOT) if os.path.isabs(source) else source,
+        'meta': meta,
+        'total': total,
+        'prefetch': prefetch,
+        'shards': entries,
+    }
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    tmp = manifest_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, manifest_path)
+
+    keep = {e['file'] for e in entries.values()} | {'manifest.json'}
+    for name in os.listdir(out_dir):
+        if name.endswith('.json') and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+    return manifest
+
+
+def summary_type_shards(data):
+    """汇总类型库（export_summary_types 的输出）-> {形态: {"morph", "types"}}。"""
+    shards = {}
+    for t in data.get('types', []):
+        morph = tuple(t.get('morph') or ())
+        if len(morph) != 3:
+            continue
+        shards.setdefault(morph, {'morph': list(morph), 'types': []})['types'].append(t)
+    return shards
+
+
+def rule_shards(library):
+    """
+    AI 规则库（rules.json 的内容）-> {形态: {"morphs", "rules_85", "rules_80"}}。
+    按「形态属于哪些形态组」把形态分类，同一类的形态共用一个分片内容对象（write_shards 只写一个文件）：
+    网页规则库只有一个形态组时全部形态共用一个分片，每条规则只出现一次。
+    一个形态属于多个形态组时，它所在的分片包含这些组的全部规则，与 check_conditions 按组内任一形态匹配一致。
+    分片里的规则去掉 morph_group（分片的 morphs 已给出适用的形态）。
+    """
+    rules = []  # [(库名, 规则, 形态组)]
+    membership = {}  # 形态 -> 所属形态组的序号
+    groups = {}
+    for kind in ('rules_85', 'rules_80'):
+        for rule in library.get(kind, []):
+            group = tuple(dict.fromkeys(tuple(m) for m in (rule.get('morph_group') or [rule['morph']])))
+            gid = groups.setdefault(group, len(groups))
+            rules.append((kind, rule, gid))
+            for morph in group:
+                membership.setdefault(morph, set()).add(gid)
+
+    by_signature = {}
+    for morph, gids in membership.items():
+        by_signature.setdefault(frozenset(gids), []).append(morph)
+    shards = {}
+    for signature, morphs in by_signature.items():
+        shard = {'morphs': [list(m) for m in sorted(morphs)], 'rules_85': [], 'rules_80': []}
+        for kind, rule, gid in rules:
+            if gid in signature:
+                shard[kind].append({k: v for k, v in rule.items() if k != 'morph_group'})
+        for morph in morphs:
+            shards[morph] = shard
+    return shards
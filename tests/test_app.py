@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""app.py 的 /check 结果缓存：规则库发布与请求并发时不能把旧规则的结果记在新版本下。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+ROW = {'B': '主', 'D': '0', 'F': '0', 'K': '3.3'}
+RULE = {
+    'morph': ('主', '0', '0'), 'feature': 'K>3.0', 'conditions': {'K_gt': 3.0},
+    'n_total': 6, 'shang': 6, 'xia': 0, 'zou': 0,
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # 不启动后台预热，规则库由测试直接发布；_publish / _attach_rows 替换的全局状态在测试结束后恢复
+    monkeypatch.setattr(app, '_warm_up_thread', object())
+    monkeypatch.setattr(app, 'LIBRARY', dict(app.LIBRARY))
+    monkeypatch.setattr(app, 'STATE', dict(app.STATE, phase='ready'))
+    monkeypatch.setattr(app, 'check_cache', app.LRUCache(16))
+    return app.app.test_client()
+
+
+def test_publish_between_library_and_version_reads(client, monkeypatch):
+    app._publish(None, [], [], 'test')  # 旧规则库：不匹配任何行
+
+    parse = app.parse_input_data
+    published = []
+
+    def parse_then_publish(data):
+        # /check 已取到旧规则库、尚未取版本号时发布新规则库
+        if not published:
+            published.append(True)
+            app._publish(None, [RULE], [], 'test')
+        return parse(data)
+
+    monkeypatch.setattr(app, 'parse_input_data', parse_then_publish)
+    first = client.post('/check', json=ROW).get_json()
+    assert first['condition1']['count'] == 0  # 本次请求按旧规则库计算
+
+    second = client.post('/check', json=ROW).get_json()
+    assert second['condition1']['count'] == 1  # 不能命中记在新版本下的旧结果
+
+
+def test_version_travels_with_library(client):
+    app._publish(None, [RULE], [], 'test')
+    lib = app.LIBRARY
+    assert lib['version'] == app.STATE['version']
+    app._attach_rows([])
+    assert app.LIBRARY['version'] == lib['version']
+    assert app.LIBRARY['rows'] == [] and lib['rows'] is None
+
+
+def test_fixture_restores_globals(client):
+    # 依赖上面的测试已发布过规则库：模块级的 LIBRARY / STATE 仍是导入时的初始值
+    assert app.LIBRARY['version'] == 0 and app.LIBRARY['rules_85'] == []
+    assert app.STATE['version'] == 0 and app.STATE['source'] is None
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""backtest.walk_forward：测试场次按场计一次，预测冲突的场次不计入命中率。"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backtest  # noqa: E402
+
+DAY0 = datetime(2024, 1, 1)
+
+
+def _row(i, day, k, g, u):
+    return {'B': '主', 'D': '0', 'F': '0', 'C': DAY0 + timedelta(days=day),
+            'E': str(i), 'K': k, 'G': g, 'U': u}
+
+
+@pytest.fixture
+def rows():
+    # 训练：高 K、G=0.9 全为上；低 K、G=0.7 全为下
+    train = [_row(i, i, 3.5, 0.9, '上') for i in range(8)] + \
+        [_row(10 + i, i, 2.5, 0.7, '下') for i in range(8)]
+    # 测试：第一场同时满足预测上、预测下的规则（冲突），后两场被多条预测上的规则匹配
+    test = [_row(20, 125, 3.5, 0.7, '上'), _row(21, 125, 3.5, 0.9, '上'), _row(22, 126, 3.5, 0.9, '下')]
+    return train + test
+
+
+def test_each_test_game_counted_once(rows):
+    res = {r['条件']: r for r in backtest.walk_forward(rows, train_days=120, test_days=30)}
+    for crit in ('rules_85', 'rules_80'):
+        r = res[crit]
+        assert r['测试中触发规则数'] > 2  # 多条规则匹配同一场比赛
+        assert r['测试场次'] == 3 and r['测试覆盖场次'] == 3 and r['冲突场次'] == 1
+        assert (r['命中'], r['计数'], r['命中率']) == (1, 2, 50.0)
+
+
+@pytest.mark.parametrize('kw', [{'step_days': 0}, {'step_days': -7}, {'test_days': 0}])
+def test_non_positive_windows_rejected(rows, kw):
+    with pytest.raises(ValueError):
+        backtest.walk_forward(rows, **kw)
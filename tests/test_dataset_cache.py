@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""dataset_cache：损坏或字段不全的缓存文件按整表解析处理并重建，写缓存不留下临时文件。"""
+import os
+import pickle
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset_cache  # noqa: E402
+from analyze_asia_concentration import schema_columns  # noqa: E402
+
+_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_ROW = ('<row r="{r}"><c r="B{r}" t="inlineStr"><is><t>主</t></is></c>'
+        '<c r="D{r}" t="inlineStr"><is><t>0</t></is></c><c r="F{r}" t="inlineStr"><is><t>0</t></is></c>'
+        '<c r="K{r}"><v>3.3</v></c><c r="U{r}" t="s"><v>0</v></c></row>')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'data.xlsx')
+    sheet = f'<worksheet xmlns="{_NS}"><sheetData>' + ''.join(_ROW.format(r=r) for r in (4, 5, 6)) + \
+        '</sheetData></worksheet>'
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('xl/worksheets/sheet1.xml', sheet)
+        z.writestr('xl/sharedStrings.xml', f'<sst xmlns="{_NS}"><si><t>上</t></si></sst>')
+    return path
+
+
+def _listing(path):
+    return sorted(os.listdir(os.path.dirname(dataset_cache.cache_path(path))))
+
+
+def test_round_trip_leaves_no_temp_files(workbook):
+    rows = dataset_cache.load_rows(workbook)
+    assert [r['U'] for r in rows] == ['上'] * 3
+    assert _listing(workbook) == [os.path.basename(dataset_cache.cache_path(workbook))]
+    assert dataset_cache.load_rows(workbook) == rows
+    assert dataset_cache.LAST_LOAD[workbook] == ('cache', 0)
+
+
+@pytest.mark.parametrize('payload', [
+    b'not a pickle',
+    pickle.dumps({'format': 1})[:-3],                       # 截断
+    pickle.dumps({'format': 1, 'columns': None}),           # 字段不全
+    pickle.dumps([1, 2, 3]),
+    b'\x80\x04\x95' + b'\x00' * 8 + b'c' + b'no_such_module\nX\n.',  # 引用不存在的模块
+])
+def test_corrupt_cache_is_rebuilt(workbook, payload):
+    expected = dataset_cache.load_rows(workbook)
+    cp = dataset_cache.cache_path(workbook)
+    with open(cp, 'wb') as f:
+        f.write(payload)
+    assert dataset_cache.load_rows(workbook) == expected
+    assert dataset_cache.LAST_LOAD[workbook] == ('full', 3)
+    assert dataset_cache._read_cache(cp, schema_columns()) is not None  # 已重建为有效缓存
+    assert _listing(workbook) == [os.path.basename(cp)]
+
+
+def test_unwritable_cache_dir_is_ignored(workbook, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError('read-only')
+
+    monkeypatch.setattr(dataset_cache.tempfile, 'mkstemp', fail)
+    assert len(dataset_cache.load_rows(workbook)) == 3
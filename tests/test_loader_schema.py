@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""load_xlsx 的列投影：schema 之外的列不读入数据行，投影外的单元格不取值；SUMMARY_SCHEMA 的列经缓存读回不变。"""
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_asia_concentration as aac  # noqa: E402
+import dataset_cache  # noqa: E402
+import export_summary_types  # noqa: E402
+from xlsx_reader import Workbook  # noqa: E402
+
+_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+# 第 4 行起为数据行；A、J 为共享字符串（序号 0、1），B/D/F/U 为内联字符串
+_ROW = ('<row r="{r}"><c r="A{r}" t="s"><v>0</v></c><c r="B{r}" t="inlineStr"><is><t>主</t></is></c>'
+        '<c r="D{r}" t="inlineStr"><is><t>0</t></is></c><c r="F{r}" t="inlineStr"><is><t>0</t></is></c>'
+        '<c r="G{r}"><v>0.85</v></c><c r="J{r}" t="s"><v>1</v></c><c r="K{r}"><v>3.3</v></c>'
+        '<c r="L{r}"><v>2.75</v></c><c r="O{r}"><v>1.9</v></c><c r="U{r}" t="inlineStr"><is><t>上</t></is></c>'
+        '<c r="V{r}"><v>-0.12</v></c><c r="W{r}"><v>0.3</v></c></row>')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'data.xlsx')
+    sheet = f'<worksheet xmlns="{_NS}"><sheetData>' + ''.join(_ROW.format(r=r) for r in (4, 5)) + \
+        '</sheetData></worksheet>'
+    sst = f'<sst xmlns="{_NS}"><si><t>强队</t></si><si><t>澳</t></si></sst>'
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('xl/worksheets/sheet1.xml', sheet)
+        z.writestr('xl/sharedStrings.xml', sst)
+    return path
+
+
+@pytest.mark.parametrize('cache', [False, True])
+def test_columns_outside_schema_are_not_loaded(workbook, monkeypatch, cache):
+    monkeypatch.setattr(dataset_cache, 'ENABLED', cache)
+    rows = aac.load_xlsx(workbook)
+    assert len(rows) == 2
+    assert 'L' not in rows[0] and 'A' not in rows[0] and 'J' not in rows[0]
+    assert rows[0]['K'] == 3.3 and rows[0]['G'] == 0.85
+
+    wide = aac.load_xlsx(workbook, schema=aac.SEARCH_SCHEMA + ('L',))
+    assert [r['L'] for r in wide] == [2.75, 2.75]
+    assert [{k: v for k, v in r.items() if k != 'L'} for r in wide] == list(rows)
+
+
+@pytest.mark.parametrize('cache', [False, True])
+def test_summary_schema_round_trip(workbook, monkeypatch, cache):
+    monkeypatch.setattr(dataset_cache, 'ENABLED', cache)
+    first = aac.load_xlsx(workbook, schema=aac.SUMMARY_SCHEMA)
+    again = aac.load_xlsx(workbook, schema=aac.SUMMARY_SCHEMA)
+    assert [(r['L'], r['O'], r['V'], r['W']) for r in first] == [(2.75, 1.9, -0.12, 0.3)] * 2
+    assert again == first
+    if cache:
+        assert dataset_cache.LAST_LOAD[workbook] == ('cache', 0)
+        assert os.path.basename(dataset_cache.cache_path(workbook, aac.SUMMARY_SCHEMA)) == 'data.xlsx.LOVW.rows.pkl'
+    # 默认投影的缓存不受影响
+    assert 'V' not in aac.load_xlsx(workbook)[0]
+
+
+def test_summary_schema_covers_summary_conditions():
+    # 汇总类型库条件列中，除数据表的结果列 U 和形态键 X 外都在 SUMMARY_SCHEMA 中
+    cond_cols = set(export_summary_types._COL_TO_INPUT_COL.values())
+    assert cond_cols - set(aac.SUMMARY_SCHEMA) == {'X'}
+    assert 'U' in aac.SEARCH_SCHEMA
+
+
+def test_cells_outside_projection_are_skipped(workbook):
+    wb = Workbook(workbook)
+    try:
+        cell_rows = wb.rows(columns=aac.schema_columns())
+        assert {c for _, cells in cell_rows for c in cells} == {'B', 'D', 'F', 'G', 'K', 'U'}
+        # A、J 列的共享字符串不在投影内，没有被解码
+        assert wb._strings == []
+    finally:
+        wb.close()
+
+
+def test_schema_cannot_include_morph_key():
+    with pytest.raises(ValueError):
+        aac.schema_columns(('X',))
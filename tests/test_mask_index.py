@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""mask_index.greedy_cover / rules_needed：惰性堆贪心与逐步重算全部规则的朴素贪心选出相同的规则。"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mask_index import greedy_cover, rules_needed  # noqa: E402
+
+
+def _naive(masks, universe, target):
+    covered, order = 0, []
+    while covered.bit_count() < target:
+        gains = [(m & universe & ~covered).bit_count() for m in masks]
+        best = max(range(len(masks)), key=lambda i: (gains[i], -i)) if masks else None
+        if best is None or gains[best] == 0:
+            break
+        covered |= masks[best] & universe
+        order.append((best, gains[best], covered.bit_count()))
+    return order
+
+
+def test_picks_largest_gain_first():
+    masks = [0b0011, 0b1110, 0b1000, 0b0001]
+    assert greedy_cover(masks) == [(1, 3, 3), (0, 1, 4)]
+    # universe 之外的位不计入新增
+    assert greedy_cover(masks, universe=0b1001) == [(0, 1, 1), (1, 1, 2)]  # 新增相同取序号小的
+    assert greedy_cover(masks, target=3) == [(1, 3, 3)]
+    assert greedy_cover([]) == [] and greedy_cover([0, 0]) == []
+
+
+def test_matches_naive_greedy():
+    rnd = random.Random(7)
+    for _ in range(50):
+        masks = [rnd.getrandbits(60) & rnd.getrandbits(60) & rnd.getrandbits(60) for _ in range(rnd.randint(1, 40))]
+        universe = 0
+        for m in masks:
+            universe |= m
+        assert greedy_cover(masks) == _naive(masks, universe, universe.bit_count())
+
+
+def test_rules_needed():
+    order = [(4, 5, 5), (1, 3, 8), (0, 2, 10)]
+    assert rules_needed(order, 10, (0.5, 0.8, 1.0)) == {0.5: 1, 0.8: 2, 1.0: 3}
+    assert rules_needed(order[:1], 10, (0.9,)) == {0.9: None}
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""rule_engine.prune_rules：匹配场次相同的规则合并为 variants，预测相同的严格规则记入子集规则的 subsumes。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rule_engine  # noqa: E402
+from mask_index import MaskIndex  # noqa: E402
+
+GROUP = [('主', '0', '0')]
+
+
+def _predict(shang, xia, zou, n_total):
+    return '上' if shang > xia else '下' if xia > shang else None
+
+
+@pytest.fixture
+def index():
+    spec = [(3.5, 0.7, '上')] * 6 + [(3.5, 0.9, '下')] * 2 + [(2.5, 0.7, '下')] * 3
+    rows = [{'B': '主', 'D': '0', 'F': '0', 'E': str(i), 'K': k, 'G': g, 'U': u}
+            for i, (k, g, u) in enumerate(spec)]
+    return MaskIndex(rows)
+
+
+def _rule(index, feature, conditions):
+    counts = index.counts(index.filter_mask(GROUP, **conditions))
+    combo = [(feature, k, v) for k, v in conditions.items()]
+    info = rule_engine._rule_info(GROUP, combo, *counts)
+    info['feature'] = feature
+    return info
+
+
+def test_same_matches_collapse_into_variants(index):
+    rules = [_rule(index, 'K>3.1+G<1', {'K_gt': 3.1, 'G_lt': 1.0}),
+             _rule(index, 'K>3.0', {'K_gt': 3.0}),
+             _rule(index, 'K>3.1', {'K_gt': 3.1})]
+    kept = rule_engine.prune_rules(rules, _predict, index)
+    # 条件最少的保留，同条数保留先出现的
+    assert [r['feature'] for r in kept] == ['K>3.0']
+    assert sorted(kept[0]['variants']) == ['K>3.1', 'K>3.1+G<1']
+    assert all('variants' not in r for r in rules)  # 不改动输入的规则
+
+
+def test_stricter_rule_with_same_prediction_is_subsumed(index):
+    rules = [_rule(index, 'K>3.0', {'K_gt': 3.0}),
+             _rule(index, 'K>3.0+G<0.8', {'K_gt': 3.0, 'G_lt': 0.8}),
+             _rule(index, 'K>3.0+G≥0.85', {'K_gt': 3.0, 'G_ge': 0.85})]
+    assert [_predict(r['shang'], r['xia'], r['zou'], r['n_total']) for r in rules] == ['上', '上', '下']
+    kept = rule_engine.prune_rules(rules, _predict, index)
+    # 预测与子集规则不同的严格规则带来新的结论，保留
+    assert [r['feature'] for r in kept] == ['K>3.0', 'K>3.0+G≥0.85']
+    assert kept[0]['subsumes'] == ['K>3.0+G<0.8']
+
+
+def test_different_groups_are_not_merged(index):
+    a = _rule(index, 'K>3.0', {'K_gt': 3.0})
+    b = dict(a, morph_group=GROUP + [('客', '0', '0')], feature='K>3.0（主+客）')
+    kept = rule_engine.prune_rules([a, b], _predict, index)
+    assert [r['feature'] for r in kept] == ['K>3.0', 'K>3.0（主+客）']
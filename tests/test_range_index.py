@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""range_index.RangeIndex：区间缓存有上限，淘汰后重新计算的计数不变。"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import range_index  # noqa: E402
+from analyze_asia_concentration import filter_rows, unique_by_game  # noqa: E402
+
+MORPH = ('主', '0', '0')
+
+
+def _rows():
+    return [{'B': '主', 'D': '0', 'F': '0', 'E': str(i), 'K': 2.5 + i / 100, 'U': '上下走'[i % 3]}
+            for i in range(100)]
+
+
+def test_range_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(range_index, 'RANGE_CACHE_SIZE', 8)
+    rows = _rows()
+    index = range_index.RangeIndex(rows)
+    for i in range(50):
+        v = 2.5 + i / 50
+        got = index.counts(MORPH, K_gt=v)
+        sub = unique_by_game(filter_rows(rows, MORPH, K_gt=v))
+        assert got == (len(sub),) + tuple(sum(r['U'] == u for r in sub) for u in '上下走')
+    cache = index.morph(MORPH)._range_cache
+    assert len(cache) == 8
+    assert next(reversed(cache)) == ('K', (('gt', 2.5 + 49 / 50),))  # 最近用到的条件留在末尾
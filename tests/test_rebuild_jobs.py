@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""rebuild_jobs.RebuildJobs：发布失败、提交失败时恢复原工作簿、快照和分片。"""
+import json
+import os
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rebuild_jobs  # noqa: E402
+
+RULE = {'morph': ['主', '0', '0'], 'feature': 'K>3.0', 'conditions': {'K_gt': 3.0},
+        'n_total': 6, 'shang': 6, 'xia': 0, 'zou': 0}
+OUTPUT = {'meta': {}, 'rules_85': [RULE], 'rules_80': []}
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _tree(root):
+    return {os.path.relpath(os.path.join(d, n), root): _read(os.path.join(d, n))
+            for d, _, names in os.walk(root) for n in names}
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    static = tmp_path / 'static'
+    (static / 'shards' / 'rules').mkdir(parents=True)
+    (static / 'rules.json').write_text('old rules')
+    (static / 'shards' / 'rules' / 'manifest.json').write_text('old manifest')
+    (static / 'shards' / 'rules' / 'home_0_0.json').write_text('old shard')
+    monkeypatch.setattr(rebuild_jobs, 'SNAPSHOT_PATH', str(static / 'rules.json'))
+    monkeypatch.setattr(rebuild_jobs, 'SHARDS_DIR', str(static / 'shards'))
+    workbook = tmp_path / 'data.xlsx'
+    workbook.write_text('old workbook')
+    upload = tmp_path / '.upload-1.xlsx'
+    upload.write_text('new workbook')
+    return tmp_path, static, workbook, upload
+
+
+class _Pool:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.submitted = []
+
+    def submit(self, fn, job_id, data_path, snapshot_tmp, source):
+        if self.fail:
+            raise RuntimeError('cannot schedule new futures after shutdown')
+        self.submitted.append(snapshot_tmp)
+        return Future()
+
+
+def _jobs(workbook, on_publish, pool):
+    jobs = rebuild_jobs.RebuildJobs(on_publish, str(workbook))
+    jobs._ensure_pool = lambda: None
+    jobs._pool = pool
+    return jobs
+
+
+def _finish_with(jobs, pool, job_id, backup):
+    snapshot_tmp = pool.submitted[0]
+    with open(snapshot_tmp, 'w') as f:
+        f.write('new rules')
+    fut = Future()
+    fut.set_result(([{'row': 1}], {'rules_85': [RULE], 'rules_80': []}, OUTPUT))
+    jobs._finish(job_id, fut, snapshot_tmp, backup)
+
+
+def test_failed_publish_restores_snapshot_shards_and_workbook(env):
+    tmp_path, static, workbook, upload = env
+    before = _tree(static)
+
+    def on_publish(rows, library):
+        raise ValueError('publish failed')
+
+    pool = _Pool()
+    jobs = _jobs(workbook, on_publish, pool)
+    job = jobs.submit(str(upload), str(workbook), 'data.xlsx')  # _Pool 返回的 Future 不会完成，由测试结束任务
+    _finish_with(jobs, pool, job['id'], str(workbook) + '.bak')
+
+    assert jobs.get(job['id'])['status'] == 'error'
+    assert _tree(static) == before
+    assert workbook.read_text() == 'old workbook'
+    assert sorted(os.listdir(static)) == ['rules.json', 'shards']
+
+
+def test_successful_publish_replaces_snapshot_and_shards(env):
+    tmp_path, static, workbook, upload = env
+    published = []
+    pool = _Pool()
+    jobs = _jobs(workbook, lambda rows, library: published.append(library), pool)
+    job = jobs.submit(str(upload), str(workbook), 'data.xlsx')
+    _finish_with(jobs, pool, job['id'], str(workbook) + '.bak')
+
+    assert jobs.get(job['id'])['status'] == 'done' and published
+    assert (static / 'rules.json').read_text() == 'new rules'
+    manifest = json.loads((static / 'shards' / 'rules' / 'manifest.json').read_text())
+    shard = manifest['shards']['主/0/0']['file']
+    assert '"rules_85"' in (static / 'shards' / 'rules' / shard).read_text()
+    assert sorted(os.listdir(static)) == ['rules.json', 'shards']
+    assert sorted(os.listdir(static / 'shards')) == ['rules']
+
+
+def test_failed_submit_restores_workbook_and_frees_slot(env):
+    tmp_path, static, workbook, upload = env
+    jobs = _jobs(workbook, lambda rows, library: None, _Pool(fail=True))
+    with pytest.raises(rebuild_jobs.SubmitError):
+        jobs.submit(str(upload), str(workbook), 'data.xlsx')
+
+    assert workbook.read_text() == 'old workbook'
+    assert not os.path.exists(str(workbook) + '.bak')
+    assert not jobs.busy()
+    assert jobs.list()[0]['status'] == 'error'
+    assert jobs._pool is None
+
+
+def test_rebuilt_pool_reuses_progress_thread(tmp_path):
+    import threading
+
+    def drains():
+        return sum(t.name == 'rebuild-progress' for t in threading.enumerate())
+
+    jobs = rebuild_jobs.RebuildJobs(lambda rows, library: None, str(tmp_path / 'data.xlsx'))
+    before = drains()
+    jobs._ensure_pool()
+    first, queue = jobs._pool, jobs._queue
+    jobs._pool = None  # 相当于 BrokenProcessPool 之后
+    jobs._ensure_pool()
+    try:
+        assert jobs._pool is not first and jobs._queue is queue
+        assert drains() == before + 1
+    finally:
+        first.shutdown()
+        jobs._pool.shutdown()
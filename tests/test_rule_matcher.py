@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""rule_engine.RuleMatcher：对任意规则和输入行，匹配结果（含顺序）与 check_conditions 完全相同。"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rule_engine  # noqa: E402
+
+MORPHS = [('主', '0', '0'), ('主', '0', '0.25'), ('客', '0', '0'), ('客', '0.25', '0')]
+COLS = ('G', 'I', 'K', 'N', 'P', 'Q', 'R')
+# 阈值取得很密，输入值常落在阈值及其 ±RANGE_EPS 上
+THRESHOLDS = (0.8, 0.9, 1.0, 3.0, 3.1)
+SUFFIXES = ('ge', 'le', 'gt', 'lt', 'range', 'eq')  # eq：未识别的后缀
+
+
+def _rules(rnd, n):
+    rules = []
+    for i in range(n):
+        conditions = {}
+        for _ in range(rnd.randint(0, 3)):
+            col = rnd.choice(COLS + ('H',))  # H 列不在 check_conditions 读取的列中
+            suffix = rnd.choice(SUFFIXES)
+            a, b = sorted(rnd.sample(THRESHOLDS, 2))
+            conditions[f'{col}_{suffix}'] = [a, b] if suffix == 'range' else a
+        group = rnd.sample(MORPHS, rnd.randint(1, 3))
+        rules.append({'morph': group[0], 'morph_group': group, 'feature': str(i), 'conditions': conditions})
+    return rules
+
+
+def _value(rnd):
+    t = rnd.choice(THRESHOLDS)
+    return rnd.choice([None, '', ' ', 'abc', 'nan', float('nan'), t, t + rule_engine.RANGE_EPS, t - rule_engine.RANGE_EPS,
+                       str(t), f' {t} ', int(t), round(rnd.uniform(0.5, 3.5), 2)])
+
+
+def _row(rnd):
+    b, d, f = rnd.choice(MORPHS + [('中', '0', '0'), ('主', '0.5', '0')])
+    row = {'B': f' {b}' if rnd.random() < 0.1 else b, 'D': d, 'F': f}
+    row.update({c: _value(rnd) for c in COLS if rnd.random() < 0.9})
+    return row
+
+
+def test_matches_check_conditions():
+    rnd = random.Random(20240601)
+    for _ in range(40):
+        rules = _rules(rnd, rnd.randint(0, 60))
+        matcher = rule_engine.RuleMatcher(rules)
+        for _ in range(50):
+            row = _row(rnd)
+            expected = rule_engine.check_conditions(row, rules)
+            got = matcher.match(row)
+            assert [id(r) for r in got] == [id(r) for r in expected], (row, [r['conditions'] for r in expected])
+
+
+def test_nan_is_missing_value():
+    # 未识别后缀的条件只要求该列有值：NaN 与空值一样不满足
+    rules = [{'morph': MORPHS[0], 'conditions': {'K_eq': 3.0}, 'feature': 'K=3.0'},
+             {'morph': MORPHS[0], 'conditions': {}, 'feature': '无条件'}]
+    for k in (float('nan'), 'nan', ' NaN ', None):
+        row = {'B': '主', 'D': '0', 'F': '0', 'K': k}
+        for make in rule_engine.MATCHERS.values():
+            assert make(rules)(row) == rules[1:]
+
+
+def test_matchers_registry():
+    rules = [{'morph': MORPHS[0], 'conditions': {'K_gt': 3.0}, 'feature': 'K>3.0'}]
+    row = {'B': '主', 'D': '0', 'F': '0', 'K': '3.3'}
+    for make in rule_engine.MATCHERS.values():
+        assert make(rules)(row) == rules
+        assert make(rules)(dict(row, K='2.9')) == []
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""significance：尾概率表与逐项求和一致，双侧 p 值取观察值一侧，BH q 值与定义一致。"""
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import significance  # noqa: E402
+
+
+def _sf(k, n, p):
+    return sum(math.comb(n, i) * p ** i * (1 - p) ** (n - i) for i in range(max(k, 0), n + 1))
+
+
+@pytest.mark.parametrize('p', [0.5, 0.3, 0.85, 0.0, 1.0])
+def test_binom_sf_matches_direct_sum(p):
+    ks = list(range(-1, 23))
+    ns = [20] * len(ks)
+    got = significance.binom_sf(ks, ns, p)
+    for k, v in zip(ks, got):
+        assert v == pytest.approx(min(1.0, _sf(k, 20, p)), abs=1e-12)
+
+
+def test_binom_sf_per_item_rates():
+    got = significance.binom_sf([3, 3, 7], [10, 10, 12], [0.2, 0.6, 0.6])
+    assert got == pytest.approx([_sf(3, 10, 0.2), _sf(3, 10, 0.6), _sf(7, 12, 0.6)])
+
+
+def test_two_sided_doubles_the_observed_tail():
+    # p0 = 0.5：2 × P(X >= max(k, n-k))
+    assert significance.binom_two_sided([2, 8], [10, 10]) == pytest.approx([2 * _sf(8, 10, 0.5)] * 2)
+    up, low = significance.binom_two_sided([9, 1], [12, 12], [0.4, 0.4])
+    assert up == pytest.approx(2 * _sf(9, 12, 0.4))
+    assert low == pytest.approx(2 * (1 - _sf(2, 12, 0.4)))
+    assert significance.binom_two_sided([5], [10], [0.5]) == [1.0]  # 上限 1
+
+
+def test_bh_qvalues():
+    p = [0.01, 0.04, 0.03, 0.2]
+    # q_(i) = min_{j>=i} p_(j) * m / j
+    assert significance.bh_qvalues(p) == pytest.approx([0.04, 0.04 * 4 / 3, 0.04 * 4 / 3, 0.2])
+    assert significance.bh_qvalues([]) == []
+    assert significance.bh_qvalues([0.9, 0.8]) == pytest.approx([0.9, 0.9])
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""static_shards：规则库按形态组分片，同组形态共用一个文件，每条规则只写一次。"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import static_shards  # noqa: E402
+
+GROUP = [['主', '0', '0'], ['客', '0', '0'], ['主', '0', '0.25']]
+
+
+def _rule(feature, group=None, morph=('主', '0', '0')):
+    rule = {'morph': list(morph), 'feature': feature, 'conditions': {'K_gt': 3.0}}
+    if group is not None:
+        rule['morph_group'] = group
+    return rule
+
+
+def test_one_file_per_group(tmp_path):
+    library = {'rules_85': [_rule('a', GROUP)], 'rules_80': [_rule('b', GROUP), _rule('c', GROUP)]}
+    manifest = static_shards.write_shards('rules', static_shards.rule_shards(library), 'rules.json', {}, 3,
+                                          root=str(tmp_path))
+    files = {e['file'] for e in manifest['shards'].values()}
+    assert len(manifest['shards']) == 3 and len(files) == 1
+    assert all(e['count'] == 3 for e in manifest['shards'].values())
+    assert sorted(os.listdir(tmp_path / 'rules')) == sorted(files | {'manifest.json'})
+    (name,) = files
+    shard = json.loads((tmp_path / 'rules' / name).read_text(encoding='utf-8'))
+    assert sorted(map(tuple, shard['morphs'])) == sorted(map(tuple, GROUP))
+    assert [r['feature'] for r in shard['rules_85'] + shard['rules_80']] == ['a', 'b', 'c']
+    assert all('morph_group' not in r for r in shard['rules_85'] + shard['rules_80'])
+
+
+def test_overlapping_groups(tmp_path):
+    # 主/0/0 同时属于形态组和单形态规则：该形态的分片包含两者，其他形态只含组规则
+    library = {'rules_85': [_rule('group', GROUP), _rule('single')], 'rules_80': []}
+    shards = static_shards.rule_shards(library)
+    assert [r['feature'] for r in shards[('主', '0', '0')]['rules_85']] == ['group', 'single']
+    assert [r['feature'] for r in shards[('客', '0', '0')]['rules_85']] == ['group']
+    assert shards[('客', '0', '0')] is shards[('主', '0', '0.25')]
+    manifest = static_shards.write_shards('rules', shards, 'rules.json', {}, 2, root=str(tmp_path))
+    assert manifest['shards']['主/0/0']['file'] == 'home_0_0.json'
+    assert manifest['shards']['客/0/0']['file'] == manifest['shards']['主/0/0.25']['file'] != 'home_0_0.json'
+    assert len(os.listdir(tmp_path / 'rules')) == 3
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""xlsx_reader.read_rows / workbook_session：会话外不保留打开的文件和解析结果，会话内复用、退出时关闭。"""
+import os
+import sys
+import threading
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xlsx_reader  # noqa: E402
+
+_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'book.xlsx')
+    rows = ''.join(f'<row r="{r}"><c r="A{r}" t="s"><v>{r % 3}</v></c><c r="B{r}"><v>{r}</v></c></row>'
+                   for r in range(1, 301))
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('xl/worksheets/sheet1.xml', f'<worksheet xmlns="{_NS}"><sheetData>{rows}</sheetData></worksheet>')
+        z.writestr('xl/sharedStrings.xml',
+                   f'<sst xmlns="{_NS}"><si><t>甲</t></si><si><t>乙</t></si><si><t>丙</t></si></sst>')
+    return path
+
+
+def test_read_rows_outside_session_keeps_nothing(workbook, monkeypatch):
+    opened = []
+    real = xlsx_reader.Workbook
+
+    class Tracking(real):
+        def __init__(self, path):
+            super().__init__(path)
+            opened.append(self)
+
+    monkeypatch.setattr(xlsx_reader, 'Workbook', Tracking)
+    first = xlsx_reader.read_rows(workbook)
+    second = xlsx_reader.read_rows(workbook)
+    assert first == second and first[0] == (1, {'A': '乙', 'B': '1'})
+    assert len(opened) == 2
+    assert all(wb._zip.fp is None for wb in opened)  # 读完即关闭
+
+
+def test_session_reuses_and_closes(workbook):
+    with xlsx_reader.workbook_session():
+        first = xlsx_reader.read_rows(workbook)
+        with xlsx_reader.workbook_session():
+            assert xlsx_reader.read_rows(workbook) is first  # 同一会话内复用解析结果
+        (wb,) = xlsx_reader._session.values()
+    assert xlsx_reader._session is None
+    assert wb._zip.fp is None
+
+
+def test_shared_workbook_is_thread_safe(workbook):
+    wb = xlsx_reader.Workbook(workbook)
+    results = []
+    try:
+        threads = [threading.Thread(target=lambda c=c: results.append(list(wb.iter_rows(columns=c))))
+                   for c in ({'A'}, {'A', 'B'}, None, {'A'})]
+        # iter_rows 的共享字符串解码经 string() 加锁，并发读取结果一致
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        wb.close()
+    assert all(r[-1][1]['A'] == '甲' for r in results)  # 300 % 3 == 0
@@ -43,6 +43,22 @@ if os.path.exists('static/rules.json'):
         print(f"\n✗ rules.json JSON格式错误: {e}")
         all_ok = False
 
+# 检查按形态分片（static_shards.py）：manifest 中的分片文件都存在
+for manifest_path in ('static/shards/summary_types_v2/manifest.json', 'static/shards/rules/manifest.json'):
+    if not os.path.exists(manifest_path):
+        print(f"\n- {manifest_path} 不存在（网页将下载整库文件）")
+        continue
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    shard_dir = os.path.dirname(manifest_path)
+    missing = [e['file'] for e in manifest['shards'].values() if not os.path.exists(os.path.join(shard_dir, e['file']))]
+    if missing:
+        print(f"\n✗ {manifest_path} 缺少分片: {', '.join(missing)}")
+        all_ok = False
+    else:
+        n_files = len({e['file'] for e in manifest['shards'].values()})
+        print(f"\n✓ {manifest_path}: {len(manifest['shards'])} 个形态，{n_files} 个分片文件")
+
 # 检查index.html
 if os.path.exists('index.html'):
     with open('index.html', 'r', encoding='utf-8') as f:
@@ -57,7 +73,7 @@ print("\n" + "=" * 60)
 if all_ok:
     print("✓ 所有文件验证通过，可以部署到GitHub Pages！")
     print("\n下一步：")
-    print("1. git add index.html static/rules.json")
+    print("1. git add index.html static/")
     print("2. git commit -m 'Deploy to GitHub Pages'")
     print("3. git push")
     print("4. 在GitHub仓库Settings中启用Pages")
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+差分校验：随机生成贴近阈值边界的数据行和查询，把参考实现（纯 Python）与每个加速实现逐条对比，
+报告匹配集合或统计数字的任何不一致。新增加速实现时在对应的注册表里登记即可一起校验。
+
+三类对比：
+- 筛选（FILTER_ENGINES）：参考 = 对普通 list 调用 filter_rows + unique_by_game + stats，
+  比较「筛选后去重的行（含顺序）」和 (总场次, 上, 下, 走)；
+- 单行匹配（CHECK_ENGINES）：参考 = rule_engine.check_conditions，比较匹配到的规则序号；
+- 规则生成（RULE_ENGINES）：参考 = 逐组合 filter_rows 重算，比较每个规则库的 (特征, 统计) 列表。
+
+随机数据覆盖的边界：阈值本身、阈值 ± _RANGE_EPS、± _RANGE_EPS/2、± 2×_RANGE_EPS；None 值；
+未识别（被 filter_rows 忽略）的键如 G_gt / Q_le；值为 None 的条件；同一场次的重复行（结果不同，检验去重保留第一条）。
+
+用法：
+    python3 verify_engines.py                       # 默认规模
+    python3 verify_engines.py --rows 800 --queries 3000 --seed 7
+    python3 verify_engines.py --only mask_index,sqlite
+有不一致时退出码为 1。
+"""
+import argparse
+import json
+import random
+import sys
+
+from analyze_asia_concentration import (
+    Dataset,
+    FILTER_OPS,
+    MORPH_GROUP_DF,
+    RED_CONDITIONS,
+    _RANGE_EPS,
+    filter_rows,
+    stats,
+    unique_by_game,
+)
+import rule_engine
+
+NUM_COLS = ('E', 'G', 'H', 'I', 'K', 'N', 'P', 'Q', 'R', 'S', 'T')
+SIG_COLS = ('B', 'D', 'F', 'U') + NUM_COLS + ('source',)
+# filter_rows 不认识、会直接忽略的键（check_conditions 却会按后缀判断）
+IGNORED_KEYS = ('G_gt', 'Q_le', 'R_le', 'I_gt', 'K_foo')
+# 没有出现在 RED_CONDITIONS 里的列给几个阈值，保证每列都有边界值
+_EXTRA_THRESHOLDS = {
+    'E': (0.25, 0.5, 0.75, 1.0), 'H': (0.0, 0.25, 0.5), 'S': (0.0, 0.1), 'T': (0.0, -0.1),
+    'Q': (0.0, 0.05), 'R': (0.0, -0.05),
+}
+_MORPHS = [(b, d, f) for b in ('主', '客') for d, f in MORPH_GROUP_DF] + [('主', '0.5', '0.5'), ('中', '0', '0')]
+
+
+def _thresholds():
+    """列 -> 阈值列表（来自 RED_CONDITIONS 的阈值和范围端点）。"""
+    th = {c: set(v) for c, v in _EXTRA_THRESHOLDS.items()}
+    for _, key, v in RED_CONDITIONS:
+        col = key.split('_')[0]
+        th.setdefault(col, set()).update(v if isinstance(v, tuple) else (v,))
+    return {c: sorted(v) for c, v in th.items()}
+
+
+THRESHOLDS = _thresholds()
+
+
+def _near(v, rnd):
+    e = _RANGE_EPS
+    return v + rnd.choice((0, e, -e, e / 2, -e / 2, 2 * e, -2 * e, 0.005, -0.005))
+
+
+def _value(col, rnd):
+    th = THRESHOLDS.get(col) or [0.0]
+    x = rnd.random()
+    if x < 0.08:
+        return None
+    if x < 0.7:
+        return _near(rnd.choice(th), rnd)
+    return round(rnd.uniform(min(th) - 0.2, max(th) + 0.2), 2)
+
+
+def random_rows(n, rnd):
+    """n 行随机数据（字段与 load_xlsx 的行相同，C 为 None）。约 15% 为上一场次的重复行，结果不同。"""
+    rows = []
+    while len(rows) < n:
+        if rows and rnd.random() < 0.15:
+            dup = dict(rows[-1])
+            dup['U'] = rnd.choice([u for u in ('上', '下', '走') if u != dup['U']])
+            rows.append(dup)
+            continue
+        b, d, f = rnd.choice(_MORPHS)
+        row = {'X': f'{b}/{d}/{f}', 'B': b, 'D': d, 'F': f, 'U': rnd.choice(('上', '上', '下', '下', '走')),
+               'C': None, 'source': rnd.choice(('a.xlsx', 'b.xlsx'))}
+        for col in NUM_COLS:
+            row[col] = _value(col, rnd)
+        rows.append(row)
+    return rows
+
+
+def random_query(rnd):
+    """返回 (morph, kwargs)：morph 为单个 (B,D,F) 或列表；kwargs 1～3 个条件，含被忽略的键和 None 值。"""
+    morph = rnd.choice(_MORPHS) if rnd.random() < 0.4 else rnd.sample(_MORPHS, rnd.randint(1, 6))
+    keys = rnd.sample(list(FILTER_OPS) + list(IGNORED_KEYS), rnd.randint(1, 3))
+    kw = {}
+    for k in keys:
+        col = k.split('_')[0]
+        th = THRESHOLDS.get(col) or [0.0]
+        if rnd.random() < 0.05:
+            kw[k] = None
+        elif k.endswith('_range'):
+            lo, hi = sorted((_near(rnd.choice(th), rnd), _near(rnd.choice(th), rnd)))
+            kw[k] = (lo, hi)
+        else:
+            kw[k] = _near(rnd.choice(th), rnd)
+    return morph, kw
+
+
+def _sig(r):
+    return tuple(r.get(c) for c in SIG_COLS)
+
+
+# ---------------- 筛选 ----------------
+
+class ReferenceFilter:
+    """参考实现：普通 list 上的 filter_rows + unique_by_game + stats。"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def unique(self, morph, kw):
+        return unique_by_game(filter_rows(self.rows, morph, **kw))
+
+    def counts(self, morph, kw):
+        return stats(self.unique(morph, kw))[:4]
+
+
+class DatasetFilter(ReferenceFilter):
+    """Dataset 形态分区：filter_rows 只取对应分区。"""
+
+    def __init__(self, rows):
+        self.rows = Dataset(rows)
+
+
+class MaskIndexFilter:
+    """mask_index.MaskIndex 位掩码。"""
+
+    def __init__(self, rows):
+        from mask_index import MaskIndex
+        self.index = MaskIndex(rows)
+
+    def unique(self, morph, kw):
+        return self.index.rows_of(self.index.filter_mask(morph, **kw))
+
+    def counts(self, morph, kw):
+        return self.index.counts(self.index.filter_mask(morph, **kw))
+
+
+class RangeIndexFilter:
+    """range_index.RangeIndex 区间计数（一列、两列二分，三列以上逐行）。"""
+
+    def __init__(self, rows):
+        from range_index import RangeIndex
+        self.index = RangeIndex(rows)
+
+    def unique(self, morph, kw):
+        return self.index.rows(morph, **kw)
+
+    def counts(self, morph, kw):
+        return self.index.counts(morph, **kw)
+
+
+class SqliteFilter:
+    """sqlite_store.SqliteStore（内存库）。"""
+
+    def __init__(self, rows):
+        from sqlite_store import SqliteStore
+        self.store = SqliteStore(':memory:')
+        self.store.ingest(rows)
+
+    def unique(self, morph, kw):
+        return self.store.unique_rows(morph, **kw)
+
+    def counts(self, morph, kw):
+        return self.store.counts(morph, **kw)
+
+
+# 名称 -> 类（构造参数为数据行，提供 unique(morph, kw) 与 counts(morph, kw)）
+FILTER_ENGINES = {
+    'dataset': DatasetFilter,
+    'mask_index': MaskIndexFilter,
+    'range_index': RangeIndexFilter,
+    'sqlite': SqliteFilter,
+}
+
+
+def verify_filters(rows, queries, engines):
+    ref = ReferenceFilter(rows)
+    expected = []
+    for morph, kw in queries:
+        u = ref.unique(morph, kw)
+        expected.append(([_sig(r) for r in u], stats(u)[:4]))
+    report = {}
+    for name in engines:
+        eng = FILTER_ENGINES[name](rows)
+        bad = []
+        for (morph, kw), (exp_rows, exp_counts) in zip(queries, expected):
+            got_rows = [_sig(r) for r in eng.unique(morph, kw)]
+            got_counts = tuple(eng.counts(morph, kw))
+            if got_rows != exp_rows or got_counts != tuple(exp_counts):
+                bad.append({'morph': morph, 'conditions': kw, 'expected': tuple(exp_counts), 'got': got_counts,
+                            'rows_differ': got_rows != exp_rows})
+        report[name] = bad
+    return report
+
+
+# ---------------- 单行匹配 ----------------
+
+def _json_roundtrip_check(rules):
+    """规则经 rules.json 往返（列表形态、列表范围）后再匹配：网页快照与内存规则必须一致。"""
+    loaded = [rule_engine.rule_from_dict(json.loads(json.dumps(rule_engine.rule_to_dict(r)))) for r in rules]
+    return lambda row: rule_engine.check_conditions(row, loaded)
+
+
+# 名称 -> 工厂 f(规则列表) -> 匹配函数 g(行) -> 匹配到的规则列表（与输入规则一一对应的对象或其副本）
+CHECK_ENGINES = {
+    'snapshot_roundtrip': _json_roundtrip_check,
+    'rule_matcher': lambda rules: rule_engine.RuleMatcher(rules).match,
+}
+
+
+def random_rules(n, rnd):
+    """随机规则（内存格式）：条件键取自 RED_CONDITIONS 与被忽略键，阈值贴近边界。"""
+    keys = sorted({k for _, k, _ in RED_CONDITIONS}) + list(IGNORED_KEYS)
+    rules = []
+    for i in range(n):
+        group = rnd.sample(_MORPHS, rnd.randint(1, 8))
+        conds = {}
+        for k in rnd.sample(keys, rnd.randint(1, 3)):
+            th = THRESHOLDS.get(k.split('_')[0]) or [0.0]
+            if k.endswith('_range'):
+                conds[k] = tuple(sorted((_near(rnd.choice(th), rnd), _near(rnd.choice(th), rnd))))
+            else:
+                conds[k] = _near(rnd.choice(th), rnd)
+        rules.append({'morph': group[0], 'morph_group': group, 'feature': f'rule{i}', 'conditions': conds,
+                      'shang_zou_ratio': 0, 'xia_zou_ratio': 0, 'shang_ratio': 0, 'zou_ratio': 0,
+                      'xia_ratio': 0, 'n_total': 0, 'shang': 0, 'xia': 0, 'zou': 0})
+    return rules
+
+
+def _as_input(row, rnd):
+    """数据行 -> /check 的输入：数值随机保留为 float 或转成字符串（含空串），检验两种输入一致处理。"""
+    out = {'B': row['B'], 'D': row['D'], 'F': row['F']}
+    for c in NUM_COLS:
+        v = row[c]
+        if rnd.random() < 0.3:
+            out[c] = '' if v is None else repr(v)
+        else:
+            out[c] = v
+    return out
+
+
+def verify_checks(rows, rules, engines, rnd):
+    inputs = [_as_input(r, rnd) for r in rows]
+    pos = {r['feature']: i for i, r in enumerate(rules)}
+    expected = [[m['feature'] for m in rule_engine.check_conditions(x, rules)] for x in inputs]
+    report = {}
+    for name in engines:
+        match = CHECK_ENGINES[name](rules)
+        bad = []
+        for x, exp in zip(inputs, expected):
+            got = [m['feature'] for m in match(x)]
+            # 加速实现可以按任意顺序返回，按规则原顺序比较
+            if sorted(got, key=pos.__getitem__) != exp:
+                bad.append({'input': x, 'expected': exp, 'got': got})
+        report[name] = bad
+    return report
+
+
+# ---------------- 规则生成 ----------------
+
+def reference_rules(rows, criteria=None):
+    """参考实现：逐组合 filter_rows + unique_by_game，返回 {规则库名: [(特征, 总, 上, 下, 走), ...]}。"""
+    criteria = rule_engine._resolve_criteria(criteria)
+    out = {name: [] for name in criteria}
+    for morph_group in rule_engine.web_morph_groups():
+        for cond_combo in rule_engine.condition_combos():
+            kw = {c[1]: c[2] for c in cond_combo}
+            n_total, shang, xia, zou = stats(unique_by_game(filter_rows(rows, morph_group, **kw)))[:4]
+            if n_total == 0:
+                continue
+            feat = '，且'.join(c[0] for c in cond_combo)
+            for name, predict in criteria.items():
+                if predict(shang, xia, zou, n_total) is not None:
+                    out[name].append((feat, n_total, shang, xia, zou))
+    return out
+
+
+def _generate_rules_summary(rows):
+    lib = rule_engine.generate_rules(rows, prune=False)
+    return {name: [(r['feature'], r['n_total'], r['shang'], r['xia'], r['zou']) for r in rules]
+            for name, rules in lib.items()}
+
+
+def _generate_rules_mask_summary(rows):
+    # 立方体内存预算为 0：所有组合都回退到 MaskIndex 位掩码
+    from cube import OutcomeCube
+    lib = rule_engine.generate_rules(rows, prune=False, cube=OutcomeCube(rows, max_bytes=0))
+    return {name: [(r['feature'], r['n_total'], r['shang'], r['xia'], r['zou']) for r in rules]
+            for name, rules in lib.items()}
+
+
+def _generate_rules_by_grouping_summary(rows):
+    # 各形态条件掩码只建一次、形态组计数由各形态相加
+    lib = rule_engine.generate_rules_by_grouping(rows, groupings={'web': rule_engine.web_morph_groups()},
+                                                 prune=False)['web']
+    return {name: [(r['feature'], r['n_total'], r['shang'], r['xia'], r['zou']) for r in rules]
+            for name, rules in lib.items()}
+
+
+# 名称 -> f(数据行) -> 与 reference_rules 相同格式的结果
+RULE_ENGINES = {
+    'generate_rules': _generate_rules_summary,
+    'generate_rules_mask': _generate_rules_mask_summary,
+    'generate_rules_by_grouping': _generate_rules_by_grouping_summary,
+}
+
+
+def verify_rules(rows, engines):
+    expected = reference_rules(list(rows))
+    report = {}
+    for name in engines:
+        got = RULE_ENGINES[name](rows)
+        bad = []
+        for crit, exp in expected.items():
+            g = got.get(crit, [])
+            if g != exp:
+                exp_set, got_set = set(exp), set(g)
+                bad.append({'criterion': crit, 'expected': len(exp), 'got': len(g),
+                            'missing': sorted(exp_set - got_set)[:5], 'extra': sorted(got_set - exp_set)[:5]})
+        report[name] = bad
+    return report
+
+
+def _print_report(title, report, n_cases):
+    ok = True
+    for name, bad in report.items():
+        status = '一致' if not bad else f'不一致 {len(bad)} 处'
+        print(f'  [{title}] {name}: {n_cases} 个用例，{status}')
+        for b in bad[:3]:
+            print('      ', b)
+        ok = ok and not bad
+    return ok
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='参考实现与各加速实现的差分校验')
+    ap.add_argument('--rows', type=int, default=600, help='随机数据行数')
+    ap.add_argument('--queries', type=int, default=2000, help='随机筛选查询数')
+    ap.add_argument('--rules', type=int, default=300, help='随机匹配规则数（单行匹配校验）')
+    ap.add_argument('--seed', type=int, default=20240601)
+    ap.add_argument('--only', default='', help='只校验这些实现（逗号分隔的名称）')
+    ap.add_argument('--skip-rules', action='store_true', help='跳过规则生成校验（最慢的一项）')
+    args = ap.parse_args(argv)
+
+    only = set(filter(None, args.only.split(',')))
+    pick = lambda reg: [n for n in reg if not only or n in only]
+    rnd = random.Random(args.seed)
+    rows = random_rows(args.rows, rnd)
+    queries = [random_query(rnd) for _ in range(args.queries)]
+    print(f'随机数据 {len(rows)} 行（seed={args.seed}），筛选查询 {len(queries)} 个')
+
+    ok = _print_report('筛选', verify_filters(rows, queries, pick(FILTER_ENGINES)), len(queries))
+    rules = random_rules(args.rules, rnd)
+    ok = _print_report('匹配', verify_checks(rows, rules, pick(CHECK_ENGINES), rnd), len(rows)) and ok
+    if not args.skip_rules:
+        ok = _print_report('规则生成', verify_rules(rows, pick(RULE_ENGINES)), len(rule_engine.condition_combos())) and ok
+    print('全部一致' if ok else '存在不一致')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
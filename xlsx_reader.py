@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标准库 XLSX 读取：一个 Workbook 对象只打开一次压缩包，供 load_xlsx、manual_types、export_summary_types 共用。
+- 工作表按名称解析（workbook.xml + workbook.xml.rels），不再写死 sheet1.xml；
+- sharedStrings 按需流式解码：只有读到字符串单元格时才往后解析，解析到所需序号为止；
+- 工作表用 iterparse 逐行读取（读完一行即释放 XML 元素），解析结果按表名缓存；
+- 可指定列投影（columns）：投影外的单元格只看引用、不取值，不解码共享字符串、不建文本对象；
+- read_rows 读完即关闭文件；只在 workbook_session() 的 with 块内（一次导出运行）按 (路径, 修改时间, 大小)
+  复用已打开、已解析的 Workbook，退出时全部关闭，长期运行的进程不会一直持有文件句柄和解析结果。
+"""
+import io
+import os
+import re
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_R_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+_REF_RE = re.compile(r'([A-Z]+)(\d+)')
+
+
+def _text_of(el):
+    """<si> / <is> 下所有 <t> 的文本拼接（含富文本 <r><t>）。"""
+    return ''.join(t.text or '' for t in el.iter(_MAIN + 't'))
+
+
+def _cell_value(c, string):
+    t = c.get('t')
+    if t == 'inlineStr':
+        is_el = c.find(_MAIN + 'is')
+        return _text_of(is_el) if is_el is not None else ''
+    v = c.find(_MAIN + 'v')
+    if v is None or v.text is None:
+        return ''
+    if t == 's':
+        try:
+            s = string(int(v.text))
+        except ValueError:
+            s = None
+        return v.text if s is None else s
+    return v.text
+
+
+def _iter_rows(f, string, columns=None):
+    """
+    从工作表 XML（文件对象）逐行产出 (行号, {列字母: 文本})；string(序号) 返回共享字符串或 None。
+    columns 为列字母集合时只取这些列的值，其他单元格跳过。
+    """
+    row_no = 0
+    for _, el in ET.iterparse(f, events=('end',)):
+        if el.tag != _MAIN + 'row':
+            continue
+        r_attr = el.get('r')
+        cells = {}
+        first_ref_row = None
+        for c in el.iter(_MAIN + 'c'):
+            m = _REF_RE.match(c.get('r') or '')
+            if not m:
+                continue
+            if first_ref_row is None:
+                first_ref_row = int(m.group(2))
+            col = m.group(1)
+            if columns is not None and col not in columns:
+                continue
+            cells[col] = _cell_value(c, string)
+        el.clear()
+        if r_attr and r_attr.isdigit():
+            row_no = int(r_attr)
+        elif first_ref_row is not None:
+            row_no = first_ref_row
+        else:
+            row_no += 1
+        yield row_no, cells
+
+
+def iter_rows_xml(data, strings, columns=None):
+    """从工作表 XML 字节逐行产出 (行号, {列字母: 文本})；strings 为已解码的共享字符串列表，columns 见 _iter_rows。"""
+    n = len(strings)
+    return _iter_rows(io.BytesIO(data), lambda i: strings[i] if 0 <= i < n else None,
+                      None if columns is None else frozenset(columns))
+
+
+def shared_strings_xml(data):
+    """sharedStrings.xml（或其片段包装成的完整文档）字节 -> 字符串列表。"""
+    out = []
+    for _, el in ET.iterparse(io.BytesIO(data), events=('end',)):
+        if el.tag == _MAIN + 'si':
+            out.append(_text_of(el))
+            el.clear()
+    return out
+
+
+class Workbook:
+    """
+    一个 XLSX 文件。rows(sheet, columns) 返回 [(行号, {列字母: 文本}), ...]（行号从 1 开始），结果缓存。
+    rows 与 string 加锁（共享字符串的流式解码是对象内状态），同一对象可被多个线程使用。
+    """
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self._zip = zipfile.ZipFile(path, 'r')
+        self._sheet_paths = None
+        self._sheets = {}
+        self._strings = []
+        self._strings_iter = None
+        self._strings_done = False
+        self._lock = threading.RLock()
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 工作表定位 ----
+    def _resolve_sheets(self):
+        """表名 -> 压缩包内路径（按工作簿中的顺序）。"""
+        if self._sheet_paths is not None:
+            return self._sheet_paths
+        paths = OrderedDict()
+        names = set(self._zip.namelist())
+        if 'xl/workbook.xml' in names and 'xl/_rels/workbook.xml.rels' in names:
+            with self._zip.open('xl/_rels/workbook.xml.rels') as f:
+                rid_to_target = {rel.get('Id'): rel.get('Target') or ''
+                                 for rel in ET.parse(f).getroot().iter(_REL + 'Relationship')}
+            with self._zip.open('xl/workbook.xml') as f:
+                for sh in ET.parse(f).getroot().iter(_MAIN + 'sheet'):
+                    target = rid_to_target.get(sh.get(_R_ID), '')
+                    if not target:
+                        continue
+                    # Target 一般为 "worksheets/sheet1.xml"，也可能是绝对路径 "/xl/worksheets/sheet1.xml"
+                    paths[sh.get('name') or ''] = (target.lstrip('/') if target.startswith('/')
+                                                   else 'xl/' + target)
+        if not paths and 'xl/worksheets/sheet1.xml' in names:
+            paths['sheet1'] = 'xl/worksheets/sheet1.xml'
+        self._sheet_paths = paths
+        return paths
+
+    def sheet_names(self):
+        return list(self._resolve_sheets())
+
+    def sheet_path(self, name=None):
+        """表名对应的 XML 路径；name 为 None 时取第一张表。"""
+        paths = self._resolve_sheets()
+        if not paths:
+            raise ValueError(f'{self.path}: 没有工作表')
+        if name is None:
+            return next(iter(paths.values()))
+        if name not in paths:
+            raise ValueError(f'sheet not found by name: {name}')
+        return paths[name]
+
+    # ---- sharedStrings（按需解码）----
+    def string(self, idx):
+        """第 idx 个共享字符串；超出范围返回 None。只解析到 idx 为止。"""
+        with self._lock:
+            return self._string(idx)
+
+    def _string(self, idx):
+        while idx >= len(self._strings) and not self._strings_done:
+            if self._strings_iter is None:
+                if 'xl/sharedStrings.xml' not in self._zip.namelist():
+                    self._strings_done = True
+                    break
+                self._strings_iter = ET.iterparse(self._zip.open('xl/sharedStrings.xml'), events=('end',))
+            for _, el in self._strings_iter:
+                if el.tag == _MAIN + 'si':
+                    self._strings.append(_text_of(el))
+                    el.clear()
+                    if idx < len(self._strings):
+                        break
+            else:
+                self._strings_done = True
+        return self._strings[idx] if 0 <= idx < len(self._strings) else None
+
+    # ---- 行读取 ----
+    def has(self, member):
+        """压缩包内是否有该文件。"""
+        return member in self._zip.namelist()
+
+    def read(self, member):
+        """压缩包内某个文件的原始字节（如 sheet_path() 的返回值）。"""
+        return self._zip.read(member)
+
+    def iter_rows(self, name=None, columns=None):
+        """
+        逐行读取工作表，产出 (行号, {列字母: 文本})。
+        共享字符串已替换为文本，内联字符串取 <is> 文本，其他类型取 <v> 原文；空单元格为 ''。
+        columns 为列字母集合时只保留这些列（投影外的单元格不取值）。
+        """
+        with self._zip.open(self.sheet_path(name)) as f:
+            yield from _iter_rows(f, self.string, None if columns is None else frozenset(columns))
+
+    def rows(self, name=None, columns=None):
+        """iter_rows 的完整结果（列表，按表和列投影缓存）。"""
+        with self._lock:
+            key = (self.sheet_path(name), None if columns is None else frozenset(columns))
+            if key not in self._sheets:
+                self._sheets[key] = list(self.iter_rows(name, columns))
+            return self._sheets[key]
+
+
+# workbook_session() 期间的 Workbook 缓存：(绝对路径, 修改时间, 大小) -> Workbook；None 表示不在会话中
+_session = None
+_session_lock = threading.Lock()
+
+
+@contextmanager
+def workbook_session():
+    """
+    一次导出运行：with 块内 read_rows 对同一文件（未变化时）复用已打开、已解析的 Workbook，
+    退出时全部关闭。可嵌套（内层沿用外层的会话）。
+    """
+    global _session
+    with _session_lock:
+        outer = _session is not None
+        if not outer:
+            _session = {}
+    try:
+        yield
+    finally:
+        if not outer:
+            with _session_lock:
+                cached, _session = _session, None
+            for wb in cached.values():
+                wb.close()
+
+
+def read_rows(path, name=None, columns=None):
+    """读取一张表的全部行（见 Workbook.rows）。不在 workbook_session() 内时读完即关闭文件、不保留解析结果。"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _session_lock:
+        wb = None if _session is None else _session.get(key)
+        if wb is None and _session is not None:
+            wb = _session[key] = Workbook(path)
+    if wb is not None:
+        return wb.rows(name, columns)
+    with Workbook(path) as wb:
+        return wb.rows(name, columns)